@@ -15,3 +15,5 @@ OPEN_STREET_MAP_URL = "https://nominatim.openstreetmap.org/reverse"
 HH_API_CITY_ID = "https://api.hh.ru/suggests/areas"
 # вакансии, похожие на вакансию с vacancy_id
 HH_API_URL_RELATED = "https://api.hh.ru/vacancies/{vacancy_id}/related_vacancies"
+# справочники hh.ru (курсы валют)
+HH_API_DICTIONARIES = "https://api.hh.ru/dictionaries"
@@ -1,7 +1,12 @@
 import os
+import asyncio
+import asyncpg
+from contextlib import asynccontextmanager
 import psycopg2
-from psycopg2 import pool
+import psycopg2.pool
 from dotenv import load_dotenv
+from config.settings import ENDPOINT_TIMEOUTS
+from utils.deadline import timeout_for
 
 load_dotenv()
 
@@ -61,3 +66,82 @@ class Database:
                 cursor.close()
             if conn:
                 self.release_connection(conn)
+
+
+class AsyncDatabase:
+    """Asyncpg connection pool for use inside the bot's event loop"""
+
+    def __init__(self):
+        self.connection_pool = None
+        self._pool_lock = asyncio.Lock()
+
+    async def get_pool(self) -> asyncpg.Pool:
+        """Get connection pool, creating it on first use"""
+        if self.connection_pool is None:
+            async with self._pool_lock:
+                if self.connection_pool is None:
+                    try:
+                        self.connection_pool = await asyncpg.create_pool(
+                            min_size=int(os.getenv('POSTGRES_POOL_MIN_SIZE', 1)),
+                            max_size=int(os.getenv('POSTGRES_POOL_MAX_SIZE', 10)),
+                            host=os.getenv('POSTGRES_HOST'),
+                            port=os.getenv('POSTGRES_PORT'),
+                            database=os.getenv('POSTGRES_DB'),
+                            user=os.getenv('POSTGRES_USER'),
+                            password=os.getenv('POSTGRES_PASSWORD')
+                        )
+                    except Exception as e:
+                        print(f"Error initializing async connection pool: {e}")
+                        raise
+        return self.connection_pool
+
+    async def close_all_connections(self):
+        """Close all connections in the pool"""
+        if self.connection_pool is not None:
+            await self.connection_pool.close()
+            self.connection_pool = None
+
+    def timeout(self) -> float:
+        """Timeout for one statement: the DB timeout clamped by the current update deadline"""
+        return timeout_for(ENDPOINT_TIMEOUTS['db'])
+
+    @asynccontextmanager
+    async def transaction(self):
+        """Acquire a connection and run one transaction on it.
+
+        Statements on the yielded connection should pass timeout=self.timeout().
+        """
+        db_pool = await self.get_pool()
+        async with db_pool.acquire(timeout=self.timeout()) as connection:
+            async with connection.transaction():
+                yield connection
+
+    async def execute(self, query, *args):
+        """Execute SQL query without result (each call is its own transaction).
+
+        Every call is bounded by the DB timeout and the current update deadline.
+        """
+        db_pool = await self.get_pool()
+        await db_pool.execute(query, *args, timeout=timeout_for(ENDPOINT_TIMEOUTS['db']))
+        return True
+
+    async def fetch(self, query, *args):
+        """Execute SQL query and return all rows"""
+        db_pool = await self.get_pool()
+        return await db_pool.fetch(query, *args, timeout=timeout_for(ENDPOINT_TIMEOUTS['db']))
+
+    async def executemany(self, query, args):
+        """Execute SQL query for each set of arguments in one batch"""
+        db_pool = await self.get_pool()
+        await db_pool.executemany(query, args, timeout=timeout_for(ENDPOINT_TIMEOUTS['db']))
+        return True
+
+    async def fetchrow(self, query, *args):
+        """Execute SQL query and return first row (None if there are no rows)"""
+        db_pool = await self.get_pool()
+        return await db_pool.fetchrow(query, *args, timeout=timeout_for(ENDPOINT_TIMEOUTS['db']))
+
+    async def fetchval(self, query, *args):
+        """Execute SQL query and return first column of first row"""
+        db_pool = await self.get_pool()
+        return await db_pool.fetchval(query, *args, timeout=timeout_for(ENDPOINT_TIMEOUTS['db']))
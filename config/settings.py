@@ -0,0 +1,127 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Пул HTTP-соединений к внешним API (hh.ru, OpenStreetMap)
+HTTP_POOL_LIMIT = int(os.getenv('HTTP_POOL_LIMIT', 100))  # Всего одновременных соединений
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', 20))  # Соединений на один хост
+HTTP_DNS_CACHE_TTL = int(os.getenv('HTTP_DNS_CACHE_TTL', 300))  # Время жизни DNS-кэша, сек
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', 30))  # Простой keep-alive соединения, сек
+HTTP_USER_AGENT = os.getenv('HTTP_USER_AGENT', 'JobHunter/1.0')
+
+# Применять миграции схемы БД при старте бота (иначе: python -m services.migrations)
+RUN_MIGRATIONS_ON_STARTUP = os.getenv('RUN_MIGRATIONS_ON_STARTUP', 'true').lower() == 'true'
+
+# Кэш ответов hh.ru на поиск вакансий
+HH_CACHE_TTL = float(os.getenv('HH_CACHE_TTL', 300))  # Время жизни записи, сек
+HH_CACHE_MAXSIZE = int(os.getenv('HH_CACHE_MAXSIZE', 1024))  # Максимум записей (LRU)
+
+# Аналитика: сколько вакансий анализировать (hh.ru отдает не более 2000 на запрос)
+ANALYTICS_MAX_VACANCIES = int(os.getenv('ANALYTICS_MAX_VACANCIES', 2000))
+HH_PAGE_CONCURRENCY = int(os.getenv('HH_PAGE_CONCURRENCY', 10))  # Одновременно загружаемых страниц
+HH_SKILLS_CONCURRENCY = int(os.getenv('HH_SKILLS_CONCURRENCY', 10))  # Одновременных запросов key_skills (на все загрузки)
+SKILLS_ENRICH_JOBS = int(os.getenv('SKILLS_ENRICH_JOBS', 2))  # Одновременных фоновых загрузок навыков
+SKILLS_CACHE_MAXSIZE = int(os.getenv('SKILLS_CACHE_MAXSIZE', 20000))  # Вакансий в памяти (остальные - в БД)
+SKILLS_CACHE_TTL = float(os.getenv('SKILLS_CACHE_TTL', 86400))  # Время жизни в памяти, сек
+
+# Ограничение частоты и повторы запросов к hh.ru
+HH_RATE_LIMIT = float(os.getenv('HH_RATE_LIMIT', 10))  # Запросов в секунду на весь процесс
+HH_RATE_BURST = float(os.getenv('HH_RATE_BURST', 20))  # Допустимый всплеск
+HH_MAX_RETRIES = int(os.getenv('HH_MAX_RETRIES', 3))
+HH_BACKOFF_BASE = float(os.getenv('HH_BACKOFF_BASE', 0.5))  # Базовая задержка повтора, сек
+HH_BACKOFF_MAX = float(os.getenv('HH_BACKOFF_MAX', 10))  # Максимальная задержка повтора, сек
+
+# Предохранитель для hh.ru: после N ошибок подряд запросы не выполняются,
+# пока фоновая проверка раз в HH_BREAKER_RESET_TIMEOUT сек не пройдет успешно
+HH_BREAKER_FAILURE_THRESHOLD = int(os.getenv('HH_BREAKER_FAILURE_THRESHOLD', 5))
+HH_BREAKER_RESET_TIMEOUT = float(os.getenv('HH_BREAKER_RESET_TIMEOUT', 30))
+
+# Бюджет времени на обработку одного апдейта, сек
+UPDATE_DEADLINE = float(os.getenv('UPDATE_DEADLINE', 20))
+ANALYTICS_DEADLINE = float(os.getenv('ANALYTICS_DEADLINE', 60))  # Кнопка "Аналитика"
+# Таймауты отдельных внешних вызовов, сек (ограничиваются и остатком бюджета)
+ENDPOINT_TIMEOUTS = {
+    "hh_search": float(os.getenv('HH_SEARCH_TIMEOUT', 10)),
+    "hh_vacancy": float(os.getenv('HH_VACANCY_TIMEOUT', 5)),
+    "hh_related": float(os.getenv('HH_RELATED_TIMEOUT', 5)),
+    "hh_areas": float(os.getenv('HH_AREAS_TIMEOUT', 5)),
+    "hh_dictionaries": float(os.getenv('HH_DICTIONARIES_TIMEOUT', 5)),
+    "osm_reverse": float(os.getenv('OSM_REVERSE_TIMEOUT', 5)),
+    "db": float(os.getenv('DB_TIMEOUT', 5)),
+}
+
+# Фоновая проверка подписок
+SUBSCRIPTION_POLL_INTERVAL = float(os.getenv('SUBSCRIPTION_POLL_INTERVAL', 600))  # Период проверки, сек
+SUBSCRIPTION_POLL_CONCURRENCY = int(os.getenv('SUBSCRIPTION_POLL_CONCURRENCY', 5))  # Групп одновременно
+SUBSCRIPTION_FETCH_SIZE = int(os.getenv('SUBSCRIPTION_FETCH_SIZE', 20))  # Вакансий на запрос группы
+SUBSCRIPTION_MAX_PAGES = int(os.getenv('SUBSCRIPTION_MAX_PAGES', 5))  # Страниц прироста за цикл
+# Группы распределяются между процессами через аренду строк subscription_groups
+SUBSCRIPTION_POLL_IN_BOT = os.getenv('SUBSCRIPTION_POLL_IN_BOT', 'true').lower() == 'true'
+SUBSCRIPTION_TICK_INTERVAL = float(os.getenv('SUBSCRIPTION_TICK_INTERVAL', 30))  # Как часто воркер ищет группы к проверке
+SUBSCRIPTION_LEASE_TTL = float(os.getenv('SUBSCRIPTION_LEASE_TTL', 300))  # После истечения группу заберет другой воркер
+SUBSCRIPTION_LEASE_BATCH = int(os.getenv('SUBSCRIPTION_LEASE_BATCH', 20))  # Групп за одну аренду
+SUBSCRIPTION_RETRY_DELAY = float(os.getenv('SUBSCRIPTION_RETRY_DELAY', 60))  # Повтор группы после ошибки, сек
+# Новые группы создаются вместе с подпиской; полная сверка с таблицей subscriptions - страховка
+SUBSCRIPTION_GROUP_SYNC_INTERVAL = float(os.getenv('SUBSCRIPTION_GROUP_SYNC_INTERVAL', 3600))
+
+# Очередь исходящих сообщений Telegram (лимиты: ~30 сообщений/с всего, ~1/с в один чат)
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', 25))  # Все запросы бота, ответы раньше рассылки
+TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', 1))
+DELIVERY_WORKERS = int(os.getenv('DELIVERY_WORKERS', 4))
+DELIVERY_MAX_ATTEMPTS = int(os.getenv('DELIVERY_MAX_ATTEMPTS', 5))
+DIGEST_MAX_ITEMS = int(os.getenv('DIGEST_MAX_ITEMS', 10))  # Вакансий в одном сообщении-дайджесте
+
+# Уже отправленные подписчику вакансии (защита от повторов при переопубликации)
+SEEN_SET_WINDOW = float(os.getenv('SEEN_SET_WINDOW', 14 * 24 * 3600))  # Сколько помнить id, сек
+SEEN_SET_GENERATIONS = int(os.getenv('SEEN_SET_GENERATIONS', 7))  # Окно устаревает частями
+SEEN_SET_MAX_IDS = int(os.getenv('SEEN_SET_MAX_IDS', 2000))  # Не больше ~8 КБ на подписку
+
+# Индекс подписок: новые вакансии любой группы сразу сопоставляются со всеми подписками
+SUBSCRIPTION_INDEX_ENABLED = os.getenv('SUBSCRIPTION_INDEX_ENABLED', 'true').lower() == 'true'
+SUBSCRIPTION_INDEX_REFRESH = float(os.getenv('SUBSCRIPTION_INDEX_REFRESH', 600))  # Перестройка из БД, сек
+SUBSCRIPTION_INDEX_SALARY_BUCKET = int(os.getenv('SUBSCRIPTION_INDEX_SALARY_BUCKET', 20000))  # Ширина корзины, руб
+SUBSCRIPTION_INDEX_MAX_BUCKET = int(os.getenv('SUBSCRIPTION_INDEX_MAX_BUCKET', 50))  # Выше - одна общая корзина
+
+# Получение апдейтов: 'polling' (run_polling) или 'webhook' (встроенный HTTP-сервер)
+BOT_MODE = os.getenv('BOT_MODE', 'polling').lower()
+UPDATE_QUEUE_SIZE = int(os.getenv('UPDATE_QUEUE_SIZE', 1000))  # Дальше апдейты ждут (503 на вебхуке)
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')  # Публичный https-адрес, на который Telegram шлет апдейты
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', 8443))
+WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN')
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', 40))  # Параллельных соединений от Telegram
+WEBHOOK_ENQUEUE_TIMEOUT = float(os.getenv('WEBHOOK_ENQUEUE_TIMEOUT', 1))  # Ожидание места в очереди, сек
+
+# Параллельная обработка апдейтов (порядок внутри одного чата сохраняется)
+UPDATE_WORKERS = int(os.getenv('UPDATE_WORKERS', 16))
+UPDATE_METRICS_INTERVAL = float(os.getenv('UPDATE_METRICS_INTERVAL', 60))  # Период записи метрик в лог, сек; 0 - выкл.
+
+# Сессии пользователей: показанные вакансии для кнопок под сообщениями
+SESSION_MAX_USERS = int(os.getenv('SESSION_MAX_USERS', 10000))  # Сессий в памяти, дальше вытеснение LRU
+SESSION_MAX_VACANCIES = int(os.getenv('SESSION_MAX_VACANCIES', 50))  # Вакансий на пользователя
+SESSION_TTL = float(os.getenv('SESSION_TTL', 24 * 3600))  # Время жизни без обращений, сек
+SESSION_STORE_POSTGRES = os.getenv('SESSION_STORE_POSTGRES', 'false').lower() == 'true'  # Общие для реплик, переживают перезапуск
+
+# Вакансий в одном сообщении со страницей результатов
+RESULTS_PER_PAGE = int(os.getenv('RESULTS_PER_PAGE', 5))
+
+# Inline-режим (@bot python москва): ответ нужен за считанные секунды
+INLINE_PAGE_SIZE = int(os.getenv('INLINE_PAGE_SIZE', 10))  # Результатов на порцию next_offset (до 50)
+INLINE_FETCH_TIMEOUT = float(os.getenv('INLINE_FETCH_TIMEOUT', 2.5))  # Дольше - отвечаем без результатов, кэш греется в фоне
+INLINE_CITY_TIMEOUT = float(os.getenv('INLINE_CITY_TIMEOUT', 0.8))  # Поиск id незнакомого города
+INLINE_DEADLINE = float(os.getenv('INLINE_DEADLINE', 5))
+INLINE_CACHE_TIME = int(os.getenv('INLINE_CACHE_TIME', 60))  # Сколько Telegram кэширует ответ, сек
+
+# Упреждающая загрузка результатов поиска после выбора должности
+PREFETCH_ENABLED = os.getenv('PREFETCH_ENABLED', 'true').lower() == 'true'
+# Сколько ждать, пока пользователь закончит выбор, сек. Не дольше жизни ответа
+# в кэше hh.ru: иначе поиск показал бы результаты старше, чем отдает кэш
+PREFETCH_TTL = min(float(os.getenv('PREFETCH_TTL', HH_CACHE_TTL)), HH_CACHE_TTL)
+PREFETCH_MAX_USERS = int(os.getenv('PREFETCH_MAX_USERS', 10000))
+
+# Планировщик поиска: один канонический запрос на (должность, город), зарплата и количество - локально
+SEARCH_CANONICAL_PER_PAGE = int(os.getenv('SEARCH_CANONICAL_PER_PAGE', 50))
+SEARCH_PLANNER_MAX_PAGES = int(os.getenv('SEARCH_PLANNER_MAX_PAGES', 3))  # Сколько страниц дочитывать, если подходящих мало
+CURRENCY_RATES_TTL = float(os.getenv('CURRENCY_RATES_TTL', 86400))  # Курсы валют hh.ru для фильтра зарплаты, сек
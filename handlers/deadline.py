@@ -0,0 +1,29 @@
+import asyncio
+import functools
+from telegram.ext import ConversationHandler
+from utils.deadline import deadline_scope
+from utils.logger import log_warning
+
+DEADLINE_FALLBACK_TEXT = "⏳ Не удалось обработать запрос вовремя. Попробуйте еще раз чуть позже."
+
+
+def with_deadline(callback, budget):
+    """Оборачивает обработчик PTB бюджетом времени.
+
+    budget - число секунд или функция update -> секунды. По истечении
+    бюджета обработка отменяется (вместе со всеми вложенными HTTP- и
+    DB-вызовами), а пользователь получает короткий ответ-заглушку.
+    """
+    @functools.wraps(callback)
+    async def wrapper(update, context, *args, **kwargs):
+        seconds = budget(update) if callable(budget) else budget
+        with deadline_scope(seconds):
+            try:
+                async with asyncio.timeout(seconds):
+                    return await callback(update, context, *args, **kwargs)
+            except TimeoutError:
+                log_warning(f"{callback.__name__}: бюджет {seconds} с исчерпан, обработка прервана.")
+                if update.effective_message:
+                    await update.effective_message.reply_text(DEADLINE_FALLBACK_TEXT)
+                return ConversationHandler.END
+    return wrapper
@@ -0,0 +1,150 @@
+import asyncio
+import re
+from typing import Optional, Tuple
+from telegram import (
+    Update, InlineQueryResultArticle, InputTextMessageContent, InlineQueryResultsButton
+)
+from telegram.ext import ContextTypes
+from services.hh_service import parse_vacancies, get_city_id_by_city_name
+from services.query_planner import get_query_planner
+from handlers.result_pages import render_card, format_salary
+from handlers.start_handler import CITY_IDS
+from utils.deadline import detached
+from utils.logger import log_info, log_warning
+from config.settings import (
+    INLINE_PAGE_SIZE, INLINE_FETCH_TIMEOUT, INLINE_CITY_TIMEOUT, INLINE_CACHE_TIME
+)
+
+# "100000", "100к", "150 тыс", "от 90k"
+SALARY_RE = re.compile(r"^(\d+)(к|k|тыс\.?)?$", re.IGNORECASE)
+SALARY_SUFFIX_RE = re.compile(r"(\d)\s+(к|k|тыс)(?=\.|\s|$)", re.IGNORECASE)
+SALARY_PREFIXES = {"от", "from"}
+SALARY_MIN_VALUE = 1000
+
+# Подсказка под полем ввода, пока результатов нет
+START_PARAMETER = "inline"
+# next_offset: "каноническая страница:сколько подходящих с нее уже показано"
+OFFSET_RE = re.compile(r"^(\d+):(\d+)$")
+
+
+def parse_query(text: str) -> Tuple[str, Optional[str], Optional[int], Optional[str]]:
+    """Разбирает свободный текст inline-запроса.
+
+    Возвращает (должность, id известного города, зарплата от, кандидат в
+    название города). Города из CITY_IDS распознаются в любом месте
+    запроса; последнее слово с заглавной буквы ("python Томск") считается
+    кандидатом, id которого нужно уточнить у hh.ru.
+    """
+    words = SALARY_SUFFIX_RE.sub(r"\1\2", text).split()
+    salary = None
+    kept = []
+    for word in words:
+        match = SALARY_RE.match(word.lower())
+        if match:
+            value = int(match.group(1)) * (1000 if match.group(2) else 1)
+            if value >= SALARY_MIN_VALUE:
+                salary = value
+                if kept and kept[-1].lower() in SALARY_PREFIXES:
+                    kept.pop()
+                continue
+        kept.append(word)
+
+    area = None
+    lowered = [word.lower() for word in kept]
+    for size in (2, 1):
+        for start in range(len(kept) - size + 1):
+            name = " ".join(lowered[start:start + size])
+            # "санкт петербург" и "санкт-петербург" - один и тот же город
+            area = CITY_IDS.get(name) or CITY_IDS.get(name.replace(" ", "-"))
+            if area:
+                del kept[start:start + size]
+                return " ".join(kept), area, salary, None
+    city_name = None
+    if len(kept) > 1 and kept[-1][:1].isupper():
+        city_name = kept[-1]
+    return " ".join(kept), area, salary, city_name
+
+
+async def _resolve_city(position: str, city_name: Optional[str]) -> Tuple[str, Optional[str]]:
+    """Уточняет id города у hh.ru (в кэше alru_cache); не успели или не нашли - это часть должности."""
+    if not city_name:
+        return position, None
+    try:
+        area = await asyncio.wait_for(get_city_id_by_city_name(city_name.lower()), INLINE_CITY_TIMEOUT)
+    except Exception:
+        # Таймаут и ошибки hh.ru не кэшируются - следующий запрос спросит снова
+        area = None
+    if not area:
+        return position, None
+    return position[:-len(city_name)].rstrip(), area
+
+
+def _parse_offset(offset: str) -> Tuple[int, int]:
+    match = OFFSET_RE.match(offset)
+    if not match:
+        return 0, 0
+    return int(match.group(1)), int(match.group(2))
+
+
+def _article(vacancy: dict) -> InlineQueryResultArticle:
+    details = [vacancy.get('company') or "Компания не указана", vacancy.get('area') or "",
+               format_salary(vacancy.get('salary'))]
+    return InlineQueryResultArticle(
+        id=str(vacancy['id']),
+        title=vacancy['title'],
+        description=" · ".join(part for part in details if part),
+        input_message_content=InputTextMessageContent(render_card(vacancy)),
+        url=vacancy['url'],
+    )
+
+
+async def inline_query_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Inline-поиск: "@bot python москва 150к".
+
+    Вакансии берутся через QueryPlanner: те же канонические страницы без
+    зарплаты, что у обычного поиска и упреждающей загрузки, с локальным
+    фильтром по зарплате. Промах кэша ждет hh.ru не дольше
+    INLINE_FETCH_TIMEOUT. Если не успели - отвечаем пустым списком без
+    кэширования на стороне Telegram, а запрос доезжает в фоне и
+    прогревает кэш: следующий символ, набранный пользователем, уже
+    попадет в него. Пагинация - курсор search_page в next_offset.
+    """
+    query = update.inline_query
+    text = query.query.strip()
+    if not text:
+        await query.answer([], cache_time=INLINE_CACHE_TIME)
+        return
+
+    cursor = _parse_offset(query.offset)
+    position, area, salary, city_name = parse_query(text)
+    if area is None:
+        position, area = await _resolve_city(position, city_name)
+    if not position:
+        await query.answer([], cache_time=INLINE_CACHE_TIME)
+        return
+
+    fetch = detached(get_query_planner().search_page(position, area, salary, None, INLINE_PAGE_SIZE, cursor))
+    try:
+        # shield: по таймауту запрос не отменяется, а дописывает кэш в фоне
+        data = await asyncio.wait_for(asyncio.shield(fetch), INLINE_FETCH_TIMEOUT)
+    except asyncio.TimeoutError:
+        log_warning(f"Inline-поиск '{text}' не уложился в {INLINE_FETCH_TIMEOUT} с, ответ из кэша будет позже")
+        await query.answer(
+            [], cache_time=0,
+            button=InlineQueryResultsButton("Ищем вакансии… продолжите ввод", start_parameter=START_PARAMETER)
+        )
+        return
+
+    vacancies = await parse_vacancies(data, store=False) if data else []
+    if not vacancies:
+        await query.answer([], cache_time=0 if data is None else INLINE_CACHE_TIME)
+        return
+
+    next_cursor = data.get('next_cursor')
+    await query.answer(
+        [_article(vacancy) for vacancy in vacancies],
+        # Устаревший ответ (hh.ru недоступен) Telegram не кэширует
+        cache_time=0 if data.get('stale') else INLINE_CACHE_TIME,
+        next_offset=f"{next_cursor[0]}:{next_cursor[1]}" if next_cursor else "",
+    )
+    log_info(f"Inline-поиск '{text}': страница {cursor[0]}, {len(vacancies)} вакансий")
@@ -0,0 +1,86 @@
+from typing import Dict, List, Optional, Tuple
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from config.settings import RESULTS_PER_PAGE
+
+# Единый шаблон карточки вакансии для поиска, похожих вакансий, избранного и inline-режима
+CARD_BODY_TEMPLATE = "{title}\nКомпания: {company}\nГород: {area}\nЗарплата: {salary}\nСсылка: {url}"
+CARD_TEMPLATE = "{number}. " + CARD_BODY_TEMPLATE
+PAGE_HEADER_TEMPLATE = "{title} ({total}):\n\n"
+PAGE_FOOTER_TEMPLATE = "\n\nСтраница {page} из {pages}"
+CARD_SEPARATOR = "\n\n"
+
+# Виды страниц результатов (часть callback_data "page:<вид>:<страница>")
+SEARCH_RESULTS = "search"
+RELATED_RESULTS = "related"
+FAVORITES = "fav"
+
+
+def format_salary(salary: Optional[Dict]) -> str:
+    if not salary:
+        return "Не указана"
+    salary_from, salary_to, currency = salary.get("from"), salary.get("to"), salary.get("currency") or ""
+    if salary_from and salary_to:
+        return f"{salary_from} - {salary_to} {currency}"
+    if salary_from:
+        return f"от {salary_from} {currency}"
+    if salary_to:
+        return f"до {salary_to} {currency}"
+    return "Не указана"
+
+
+def card_fields(item: Dict) -> Dict:
+    """Поля карточки для вакансии parse_vacancies или записи избранного (город в 'city')."""
+    return {
+        'title': item['title'],
+        'company': item.get('company') or "Не указана",
+        'area': item.get('area') or item.get('city') or "Не указан",
+        'salary': format_salary(item.get('salary')),
+        'url': item['url'],
+    }
+
+
+def render_card(item: Dict) -> str:
+    return CARD_BODY_TEMPLATE.format(**card_fields(item))
+
+
+def page_count(total: int) -> int:
+    return max(1, (total + RESULTS_PER_PAGE - 1) // RESULTS_PER_PAGE)
+
+
+def _item_buttons(kind: str, item: Dict, number: int, page: int) -> List[InlineKeyboardButton]:
+    if kind == FAVORITES:
+        return [InlineKeyboardButton(
+            f"❌ {number}", callback_data=f"remove_fav:{item['id']}:{item['db_id']}:{page}"
+        )]
+    return [
+        InlineKeyboardButton(f"⭐ {number}", callback_data=f"add_fav:{item['id']}"),
+        InlineKeyboardButton(f"🔍 {number}", callback_data=f"related:{item['id']}"),
+    ]
+
+
+def render_page(kind: str, title: str, items: List[Dict], page: int) -> Tuple[str, InlineKeyboardMarkup]:
+    """Одна страница результатов: текст со всеми карточками и кнопки.
+
+    items - вакансии в формате parse_vacancies или записи избранного
+    (город в 'city' вместо 'area'). Под текстом - по строке кнопок на
+    карточку (номер кнопки совпадает с номером карточки) и навигация.
+    """
+    pages = page_count(len(items))
+    page = min(max(page, 1), pages)
+    first = (page - 1) * RESULTS_PER_PAGE
+    cards = []
+    rows = []
+    for number, item in enumerate(items[first:first + RESULTS_PER_PAGE], first + 1):
+        cards.append(CARD_TEMPLATE.format(number=number, **card_fields(item)))
+        rows.append(_item_buttons(kind, item, number, page))
+
+    text = PAGE_HEADER_TEMPLATE.format(title=title, total=len(items)) + CARD_SEPARATOR.join(cards)
+    if pages > 1:
+        text += PAGE_FOOTER_TEMPLATE.format(page=page, pages=pages)
+        navigation = []
+        if page > 1:
+            navigation.append(InlineKeyboardButton("⬅️ Назад", callback_data=f"page:{kind}:{page - 1}"))
+        if page < pages:
+            navigation.append(InlineKeyboardButton("Вперед ➡️", callback_data=f"page:{kind}:{page + 1}"))
+        rows.append(navigation)
+    return text, InlineKeyboardMarkup(rows)
@@ -1,12 +1,18 @@
 import re
+import asyncio
 from telegram import Update, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import ContextTypes, ConversationHandler, CallbackQueryHandler
 from utils.logger import log_warning, log_info, log_error
-from services.hh_service import fetch_vacancies, parse_vacancies, get_vacancies_stats, get_city_id_by_city_name, fetch_related_vacancies
-from services.database import DatabaseHandler
+from services.hh_service import parse_vacancies, get_vacancies_stats, get_city_id_by_city_name, fetch_related_vacancies
+from services.database import get_db_handler
+from services.session_store import get_session_store
+from services.search_prefetch import get_search_prefetcher
+from services.query_planner import get_query_planner
 from services.osm_service import get_city_by_location
 from handlers.subscription_handlers import add_subscription_handler, list_subscriptions_handler
 from utils.parse_salary import parse_salary
+from handlers.result_pages import render_page, SEARCH_RESULTS, RELATED_RESULTS, FAVORITES
+from config.settings import ANALYTICS_MAX_VACANCIES, PREFETCH_ENABLED
 
 # Определение состояний для ConversationHandler
 CITY, POSITION, SALARY, NUMBER_OF_VACANCIES, SEARCH, HISTORY = range(6)
@@ -20,6 +26,9 @@ POSITIONS = ["Разработчик", "Дизайнер", "Менеджер",
 # Предопределенные диапазоны зарплат
 SALARY_RANGES = ["Не важно", "0-30,000", "30,000-60,000", "60,000-100,000", "Более 100,000"]
 
+# Предупреждение, когда hh.ru недоступен и показаны сохраненные результаты
+STALE_DATA_WARNING = "⚠️ hh.ru сейчас недоступен, показаны ранее сохраненные результаты."
+
 # Словарь соответствия городов и их ID в API HH.ru
 CITY_IDS = {
     "москва": "1",
@@ -47,6 +56,8 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     ]
     reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
+    # Перезапуск прерывает начатый поиск вместе с его упреждающей загрузкой
+    get_search_prefetcher().cancel(user.id)
     log_warning(f"Пользователь запустил бота.")
     await update.message.reply_html(text=welcome_message, reply_markup=reply_markup)
     return ConversationHandler.END
@@ -57,6 +68,8 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     message_text = update.message.text
 
     if message_text == "Поиск вакансий":
+        # Новый поиск: результаты прошлого выбора больше не нужны
+        get_search_prefetcher().cancel(update.effective_user.id)
         await show_city_selection(update, context)
         return CITY
     elif message_text == "Аналитика":
@@ -69,17 +82,15 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             
         await update.message.reply_text("Собираем аналитику...")
         
-        count = 100
-        stats = await get_vacancies_stats(position, city_id, count=count)
+        stats = await get_vacancies_stats(position, city_id, count=ANALYTICS_MAX_VACANCIES)
         
         if stats['vacancies_count'] == 0:
             await update.message.reply_text("Не удалось собрать аналитику")
             return ConversationHandler.END
+        if stats.get("stale"):
+            await update.message.reply_text(STALE_DATA_WARNING)
             
         exp_dist = stats['experience_distribution']
-        skills = stats['skills_counter']
-        skills_top5 = skills[:5]
-        skils_last3 = skills[-4:-1]
         total_exp = sum(exp_dist.values()) if sum(exp_dist.values()) > 0 else 1
         
         message = (f"📊 Аналитика по вакансиям:\n"
@@ -97,18 +108,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                   f"- 1-3 года: {exp_dist['1-3_years']} ({round(exp_dist['1-3_years']/total_exp*100)}%)\n"
                   f"- 3-6 лет: {exp_dist['3-6_years']} ({round(exp_dist['3-6_years']/total_exp*100)}%)\n"
                   f"- Более 6 лет: {exp_dist['more_than_6']} ({round(exp_dist['more_than_6']/total_exp*100)}%)\n\n"
-                  f"📊 Статистика навыков (на основе 50 вакансий):\n"
-                  f"🔥 Топ-3 самых частых:\n"
-                  f"- {skills_top5[0][0]} - {skills_top5[0][1]} упоминаний ({round(skills_top5[0][1] / count * 100)}% вакансий)\n"
-                  f"- {skills_top5[1][0]} - {skills_top5[1][1]} упоминаний ({round(skills_top5[1][1] / count * 100)}% вакансий)\n"
-                  f"- {skills_top5[2][0]} - {skills_top5[2][1]} упоминаний ({round(skills_top5[2][1] / count * 100)}% вакансий)\n"
-                  f"- {skills_top5[3][0]} - {skills_top5[3][1]} упоминаний ({round(skills_top5[3][1] / count * 100)}% вакансий)\n"
-                  f"- {skills_top5[4][0]} - {skills_top5[4][1]} упоминаний ({round(skills_top5[4][1] / count * 100)}% вакансий)\n"
-                  f"🛠 Редкие, но полезные:\n"
-                  f"- {skils_last3[0][0]} - {skils_last3[0][1]} ({round(skils_last3[0][1] / count * 100)}% вакансий)\n"
-                  f"- {skils_last3[1][0]} - {skils_last3[1][1]} ({round(skils_last3[1][1] / count * 100)}% вакансий)\n"
-                  f"💡 Рекомендации:\n"
-                  f"* {skills_top5[0][0]}, {skills_top5[1][0]} и {skills_top5[2][0]} - ключевые навыки для {position}."
+                  + format_skills_stats(stats, position)
         )
                   
         await update.message.reply_text(message)
@@ -121,19 +121,49 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await show_search_history(update, context)
         return HISTORY
     elif message_text == "Подписки":
-        await list_subscriptions_handler(DatabaseHandler(), update, context)
+        await list_subscriptions_handler(get_db_handler(), update, context)
         return ConversationHandler.END
     elif message_text == "Подписаться на обновления":
         if not context.user_data.get('position'):
             await update.message.reply_text("Сначала выполните поиск вакансий")
             return ConversationHandler.END
-        await add_subscription_handler(DatabaseHandler(), update, context)
+        await add_subscription_handler(get_db_handler(), update, context)
         return ConversationHandler.END
 
     else:
         return ConversationHandler.END
 
 
+def format_skills_stats(stats: dict, position: str) -> str:
+    """Блок навыков аналитики для любого числа найденных навыков."""
+    skills = stats.get('skills_counter', [])
+    sample = stats.get('skills_sample') or stats['vacancies_count']
+    if not skills:
+        return "📊 Статистика навыков: недостаточно данных."
+
+    def share(skill_count):
+        return round(skill_count / sample * 100)
+
+    source = "ключевые навыки hh.ru" if stats.get('skills_source') == "key_skills" else "текст требований"
+    top = skills[:5]
+    # Редкие - из хвоста списка, не пересекаясь с самыми частыми
+    rare = skills[max(len(top), len(skills) - 4):len(skills) - 1][:2]
+    lines = [f"📊 Статистика навыков ({source}, {sample} из {stats['vacancies_count']} вакансий):",
+             "🔥 Самые частые:"]
+    lines += [f"- {name} - {count} упоминаний ({share(count)}% вакансий)" for name, count in top]
+    if rare:
+        lines.append("🛠 Редкие, но полезные:")
+        lines += [f"- {name} - {count} ({share(count)}% вакансий)" for name, count in rare]
+    key_skills = [name for name, _ in top[:3]]
+    if len(key_skills) > 1:
+        key_skills = f"{', '.join(key_skills[:-1])} и {key_skills[-1]}"
+    else:
+        key_skills = key_skills[0]
+    lines.append("💡 Рекомендации:")
+    lines.append(f"* {key_skills} - ключевые навыки для {position}.")
+    return "\n".join(lines)
+
+
 async def show_city_selection(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показать пользователю выбор города для поиска вакансий."""
     # Создаем клавиатуру с кнопками городов и определением местоположения
@@ -164,7 +194,11 @@ async def city_selection_handler(update: Update, context: ContextTypes.DEFAULT_T
 
     # Сохраняем выбранный город
     context.user_data['city'] = city
-    city_id = await get_city_id_by_city_name(city)
+    try:
+        city_id = await get_city_id_by_city_name(city)
+    except Exception:
+        await update.message.reply_text("Не удалось связаться с hh.ru, попробуйте выбрать город еще раз")
+        return CITY
     if not city_id:
         await update.message.reply_text("Не удалось определить ID города, попробуйте ввести название заново ")
         return CITY
@@ -178,7 +212,11 @@ async def city_selection_handler(update: Update, context: ContextTypes.DEFAULT_T
 async def custom_city_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик ввода пользовательского города."""
     city = update.message.text
-    city_id = await get_city_id_by_city_name(city)
+    try:
+        city_id = await get_city_id_by_city_name(city)
+    except Exception:
+        await update.message.reply_text("Не удалось связаться с hh.ru, попробуйте ввести город еще раз")
+        return CITY
     if not city_id:
         await update.message.reply_text("Ошибка в названии города, попробуйте ввести название заново ")
         return CITY
@@ -270,6 +308,7 @@ async def handle_position_selection(update: Update, context: ContextTypes.DEFAUL
         
         context.user_data['awaiting_custom_position'] = False
         context.user_data['position'] = text
+        _start_prefetch(update, context)
         await update.message.reply_text(
             f"Вы выбрали должность: {text}",
             reply_markup=ReplyKeyboardRemove()
@@ -279,6 +318,7 @@ async def handle_position_selection(update: Update, context: ContextTypes.DEFAUL
     
     # Сохраняем выбранную должность
     context.user_data['position'] = text
+    _start_prefetch(update, context)
     await update.message.reply_text(
         f"Вы выбрали должность: {text}",
         reply_markup=ReplyKeyboardRemove()
@@ -287,6 +327,20 @@ async def handle_position_selection(update: Update, context: ContextTypes.DEFAUL
     return SALARY
 
 
+def _start_prefetch(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Город и должность известны - результаты начинают грузиться, пока выбираются зарплата и количество."""
+    if PREFETCH_ENABLED:
+        get_search_prefetcher().start(
+            update.effective_user.id, context.user_data['position'], context.user_data.get('city_id')
+        )
+
+
+async def _load_results(user_id: int, position: str, city_id, salary_from, salary_to, count: int):
+    """Ответ hh.ru для поиска: каноническая страница (упреждающая загрузка или кэш), отфильтрованная локально."""
+    first_page = await get_search_prefetcher().take(user_id, position, city_id) if PREFETCH_ENABLED else None
+    return await get_query_planner().search(position, city_id, salary_from, salary_to, count, first_page=first_page)
+
+
 async def show_salary_selection(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показать пользователю выбор желаемой зарплаты."""
     # Создаем клавиатуру с кнопками зарплат
@@ -343,86 +397,62 @@ async def search_vacancies(update: Update, context: ContextTypes.DEFAULT_TYPE):
     salary_range = context.user_data.get('salary', 'Не указана')
     number_of_vacancies = context.user_data.get('number_of_vacancies', 3)
 
-    await update.message.reply_text(f"Ищем вакансии по следующим параметрам:\n"
-                                    f"Город: {city}\n"
-                                    f"Должность: {position}\n"
-                                    f"Зарплата: {salary_range}\n\n"
-                                    f"Пожалуйста, подождите...")
+    # Основные кнопки показываем сразу, чтобы не отправлять отдельное сообщение после результатов
+    keyboard = [
+        [KeyboardButton("Поиск вакансий")],
+        [KeyboardButton("Избранное")],
+        [KeyboardButton("История поиска")],
+        [
+            KeyboardButton("Аналитика"), 
+            KeyboardButton("Подписаться на обновления")
+        ]
+    ]
+    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
     salary_from, salary_to = parse_salary(salary_range)
 
-    # Получаем вакансии через API HH.ru
-    vacancies_data = await fetch_vacancies(position, city_id, salary_from, salary_to, per_page=number_of_vacancies)
+    # Сообщение о поиске уходит параллельно с запросом к API HH.ru
+    _, vacancies_data = await asyncio.gather(
+        update.message.reply_text(f"Ищем вакансии по следующим параметрам:\n"
+                                  f"Город: {city}\n"
+                                  f"Должность: {position}\n"
+                                  f"Зарплата: {salary_range}\n\n"
+                                  f"Пожалуйста, подождите...",
+                                  reply_markup=reply_markup),
+        _load_results(update.effective_user.id, position, city_id, salary_from, salary_to, number_of_vacancies)
+    )
     if not vacancies_data:
         await update.message.reply_text("К сожалению, не удалось получить вакансии. Попробуйте позже.")
         return
 
     # Парсим полученные данные
-    vacancies = parse_vacancies(vacancies_data)
+    vacancies = await parse_vacancies(vacancies_data)
 
     if not vacancies:
         await update.message.reply_text("По вашему запросу не найдено вакансий.")
         return
 
     # Сохраняем запрос в историю
-    db_handler = DatabaseHandler()
-    db_handler.save_search_history(
+    db_handler = get_db_handler()
+    await db_handler.save_search_history(
         user_id=update.effective_user.id,
         position=position,
         city=city,
         salary_range=salary_range,
         vacancies_count=len(vacancies)
     )
-    db_handler.close()
-
-    # Отправляем результаты пользователю
-    await update.message.reply_text(f"Найдено {len(vacancies)} вакансий:")
-
-    for i, vacancy in enumerate(vacancies, 1):
-        salary_info = "Не указана"
-        if vacancy.get("salary"):
-            salary_from = vacancy["salary"].get("from", "")
-            salary_to = vacancy["salary"].get("to", "")
-            salary_currency = vacancy["salary"].get("currency", "")
-
-            if salary_from and salary_to:
-                salary_info = f"{salary_from} - {salary_to} {salary_currency}"
-            elif salary_from:
-                salary_info = f"от {salary_from} {salary_currency}"
-            elif salary_to:
-                salary_info = f"до {salary_to} {salary_currency}"
-
-        vacancy_text = (f"{i}. {vacancy['title']}\n"
-                        f"Компания: {vacancy['company']}\n"
-                        f"Город: {vacancy['area']}\n"
-                        f"Зарплата: {salary_info}\n"
-                        f"Ссылка: {vacancy['url']}\n")
-
-        context.user_data[f'vacancy_{vacancy["id"]}'] = vacancy
-        keyboard = InlineKeyboardMarkup([
-            [InlineKeyboardButton('Добавить в избранное', callback_data=f'add_fav:{vacancy["id"]}')],
-            [InlineKeyboardButton('🔍 Похожие вакансии', callback_data=f'related:{vacancy["id"]}')]
-        ])
-        await update.message.reply_text(vacancy_text, reply_markup=keyboard)
-
-    # Возвращаем клавиатуру с основными кнопками
-    keyboard = [
-        [KeyboardButton("Поиск вакансий")],
-        [KeyboardButton("Избранное")],
-        [KeyboardButton("История поиска")],
-        [
-            KeyboardButton("Аналитика"), 
-            KeyboardButton("Подписаться на обновления")
-        ]
-    ]
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-    await update.message.reply_text("Хотите выполнить новый поиск или воспользоваться другими функциями?",
-                                    reply_markup=reply_markup)
+
+    # Запоминаем показанные вакансии для кнопок и листания
+    await get_session_store().remember_results(update.effective_user.id, SEARCH_RESULTS, vacancies)
+
+    # Все результаты - одним сообщением со страницами
+    text, keyboard = render_page(SEARCH_RESULTS, "Найдено вакансий", vacancies, page=1)
+    if vacancies_data.get("stale"):
+        text = f"{STALE_DATA_WARNING}\n\n{text}"
+    await update.message.reply_text(text, reply_markup=keyboard, disable_web_page_preview=True)
 
 async def show_related_vacancies(update: Update, context: ContextTypes.DEFAULT_TYPE, vacancy_id: str):
     """Запрос и отображение похожих вакансий."""
-    await update.callback_query.message.reply_text("Ищем похожие вакансии...")
-
     try:
         # Запрос к API HH
         related_data = await fetch_related_vacancies(vacancy_id)
@@ -430,30 +460,16 @@ async def show_related_vacancies(update: Update, context: ContextTypes.DEFAULT_T
             await update.callback_query.message.reply_text("Похожих вакансий не найдено.")
             return
 
-        # Парсинг и вывод (аналогично основному поиску)
-        vacancies = parse_vacancies(related_data)
-        for vacancy in vacancies[:2]:  # Ограничим вывод 2 вакансиями
-            salary_info = "Не указана"
-            if vacancy.get("salary"):
-                salary_from = vacancy["salary"].get("from", "")
-                salary_to = vacancy["salary"].get("to", "")
-                salary_currency = vacancy["salary"].get("currency", "")
-
-                if salary_from and salary_to:
-                    salary_info = f"{salary_from} - {salary_to} {salary_currency}"
-                elif salary_from:
-                    salary_info = f"от {salary_from} {salary_currency}"
-                elif salary_to:
-                    salary_info = f"до {salary_to} {salary_currency}"
-            text = (f"🔹 {vacancy['title']}\n"
-                    f"Компания: {vacancy['company']}\n"
-                    f"Зарплата: {salary_info}\n"
-                    f"Ссылка: {vacancy['url']}")
-            keyboard = InlineKeyboardMarkup([
-            [InlineKeyboardButton('Добавить в избранное', callback_data=f'add_fav:{vacancy["id"]}')],
-            [InlineKeyboardButton('🔍 Похожие вакансии', callback_data=f'related:{vacancy["id"]}')]
-        ])
-            await update.callback_query.message.reply_text(text, reply_markup=keyboard)
+        # Парсинг и вывод (тем же шаблоном, что и основной поиск)
+        vacancies = await parse_vacancies(related_data)
+        if not vacancies:
+            await update.callback_query.message.reply_text("Похожих вакансий не найдено.")
+            return
+        await get_session_store().remember_results(update.effective_user.id, RELATED_RESULTS, vacancies)
+        text, keyboard = render_page(RELATED_RESULTS, "🔍 Похожие вакансии", vacancies, page=1)
+        if related_data.get("stale"):
+            text = f"{STALE_DATA_WARNING}\n\n{text}"
+        await update.callback_query.message.reply_text(text, reply_markup=keyboard, disable_web_page_preview=True)
     
     except Exception as e:
         log_error(f"Ошибка при поиске похожих вакансий: {e}")
@@ -462,62 +478,76 @@ async def show_related_vacancies(update: Update, context: ContextTypes.DEFAULT_T
 # --- Новый CallbackQueryHandler для избранного ---
 async def favorite_callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
-    await query.answer()
     user_id = update.effective_user.id
-    db_handler = DatabaseHandler()
+    db_handler = get_db_handler()
     data = query.data.split(':')
     action = data[0]
     vacancy_id = data[1]
     db_id = int(data[2]) if len(data) > 2 else None
+    page = int(data[3]) if len(data) > 3 else 1
     
     if action == "related":
+        await query.answer("Ищем похожие вакансии...")
         await show_related_vacancies(update, context, vacancy_id)
-    if action == 'add_fav':
-        # vacancy_data должен быть сохранён в context.user_data при показе вакансий
-        vacancy_data = context.user_data.get(f'vacancy_{vacancy_id}')
+    elif action == 'add_fav':
+        # vacancy_data сохраняется в хранилище сессий при показе вакансий
+        vacancy_data = await get_session_store().get_vacancy(user_id, vacancy_id)
         if vacancy_data:
-            db_handler.add_to_favorites(user_id, vacancy_data)
-            await query.edit_message_reply_markup(reply_markup=None)
-            await query.message.reply_text('Вакансия добавлена в избранное!')
+            await db_handler.add_to_favorites(user_id, vacancy_data)
+            # Кнопки остальных вакансий на странице остаются, поэтому ответ - всплывающим уведомлением
+            await query.answer('Вакансия добавлена в избранное!')
+        else:
+            await query.answer('Результаты устарели, выполните поиск заново.')
     elif action == 'remove_fav' and db_id:
-        db_handler.remove_from_favorites(user_id, db_id)
-        await query.edit_message_reply_markup(reply_markup=None)
-        await query.message.reply_text('Вакансия удалена из избранного!')
-    db_handler.close()
+        await db_handler.remove_from_favorites(user_id, db_id)
+        await query.answer('Вакансия удалена из избранного!')
+        await show_favorites(update, context, page=page)
+    else:
+        await query.answer()
+
+async def page_callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Листание страниц результатов: сообщение редактируется на месте."""
+    query = update.callback_query
+    _, kind, page = query.data.split(':')
+    if kind == FAVORITES:
+        await query.answer()
+        await show_favorites(update, context, page=int(page))
+        return
+    vacancies = get_session_store().get_results(update.effective_user.id, kind)
+    if not vacancies:
+        await query.answer('Результаты устарели, выполните поиск заново.')
+        return
+    await query.answer()
+    title = "Найдено вакансий" if kind == SEARCH_RESULTS else "🔍 Похожие вакансии"
+    text, keyboard = render_page(kind, title, vacancies, int(page))
+    await query.edit_message_text(text, reply_markup=keyboard, disable_web_page_preview=True)
 
 # --- Изменяем обработку кнопки "Избранное" ---
-async def show_favorites(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def show_favorites(update: Update, context: ContextTypes.DEFAULT_TYPE, page: int = 1):
     user_id = update.effective_user.id
-    db_handler = DatabaseHandler()
-    favorites = db_handler.get_favorites(user_id)
-    db_handler.close()
+    db_handler = get_db_handler()
+    favorites = await db_handler.get_favorites(user_id)
     if not favorites:
-        await update.message.reply_text('У вас нет избранных вакансий.')
+        if update.callback_query:
+            await update.callback_query.edit_message_text('У вас нет избранных вакансий.')
+        else:
+            await update.message.reply_text('У вас нет избранных вакансий.')
         return
-    for fav in favorites:
-        salary = fav['salary']
-        salary_info = 'Не указана'
-        if salary['from'] and salary['to']:
-            salary_info = f"{salary['from']} - {salary['to']} {salary['currency']}"
-        elif salary['from']:
-            salary_info = f"от {salary['from']} {salary['currency']}"
-        elif salary['to']:
-            salary_info = f"до {salary['to']} {salary['currency']}"
-        text = (f"{fav['title']}\nКомпания: {fav['company']}\nГород: {fav['city']}\nЗарплата: {salary_info}\nСсылка: {fav['url']}")
-        keyboard = InlineKeyboardMarkup([
-            [InlineKeyboardButton('Удалить из избранного', callback_data=f'remove_fav:{fav["id"]}:{fav["db_id"]}')]
-        ])
-        await update.message.reply_text(text, reply_markup=keyboard)
+    text, keyboard = render_page(FAVORITES, "⭐ Избранное", favorites, page)
+    # При листании и удалении обновляем то же сообщение
+    if update.callback_query:
+        await update.callback_query.edit_message_text(text, reply_markup=keyboard, disable_web_page_preview=True)
+    else:
+        await update.message.reply_text(text, reply_markup=keyboard, disable_web_page_preview=True)
 
 async def show_search_history(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показать историю поиска с пагинацией."""
     user_id = update.effective_user.id
     page = context.user_data.get('history_page', 1)
     
-    db_handler = DatabaseHandler()
-    history, total_count = db_handler.get_search_history(user_id, page=page)
+    db_handler = get_db_handler()
+    history, total_count = await db_handler.get_search_history(user_id, page=page)
     # print('/n'*5 + "history = " + '/n'*5)
-    db_handler.close()
 
     if not history:
         await update.message.reply_text("У вас пока нет истории поиска.")
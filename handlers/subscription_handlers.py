@@ -2,14 +2,15 @@ from typing import Dict, List, Optional
 from datetime import datetime
 from telegram import KeyboardButton, ReplyKeyboardMarkup, Update
 from telegram.ext import ContextTypes, ConversationHandler
-from services.database import DatabaseHandler
+from services.database import AsyncDatabaseHandler, get_db_handler
+from services.subscription_index import get_subscription_index
 from utils.parse_salary import parse_salary
 
 # Определение состояний для ConversationHandler
 GET_SUBSCRIPTIONS_NUMBERS = 0
 
 async def add_subscription_handler(
-    db: DatabaseHandler,
+    db: AsyncDatabaseHandler,
     update: Update,
     context: ContextTypes.DEFAULT_TYPE
 ) -> None:
@@ -25,13 +26,23 @@ async def add_subscription_handler(
     location=context.user_data.get('city', 'Не указан')
     
     user_id = update.effective_user.id
-    success = db.add_subscription(
+    subscription_id = await db.add_subscription(
         user_id=user_id,
         position=position,
         salary_min=salary_min,
         salary_max=salary_max,
         location=location
     )
+    success = subscription_id is not None
+    if success:
+        get_subscription_index().add({
+            'id': subscription_id,
+            'user_id': user_id,
+            'position': position,
+            'location': location,
+            'salary_min': salary_min,
+            'salary_max': salary_max
+        })
     
     # Форматируем информацию о зарплате
     salary_range = ""
@@ -68,13 +79,13 @@ async def add_subscription_handler(
     
 
 async def list_subscriptions_handler(
-    db: DatabaseHandler,
+    db: AsyncDatabaseHandler,
     update: Update,
     context: ContextTypes.DEFAULT_TYPE
 ) -> None:
     """Handle subscription listing and send response directly to user"""
     user_id = update.effective_user.id
-    subscriptions = db.get_active_subscriptions(user_id)
+    subscriptions = await db.get_active_subscriptions(user_id)
     
     if not subscriptions:
         await update.message.reply_text('У вас пока нет активных подписок')
@@ -134,14 +145,15 @@ async def get_subscriptions_to_remove(update: Update, context: ContextTypes.DEFA
         await update.message.reply_text("Неверный формат. Введите через пробел номера подписок для удаления.")
         return GET_SUBSCRIPTIONS_NUMBERS
     
-    db = DatabaseHandler()
-    subscriptions = db.get_active_subscriptions(user_id)
+    db = get_db_handler()
+    subscriptions = await db.get_active_subscriptions(user_id)
     for sub in subscriptions_numbers:
         try:
             sub_id = subscriptions[sub - 1]["id"]
         except Exception:
             await update.message.reply_text(f"Ошибка удаления подписки №{sub}")
-        if db.remove_subscription(user_id, sub_id):
+        if await db.remove_subscription(user_id, sub_id):
+            get_subscription_index().remove(sub_id)
             continue
         else:
             await update.message.reply_text("❌ Ошибка удаления подписок",reply_markup=reply_markup)
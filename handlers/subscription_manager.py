@@ -1,91 +1,284 @@
+import asyncio
+import os
+import socket
 import time
-from typing import List, Dict
-from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
+from datetime import timedelta
+from typing import List, Dict, Optional, Tuple
 from telegram.ext import ContextTypes
-from utils.logger import log_error
-from services.database import DatabaseHandler
+from utils.logger import log_info, log_warning, log_error
+from services.database import get_db_handler
+from services.delivery_queue import DeliveryQueue
+from services.subscription_index import get_subscription_index
+from utils.seen_set import SeenSet
+from services.hh_service import (
+    fetch_new_vacancies, parse_vacancies, parse_published_at, get_city_id_by_city_name, get_currency_rates
+)
+from config.settings import (
+    SUBSCRIPTION_POLL_CONCURRENCY, SUBSCRIPTION_FETCH_SIZE, SUBSCRIPTION_MAX_PAGES,
+    SUBSCRIPTION_POLL_INTERVAL, SUBSCRIPTION_LEASE_TTL, SUBSCRIPTION_LEASE_BATCH,
+    SUBSCRIPTION_RETRY_DELAY, SEEN_SET_WINDOW, SEEN_SET_GENERATIONS, SEEN_SET_MAX_IDS,
+    SUBSCRIPTION_INDEX_ENABLED, SUBSCRIPTION_TICK_INTERVAL, SUBSCRIPTION_GROUP_SYNC_INTERVAL
+)
+
 
 class SubscriptionManager:
-    def __init__(self):
-        self.db = DatabaseHandler()
+    """Фоновая проверка подписок.
 
-    async def add_subscription(self, user_id: int, position: str, city: str, salary_range: str) -> bool:
-        """Add a new job subscription"""
-        try:
-            return self.db.execute_query("""
-                INSERT INTO subscriptions 
-                (user_id, position, city, salary_range, last_checked)
-                VALUES (%s, %s, %s, %s, %s)
-                ON CONFLICT (user_id, position, city, salary_range) DO UPDATE
-                SET last_checked = EXCLUDED.last_checked
-            """, (user_id, position, city, salary_range, int(time.time())))
-        except Exception as e:
-            log_error(f"Error adding subscription: {e}")
-            return False
+    Подписки с одинаковыми параметрами (должность, город, зарплата)
+    объединяются в группу: за цикл hh.ru запрашивается один раз на группу,
+    а результат рассылается всем ее подписчикам. Стоимость цикла зависит
+    от числа различных запросов, а не от числа подписчиков.
 
-    async def remove_subscription(self, user_id: int, subscription_id: int) -> bool:
-        """Remove a subscription"""
-        try:
-            return self.db.execute_query("""
-                DELETE FROM subscriptions
-                WHERE user_id = %s AND id = %s
-            """, (user_id, subscription_id))
-        except Exception as e:
-            log_error(f"Error removing subscription: {e}")
+    Группы делятся между процессами (бот и python -m handlers.subscription_worker)
+    через аренду строк subscription_groups: каждый процесс забирает созревшие
+    группы, проверяет их и назначает следующий запуск через
+    SUBSCRIPTION_POLL_INTERVAL. Аренда упавшего процесса истекает через
+    SUBSCRIPTION_LEASE_TTL, и его группы забирают остальные. Строка группы
+    создается вместе с подпиской; полная сверка с таблицей subscriptions
+    идет раз в SUBSCRIPTION_GROUP_SYNC_INTERVAL.
+
+    Найденные для группы вакансии дополнительно сопоставляются через
+    SubscriptionIndex со всеми подписками, и подходящие подписчики
+    других групп получают их, не дожидаясь проверки своей группы.
+    """
+
+    def __init__(self, delivery_queue: DeliveryQueue, worker_id: Optional[str] = None):
+        self.db = get_db_handler()
+        self.delivery_queue = delivery_queue
+        self.index = get_subscription_index()
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.cycles = 0
+        self.groups_checked = 0
+        self.queries = 0  # Запросов к hh.ru за все циклы
+        self.notifications = 0  # Отправленных уведомлений о вакансиях
+        self.fanned_out = 0  # Доставок через индекс подписчикам других групп
+        self._groups_synced_at: Optional[float] = None
+
+    async def refresh_index(self, context: Optional[ContextTypes.DEFAULT_TYPE] = None):
+        """Перестройка индекса подписок из БД (задача JobQueue)."""
+        self.index.rebuild(await self.db.get_subscriptions_for_index())
+
+    async def poll(self, context: Optional[ContextTypes.DEFAULT_TYPE] = None):
+        """Проверка всех созревших групп, арендованных этим процессом (задача JobQueue)."""
+        now = time.monotonic()
+        if self._groups_synced_at is None or now - self._groups_synced_at >= SUBSCRIPTION_GROUP_SYNC_INTERVAL:
+            if await self.db.sync_subscription_groups():
+                self._groups_synced_at = now
+        semaphore = asyncio.Semaphore(SUBSCRIPTION_POLL_CONCURRENCY)
+
+        async def check(group, rates):
+            async with semaphore:
+                # Доставка может идти дольше SUBSCRIPTION_LEASE_TTL - аренда продлевается, пока группа в работе
+                renewal = asyncio.create_task(self.keep_lease(group['group_key']))
+                try:
+                    backlog = await self.check_group(group, rates)
+                    # Недочитанный прирост забирается со следующим тиком, а не через полный период
+                    next_run_in = SUBSCRIPTION_TICK_INTERVAL if backlog else SUBSCRIPTION_POLL_INTERVAL
+                except Exception as e:
+                    log_error(f"Error checking subscription group {group['position']}/{group['location']}: {e}")
+                    next_run_in = SUBSCRIPTION_RETRY_DELAY
+                finally:
+                    renewal.cancel()
+                if not await self.db.complete_subscription_group(group['group_key'], self.worker_id, next_run_in):
+                    log_error(f"Lease on subscription group {group['group_key']} expired before completion")
+
+        groups_total = subscribers = 0
+        rates = None
+        while True:
+            groups = await self.db.claim_subscription_groups(
+                self.worker_id, SUBSCRIPTION_LEASE_BATCH, SUBSCRIPTION_LEASE_TTL
+            )
+            if not groups:
+                break
+            if rates is None and SUBSCRIPTION_INDEX_ENABLED:
+                # Курсы нужны индексу для вакансий в других валютах - один раз за цикл
+                rates = await self.currency_rates()
+            await asyncio.gather(*(check(group, rates) for group in groups))
+            groups_total += len(groups)
+            subscribers += sum(len(group['subscribers']) for group in groups)
+        if not groups_total:
+            return
+        self.cycles += 1
+        self.groups_checked += groups_total
+        log_info(
+            f"Subscription cycle {self.cycles} on {self.worker_id}: "
+            f"{groups_total} queries for {subscribers} subscriptions"
+        )
+
+    async def keep_lease(self, group_key: str):
+        """Продлевает аренду группы каждую треть SUBSCRIPTION_LEASE_TTL, пока задачу не отменят."""
+        while True:
+            await asyncio.sleep(SUBSCRIPTION_LEASE_TTL / 3)
+            if not await self.db.extend_subscription_group_lease(group_key, self.worker_id, SUBSCRIPTION_LEASE_TTL):
+                log_warning(f"Lease on subscription group {group_key} was lost while checking it")
+                return
+
+    async def check_group(self, group: Dict, rates: Optional[Dict[str, float]] = None) -> bool:
+        """Проверка одной группы подписок и рассылка новых вакансий.
+
+        Отметка last_vacancy_time подписчика сдвигается, а отправленные id
+        добавляются в его SeenSet только после того, как очередь доставки
+        подтвердила отправку. Недоставленные вакансии остаются за отметкой
+        и уйдут при следующей проверке группы. Если процесс упадет между
+        отправкой и сохранением, вакансии придут повторно - доставка не
+        менее одного раза. Повтор после переопубликации или после того,
+        как группу проверил другой процесс, отсекает SeenSet.
+
+        rates - курсы валют hh.ru для сопоставления через индекс (fan_out).
+
+        Returns:
+            bool: True, если прирост загружен не весь и группу нужно
+            проверить снова, не дожидаясь SUBSCRIPTION_POLL_INTERVAL
+        """
+        if not group['subscribers']:
             return False
+        vacancies, truncated = await self.check_new_vacancies(group)
+        if not vacancies:
+            return False
+        newest = max(parse_published_at(vacancy) for vacancy in vacancies)
+        if truncated:
+            # Загружены самые старые новые вакансии; более новые с той же
+            # секундой публикации могли остаться на непрочитанной странице -
+            # их повтор после сдвига отметки отсечет SeenSet
+            newest -= timedelta(seconds=1)
+            log_warning(
+                f"Subscription group {group['position']}/{group['location']}: "
+                f"backlog left, mark moved only to {newest.isoformat()}"
+            )
 
-    async def get_user_subscriptions(self, user_id: int) -> List[Dict]:
-        """Get all subscriptions for a user"""
-        try:
-            rows = self.db.execute_query("""
-                SELECT id, position, city, salary_range, last_checked
-                FROM subscriptions
-                WHERE user_id = %s
-            """, (user_id,), fetch=True)
-            return [{
-                'id': row[0],
-                'position': row[1],
-                'city': row[2],
-                'salary_range': row[3],
-                'last_checked': row[4]
-            } for row in rows]
-        except Exception as e:
-            log_error(f"Error getting subscriptions: {e}")
-            return []
+        subscription_ids = [subscriber['id'] for subscriber in group['subscribers']]
+        delivered = await self.deliver(subscription_ids, lambda subscriber: vacancies)
+        failed = {subscription_id for subscription_id, sent in delivered.items() if sent is None}
+        if failed:
+            log_warning(
+                f"Subscription group {group['position']}/{group['location']}: "
+                f"{len(failed)} subscribers were not notified, their mark is kept"
+            )
+
+        def commit(subscriber: Dict):
+            if subscriber['id'] in failed:
+                return None, None
+            return newest, self.merge_seen(subscriber, delivered.get(subscriber['id']))
+
+        if not await self.db.update_delivery_state(subscription_ids, commit):
+            raise RuntimeError("delivery state was not saved, notifications may be sent again")
+
+        if SUBSCRIPTION_INDEX_ENABLED:
+            await self.fan_out(vacancies, set(subscription_ids), rates)
+        return truncated
+
+    def fresh_vacancies(self, subscriber: Dict, vacancies: List[Dict]) -> List[Dict]:
+        """Вакансии новее отметки подписчика, которых нет в его SeenSet."""
+        seen = SeenSet.from_bytes(
+            subscriber.get('seen_vacancies'), SEEN_SET_WINDOW, SEEN_SET_GENERATIONS, SEEN_SET_MAX_IDS
+        )
+        return [
+            vacancy for vacancy in vacancies
+            if parse_published_at(vacancy) > subscriber['last_vacancy_time']
+            and vacancy['id'] not in seen
+        ]
+
+    def merge_seen(self, subscriber: Dict, sent: Optional[List[str]]) -> Optional[bytes]:
+        """SeenSet подписчика (прочитанный под блокировкой) с добавленными id; None - без изменений."""
+        if not sent:
+            return None
+        seen = SeenSet.from_bytes(
+            subscriber.get('seen_vacancies'), SEEN_SET_WINDOW, SEEN_SET_GENERATIONS, SEEN_SET_MAX_IDS
+        )
+        seen.add(sent)
+        return seen.to_bytes()
+
+    async def deliver(self, subscription_ids: List[int], candidates) -> Dict[int, Optional[List[str]]]:
+        """Отправляет подписчикам их новые вакансии и ждет подтверждения доставки.
+
+        candidates(subscriber) - вакансии, подходящие подписчику. Уведомления
+        ставятся в очередь доставки все сразу: она сама соблюдает лимиты
+        Telegram и объединяет вакансии одного чата.
 
-    async def check_new_vacancies(self, subscription: Dict) -> List[Dict]:
-        """Check for new vacancies matching subscription"""
+        Returns:
+            Dict[int, Optional[List[str]]]: id подписки -> id доставленных
+            вакансий (пустой список, если новых не было) или None, если
+            доставка не удалась
+        """
+        subscribers = await self.db.get_delivery_state(subscription_ids)
+        if subscribers is None:
+            raise RuntimeError("delivery state was not loaded")
+        pending = []
+        for subscriber in subscribers:
+            fresh = self.fresh_vacancies(subscriber, candidates(subscriber))
+            pending.append((subscriber, fresh))
+        results = await asyncio.gather(*(
+            self.notify_user(subscriber['user_id'], fresh) for subscriber, fresh in pending if fresh
+        ))
+        results = iter(results)
+        delivered = {}
+        for subscriber, fresh in pending:
+            if not fresh:
+                delivered[subscriber['id']] = []
+            elif next(results):
+                delivered[subscriber['id']] = [vacancy['id'] for vacancy in fresh]
+            else:
+                delivered[subscriber['id']] = None
+        return delivered
+
+    async def fan_out(self, vacancies: List[Dict], exclude: set, rates: Optional[Dict[str, float]] = None):
+        """Рассылка вакансий подписчикам других групп, которым они подходят по индексу.
+
+        Отметки этих подписок не сдвигаются - их окно по-прежнему проверяет
+        собственная группа, а повтор отсекает SeenSet, в который
+        доставленные вакансии попадают после подтверждения отправки.
+        """
+        matched = {
+            subscription_id: items for subscription_id, items in self.index.match(vacancies, rates).items()
+            if subscription_id not in exclude
+        }
+        if not matched:
+            return
+        delivered = await self.deliver(list(matched), lambda subscriber: matched[subscriber['id']])
+        sent = {subscription_id: ids for subscription_id, ids in delivered.items() if ids}
+        if not sent:
+            return
+
+        def commit(subscriber: Dict):
+            return None, self.merge_seen(subscriber, sent.get(subscriber['id']))
+
+        if not await self.db.update_delivery_state(list(sent), commit):
+            log_error("Delivery state of fanned out vacancies was not saved, they may be sent again")
+        self.fanned_out += len(sent)
+
+    async def currency_rates(self) -> Dict[str, float]:
+        """Курсы валют hh.ru (в кэше get_currency_rates); без них - пустой словарь."""
         try:
-            salary_min = subscription['salary_range'].split('-')[0] if '-' in subscription['salary_range'] else 0
-            return self.db.execute_query("""
-                SELECT * FROM vacancies
-                WHERE position = %s
-                AND city = %s
-                AND salary >= %s
-                AND created_at > %s
-                ORDER BY created_at DESC
-            """, (
-                subscription['position'],
-                subscription['city'],
-                salary_min,
-                subscription['last_checked']
-            ), fetch=True)
+            return await get_currency_rates()
         except Exception as e:
-            log_error(f"Error checking new vacancies: {e}")
-            return []
-
-    async def notify_user(self, update: Update, context: ContextTypes.DEFAULT_TYPE, vacancies: List[Dict]):
-        """Send notification about new vacancies"""
-        for vacancy in vacancies:
-            message = (
-                f"🔔 Новая вакансия по вашей подписке!\n"
-                f"🏢 Компания: {vacancy['company']}\n"
-                f"💼 Должность: {vacancy['position']}\n"
-                f"📍 Город: {vacancy['city']}\n"
-                f"💰 Зарплата: {vacancy['salary']}\n"
-                f"🔗 Ссылка: {vacancy['url']}"
-            )
-            await context.bot.send_message(
-                chat_id=update.effective_chat.id,
-                text=message
-            )
+            log_warning(f"Currency rates are unavailable, foreign-currency vacancies match only subscriptions without salary: {e}")
+            return {}
+
+    async def check_new_vacancies(self, group: Dict) -> Tuple[List[Dict], bool]:
+        """Check for vacancies published after the group's high-water mark.
+
+        Returns the vacancies and whether newer ones are left for the next run.
+        A failed city lookup raises, so the group is retried after
+        SUBSCRIPTION_RETRY_DELAY instead of being skipped until the next poll.
+        """
+        city_id = await get_city_id_by_city_name(group['location']) if group['location'] else None
+        if group['location'] and not city_id:
+            # hh.ru не знает такого города - искать нечего
+            return [], False
+        # Отметка группы - самая старая из отметок ее подписчиков
+        since = min(subscriber['last_vacancy_time'] for subscriber in group['subscribers'])
+        self.queries += 1
+        data = await fetch_new_vacancies(
+            group['position'], city_id, group['salary_min'], group['salary_max'], since,
+            per_page=SUBSCRIPTION_FETCH_SIZE, max_pages=SUBSCRIPTION_MAX_PAGES
+        )
+        return await parse_vacancies(data), bool(data and data.get('truncated'))
+
+    async def notify_user(self, chat_id: int, vacancies: List[Dict]) -> bool:
+        """Send notification about new vacancies, return True if all were delivered"""
+        delivered = await self.delivery_queue.notify_vacancies(chat_id, vacancies)
+        if delivered:
+            self.notifications += len(vacancies)
+        else:
+            log_error(f"Error notifying user {chat_id}")
+        return delivered
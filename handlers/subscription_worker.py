@@ -0,0 +1,57 @@
+"""Отдельный процесс проверки подписок.
+
+Несколько воркеров (и бот) делят группы подписок через аренду строк
+в Postgres, поэтому их можно запускать сколько угодно:
+
+    python -m handlers.subscription_worker
+
+Бот тоже проверяет подписки, пока не задано SUBSCRIPTION_POLL_IN_BOT=false.
+"""
+import asyncio
+import os
+from dotenv import load_dotenv
+from telegram.ext import ExtBot
+from services.http_client import get_session, close_session
+from services.database import get_db_handler, close_db_handler
+from services.delivery_queue import DeliveryQueue, TelegramRateLimiter
+from handlers.subscription_manager import SubscriptionManager
+from config.settings import SUBSCRIPTION_TICK_INTERVAL, SUBSCRIPTION_INDEX_ENABLED, SUBSCRIPTION_INDEX_REFRESH
+from utils.logger import log_info, log_error
+
+load_dotenv()
+
+
+async def run_worker():
+    bot = ExtBot(os.getenv('MY_TOKEN'), rate_limiter=TelegramRateLimiter())
+    async with bot:
+        get_session()
+        await get_db_handler().db.get_pool()
+        delivery_queue = DeliveryQueue(bot)
+        await delivery_queue.start()
+        manager = SubscriptionManager(delivery_queue)
+        log_info(f"Воркер подписок {manager.worker_id} запущен")
+        index_refreshed_at = None
+        try:
+            while True:
+                try:
+                    now = asyncio.get_running_loop().time()
+                    if SUBSCRIPTION_INDEX_ENABLED and (
+                        index_refreshed_at is None or now - index_refreshed_at >= SUBSCRIPTION_INDEX_REFRESH
+                    ):
+                        await manager.refresh_index()
+                        index_refreshed_at = now
+                    await manager.poll()
+                except Exception as e:
+                    log_error(f"Ошибка цикла проверки подписок: {e}")
+                await asyncio.sleep(SUBSCRIPTION_TICK_INTERVAL)
+        finally:
+            await delivery_queue.stop()
+            await close_session()
+            await close_db_handler()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(run_worker())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,116 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Dict, Optional
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+from utils.logger import log_info
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Параллельная обработка апдейтов с сохранением порядка внутри чата.
+
+    Одновременно обрабатывается не больше workers апдейтов, но апдейты
+    одного чата (или пользователя, если чата нет, как у inline-запросов)
+    выполняются строго по очереди - состояния ConversationHandler не
+    гоняются между собой. Долгая аналитика одного пользователя больше не
+    задерживает остальных.
+
+    Базовый лимит PTB (max_pending) ограничивает число апдейтов, уже
+    принятых в обработку; реальная параллельность задается workers.
+    Порядок держится на FIFO-очередях asyncio.Lock по ключу чата: PTB
+    создает задачи апдейтов в порядке их получения.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        super().__init__(max_pending)
+        self.workers = workers
+        self._worker_slots = asyncio.Semaphore(workers)
+        self._chat_locks: Dict[int, asyncio.Lock] = {}
+        self._chat_waiters: Dict[int, int] = {}
+        self.pending = 0  # Апдейты, ожидающие своей очереди в чате или свободного обработчика
+        self.max_pending_seen = 0
+        self.running = 0
+        self.processed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    @staticmethod
+    def ordering_key(update: object) -> Optional[int]:
+        if not isinstance(update, Update):
+            return None
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+        if update.effective_user is not None:
+            return update.effective_user.id
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = self.ordering_key(update)
+        started = time.monotonic()
+        self.pending += 1
+        self.max_pending_seen = max(self.max_pending_seen, self.pending)
+        lock = None
+        if key is not None:
+            lock = self._chat_locks.get(key)
+            if lock is None:
+                lock = self._chat_locks[key] = asyncio.Lock()
+            self._chat_waiters[key] = self._chat_waiters.get(key, 0) + 1
+        waiting = True
+        try:
+            if lock is not None:
+                await lock.acquire()
+            try:
+                async with self._worker_slots:
+                    waiting = False
+                    self._record_wait(time.monotonic() - started)
+                    self.running += 1
+                    try:
+                        await coroutine
+                    finally:
+                        self.running -= 1
+                        self.processed += 1
+            finally:
+                if lock is not None:
+                    lock.release()
+        finally:
+            if waiting:
+                self.pending -= 1
+            if key is not None:
+                self._release_key(key)
+
+    def _record_wait(self, waited: float):
+        self.pending -= 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+
+    def _release_key(self, key: int):
+        # Замок нужен, только пока у чата есть апдейты в работе
+        waiters = self._chat_waiters[key] - 1
+        if waiters:
+            self._chat_waiters[key] = waiters
+        else:
+            del self._chat_waiters[key]
+            del self._chat_locks[key]
+
+    async def initialize(self) -> None:
+        log_info(f"Параллельная обработка апдейтов: {self.workers} обработчиков")
+
+    async def shutdown(self) -> None:
+        log_info(f"Обработка апдейтов остановлена: {self.stats()}")
+
+    def stats(self, reset_max: bool = False) -> dict:
+        """Метрики обработки; reset_max начинает новый интервал для максимумов."""
+        stats = {
+            "workers": self.workers,
+            "running": self.running,
+            "pending": self.pending,
+            "max_pending": self.max_pending_seen,
+            "chats_in_flight": len(self._chat_locks),
+            "processed": self.processed,
+            "avg_wait_ms": round(self.wait_total / self.processed * 1000, 1) if self.processed else 0.0,
+            "max_wait_ms": round(self.wait_max * 1000, 1),
+        }
+        if reset_max:
+            self.max_pending_seen = self.pending
+            self.wait_max = 0.0
+        return stats
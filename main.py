@@ -3,6 +3,7 @@ from telegram.ext import (
     ApplicationBuilder,
     ContextTypes,
     CommandHandler,
+    InlineQueryHandler,
     MessageHandler,
     filters, 
     ConversationHandler, 
@@ -12,61 +13,162 @@ from handlers.start_handler import (
     start, button_handler, city_selection_handler, handle_position_selection,
     salary_selection_handler, show_city_selection, number_of_vacancies_handler,
     CITY, POSITION, SALARY, NUMBER_OF_VACANCIES, HISTORY,
-    favorite_callback_handler, history_callback_handler
+    favorite_callback_handler, history_callback_handler, page_callback_handler
 )
 from handlers.subscription_handlers import (
     add_subscription_handler, get_subscriptions_to_remove, cancel_unsubscription,
     unsubscribe_handler, GET_SUBSCRIPTIONS_NUMBERS
     )
-from utils.logger import log_warning
+from services.http_client import get_session, close_session
+from services.database import get_db_handler, close_db_handler
+from services.migrations import run_migrations
+from services.delivery_queue import DeliveryQueue, TelegramRateLimiter
+from services.webhook_server import run_webhook
+from services.session_store import get_session_store
+from config.settings import (
+    RUN_MIGRATIONS_ON_STARTUP, UPDATE_DEADLINE, ANALYTICS_DEADLINE, INLINE_DEADLINE,
+    SUBSCRIPTION_POLL_IN_BOT, SUBSCRIPTION_TICK_INTERVAL,
+    SUBSCRIPTION_INDEX_ENABLED, SUBSCRIPTION_INDEX_REFRESH,
+    BOT_MODE, UPDATE_QUEUE_SIZE, WEBHOOK_URL, UPDATE_WORKERS, UPDATE_METRICS_INTERVAL,
+    SESSION_STORE_POSTGRES, SESSION_TTL
+)
+from handlers.deadline import with_deadline
+from handlers.inline_handler import inline_query_handler
+from handlers.subscription_manager import SubscriptionManager
+from handlers.update_processor import ChatOrderedUpdateProcessor
+from utils.logger import log_info, log_warning
 import os
+import asyncio
 from dotenv import load_dotenv
 
 load_dotenv()
 
 TOKEN = os.getenv('MY_TOKEN')
 
+async def post_init(application):
+    """Инициализация общих ресурсов перед запуском бота."""
+    get_session()
+    if RUN_MIGRATIONS_ON_STARTUP:
+        # Миграции выполняются синхронным драйвером, поэтому в отдельном потоке
+        await asyncio.to_thread(run_migrations)
+    application.bot_data['db'] = get_db_handler()
+    await application.bot_data['db'].db.get_pool()
+
+    if UPDATE_METRICS_INTERVAL > 0:
+        application.job_queue.run_repeating(
+            log_update_metrics, interval=UPDATE_METRICS_INTERVAL, name="update_metrics"
+        )
+
+    if SESSION_STORE_POSTGRES:
+        application.job_queue.run_repeating(purge_sessions, interval=3600, first=60, name="session_purge")
+
+    # Исходящие уведомления с учетом лимитов Telegram
+    delivery_queue = DeliveryQueue(application.bot)
+    await delivery_queue.start()
+    application.bot_data['delivery_queue'] = delivery_queue
+
+    # Фоновая проверка подписок (группы делятся с отдельными воркерами)
+    if SUBSCRIPTION_POLL_IN_BOT:
+        subscription_manager = SubscriptionManager(delivery_queue)
+        application.bot_data['subscription_manager'] = subscription_manager
+        application.job_queue.run_repeating(
+            subscription_manager.poll,
+            interval=SUBSCRIPTION_TICK_INTERVAL,
+            first=10,
+            name="subscription_polling"
+        )
+        if SUBSCRIPTION_INDEX_ENABLED:
+            await subscription_manager.refresh_index()
+            application.job_queue.run_repeating(
+                subscription_manager.refresh_index,
+                interval=SUBSCRIPTION_INDEX_REFRESH,
+                first=SUBSCRIPTION_INDEX_REFRESH,
+                name="subscription_index_refresh"
+            )
+
+
+async def log_update_metrics(context: ContextTypes.DEFAULT_TYPE):
+    """Глубина очереди апдейтов, время ожидания обработки и память сессий (задача JobQueue)."""
+    application = context.application
+    log_info(
+        f"Апдейты: в очереди {application.update_queue.qsize()}, "
+        f"обработка {application.update_processor.stats(reset_max=True)}"
+    )
+    log_info(f"Сессии: {get_session_store().stats()}")
+
+
+async def purge_sessions(context: ContextTypes.DEFAULT_TYPE):
+    """Удаление устаревших сессий из Postgres (задача JobQueue)."""
+    await get_db_handler().purge_session_vacancies(SESSION_TTL)
+
+
+async def post_shutdown(application):
+    """Освобождение общих ресурсов после остановки бота."""
+    delivery_queue = application.bot_data.get('delivery_queue')
+    if delivery_queue is not None:
+        await delivery_queue.stop()
+    await close_session()
+    await close_db_handler()
+
+
+def button_deadline(update: Update) -> float:
+    """Бюджет времени для кнопок меню: аналитике нужно больше остальных."""
+    if update.message and update.message.text == "Аналитика":
+        return ANALYTICS_DEADLINE
+    return UPDATE_DEADLINE
+
+
 def main():
     """Запускает бота."""
-    application = ApplicationBuilder().token(TOKEN).build()
+    application = (
+        ApplicationBuilder()
+        .token(TOKEN)
+        # Ответы обработчиков и рассылка подписок - в одном лимите Telegram
+        .rate_limiter(TelegramRateLimiter())
+        .update_queue(asyncio.Queue(maxsize=UPDATE_QUEUE_SIZE))
+        .concurrent_updates(ChatOrderedUpdateProcessor(UPDATE_WORKERS, UPDATE_QUEUE_SIZE))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
 
     # Обработчик команды /start
-    application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("start", with_deadline(start, UPDATE_DEADLINE)))
 
     # Обработчик для поиска вакансий
     job_search_conv = ConversationHandler(
-        entry_points=[MessageHandler(filters.Regex('^Поиск вакансий$'), button_handler)],
+        entry_points=[MessageHandler(filters.Regex('^Поиск вакансий$'), with_deadline(button_handler, button_deadline))],
         states={
             CITY: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND | filters.LOCATION, city_selection_handler),
+                MessageHandler(filters.TEXT & ~filters.COMMAND | filters.LOCATION, with_deadline(city_selection_handler, UPDATE_DEADLINE)),
             ],
             POSITION: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, handle_position_selection),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, with_deadline(handle_position_selection, UPDATE_DEADLINE)),
             ],
             SALARY: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, salary_selection_handler),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, with_deadline(salary_selection_handler, UPDATE_DEADLINE)),
             ],
             NUMBER_OF_VACANCIES: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, number_of_vacancies_handler),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, with_deadline(number_of_vacancies_handler, UPDATE_DEADLINE)),
             ],
             HISTORY: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, button_handler),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, with_deadline(button_handler, button_deadline)),
             ],
         },
-        fallbacks=[CommandHandler("start", start)],
+        fallbacks=[CommandHandler("start", with_deadline(start, UPDATE_DEADLINE))],
         name="job_search_conversation",
         persistent=False
     )
 
 
     unsubscribe_conv = ConversationHandler(
-        entry_points=[MessageHandler(filters.Regex('^Отписаться$') & ~filters.COMMAND, unsubscribe_handler)],
+        entry_points=[MessageHandler(filters.Regex('^Отписаться$') & ~filters.COMMAND, with_deadline(unsubscribe_handler, UPDATE_DEADLINE))],
         states={
             GET_SUBSCRIPTIONS_NUMBERS: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND & ~filters.Regex('^Отмена$'), get_subscriptions_to_remove)
+                MessageHandler(filters.TEXT & ~filters.COMMAND & ~filters.Regex('^Отмена$'), with_deadline(get_subscriptions_to_remove, UPDATE_DEADLINE))
             ],
         },
-        fallbacks=[MessageHandler(filters.Regex('^Отмена$') | filters.COMMAND, cancel_unsubscription)],
+        fallbacks=[MessageHandler(filters.Regex('^Отмена$') | filters.COMMAND, with_deadline(cancel_unsubscription, UPDATE_DEADLINE))],
         name="unsubscribe_conversation",
         persistent=False
     )
@@ -76,17 +178,28 @@ def main():
     application.add_handler(unsubscribe_conv)
 
     # Обработчик для других кнопок главного меню
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, button_handler))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, with_deadline(button_handler, button_deadline)))
 
     # Добавляем CallbackQueryHandler для избранного и похожих вакансий
-    application.add_handler(CallbackQueryHandler(favorite_callback_handler, pattern=r'^(add_fav|remove_fav|related):'))
+    application.add_handler(CallbackQueryHandler(with_deadline(favorite_callback_handler, UPDATE_DEADLINE), pattern=r'^(add_fav|remove_fav|related):'))
+
+    # Листание страниц результатов поиска, похожих вакансий и избранного
+    application.add_handler(CallbackQueryHandler(with_deadline(page_callback_handler, UPDATE_DEADLINE), pattern=r'^page:'))
 
     # Добавляем CallbackQueryHandler для истории поиска
-    application.add_handler(CallbackQueryHandler(history_callback_handler, pattern=r'^history:'))
+    application.add_handler(CallbackQueryHandler(with_deadline(history_callback_handler, UPDATE_DEADLINE), pattern=r'^history:'))
+
+    application.add_handler(CallbackQueryHandler(with_deadline(add_subscription_handler, UPDATE_DEADLINE), pattern=r'^subscribe_updates$'))
 
-    application.add_handler(CallbackQueryHandler(add_subscription_handler, pattern=r'^subscribe_updates$'))
+    # Inline-поиск "@bot python москва" (inline-режим включается в BotFather: /setinline)
+    application.add_handler(InlineQueryHandler(with_deadline(inline_query_handler, INLINE_DEADLINE)))
 
-    application.run_polling()
+    if BOT_MODE == 'webhook':
+        if not WEBHOOK_URL:
+            raise ValueError("BOT_MODE=webhook требует WEBHOOK_URL")
+        asyncio.run(run_webhook(application, WEBHOOK_URL))
+    else:
+        application.run_polling()
 
 
 if __name__ == '__main__':
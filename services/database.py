@@ -1,83 +1,11 @@
-from typing import List, Dict, Optional
-from config.database import Database
+from typing import Callable, List, Dict, Optional, Tuple
+from config.database import Database, AsyncDatabase
 from datetime import datetime
 
 class DatabaseHandler:
     def __init__(self):
+        # Schema is managed by services/migrations.py
         self.db = Database()
-        self._initialize_db()
-
-    def _initialize_db(self):
-        """Initialize database tables if they don't exist"""
-        try:
-            self.db.execute_query("""
-                CREATE TABLE IF NOT EXISTS subscriptions (
-                    id SERIAL PRIMARY KEY,
-                    user_id INTEGER NOT NULL,
-                    position TEXT NOT NULL,
-                    city TEXT NOT NULL,
-                    salary_range TEXT,
-                    last_checked BIGINT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(user_id, position, city, salary_range)
-                );
-
-                CREATE TABLE IF NOT EXISTS favorites (
-                    id SERIAL PRIMARY KEY,
-                    user_id INTEGER NOT NULL,
-                    vacancy_id TEXT NOT NULL,
-                    title TEXT NOT NULL,
-                    company TEXT,
-                    salary_from INTEGER,
-                    salary_to INTEGER,
-                    currency TEXT,
-                    city TEXT,
-                    url TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(user_id, vacancy_id)
-                )
-            """)
-
-            self.db.execute_query("""
-                CREATE TABLE IF NOT EXISTS analytics (
-                    id SERIAL PRIMARY KEY,
-                    user_id INTEGER NOT NULL,
-                    position TEXT NOT NULL,
-                    city TEXT NOT NULL,
-                    avg_salary FLOAT NOT NULL,
-                    vacancies_count INTEGER NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-
-            self.db.execute_query("""
-                CREATE TABLE IF NOT EXISTS search_history (
-                    id SERIAL PRIMARY KEY,
-                    user_id INTEGER NOT NULL,
-                    position TEXT NOT NULL,
-                    city TEXT NOT NULL,
-                    salary_range TEXT,
-                    vacancies_count INTEGER NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-
-            self.db.execute_query("""
-                CREATE TABLE IF NOT EXISTS subscriptions (
-                    id SERIAL PRIMARY KEY,
-                    user_id INTEGER NOT NULL,
-                    position TEXT NOT NULL,  -- вместо search_query
-                    salary_min INTEGER,
-                    salary_max INTEGER,  -- переименовано для ясности
-                    location TEXT,  -- более гибко чем city (может быть регион/страна)
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_vacancy_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(user_id, position, location)  -- предотвращает дубли
-                )
-            """)
-        except Exception as e:
-            print(f"Error initializing database: {e}")
-            raise
 
     def add_to_favorites(self, user_id: int, vacancy_data: Dict) -> bool:
         """Add vacancy to favorites"""
@@ -356,3 +284,626 @@ class DatabaseHandler:
     def close(self):
         """Close all database connections"""
         self.db.close_all_connections()
+
+
+class AsyncDatabaseHandler:
+    """Async counterpart of DatabaseHandler backed by an asyncpg pool.
+
+    Used by the bot handlers so that queries never block the event loop.
+    """
+
+    def __init__(self):
+        self.db = AsyncDatabase()
+
+    async def add_to_favorites(self, user_id: int, vacancy_data: Dict) -> bool:
+        """Add vacancy to favorites"""
+        salary = vacancy_data.get('salary') or {}
+        try:
+            return await self.db.execute("""
+                INSERT INTO favorites (
+                    user_id, vacancy_id, title, company, salary_from,
+                    salary_to, currency, city, url
+                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+                ON CONFLICT (user_id, vacancy_id) DO NOTHING
+            """,
+                user_id,
+                vacancy_data.get('id', ''),
+                vacancy_data['title'],
+                vacancy_data.get('company', ''),
+                salary.get('from'),
+                salary.get('to'),
+                salary.get('currency', ''),
+                vacancy_data.get('area', ''),
+                vacancy_data['url']
+            )
+        except Exception as e:
+            print(f"Error adding to favorites: {e}")
+            return False
+
+    async def get_favorites(self, user_id: int) -> List[Dict]:
+        """Get user's favorite vacancies"""
+        try:
+            rows = await self.db.fetch("""
+                SELECT
+                    id, vacancy_id, title, company, salary_from,
+                    salary_to, currency, city, url, created_at
+                FROM favorites
+                WHERE user_id = $1
+                ORDER BY created_at DESC
+            """, user_id)
+
+            return [{
+                'db_id': row[0],
+                'id': row[1],
+                'title': row[2],
+                'company': row[3],
+                'salary': {
+                    'from': row[4],
+                    'to': row[5],
+                    'currency': row[6]
+                },
+                'city': row[7],
+                'url': row[8],
+                'created_at': row[9]
+            } for row in rows]
+        except Exception as e:
+            print(f"Error getting favorites: {e}")
+            return []
+
+    async def remove_from_favorites(self, user_id: int, db_id: int) -> bool:
+        """Remove vacancy from favorites"""
+        try:
+            return await self.db.execute("""
+                DELETE FROM favorites
+                WHERE user_id = $1 AND id = $2
+            """, user_id, db_id)
+        except Exception as e:
+            print(f"Error removing from favorites: {e}")
+            return False
+
+    async def save_analytics(self, user_id: int, position: str, city: str,
+                             avg_salary: float, vacancies_count: int) -> bool:
+        """Save analytics data"""
+        try:
+            return await self.db.execute("""
+                INSERT INTO analytics (
+                    user_id, position, city, avg_salary, vacancies_count
+                ) VALUES ($1, $2, $3, $4, $5)
+            """, user_id, position, city, avg_salary, vacancies_count)
+        except Exception as e:
+            print(f"Error saving analytics: {e}")
+            return False
+
+    async def get_last_analytics(self, user_id: int) -> Optional[Dict]:
+        """Get last analytics for user"""
+        try:
+            rows = await self.db.fetch("""
+                SELECT position, city, avg_salary, vacancies_count, created_at
+                FROM analytics
+                WHERE user_id = $1
+                ORDER BY created_at DESC
+                LIMIT 1
+            """, user_id)
+
+            if rows:
+                row = rows[0]
+                return {
+                    'position': row[0],
+                    'city': row[1],
+                    'avg_salary': row[2],
+                    'vacancies_count': row[3],
+                    'created_at': row[4]
+                }
+            return None
+        except Exception as e:
+            print(f"Error getting analytics: {e}")
+            return None
+
+    async def save_search_history(self, user_id: int, position: str, city: str,
+                                  salary_range: str, vacancies_count: int) -> bool:
+        """Save search query to history"""
+        try:
+            return await self.db.execute("""
+                INSERT INTO search_history (
+                    user_id, position, city, salary_range, vacancies_count
+                ) VALUES ($1, $2, $3, $4, $5)
+            """, user_id, position, city, salary_range, vacancies_count)
+        except Exception as e:
+            print(f"Error saving search history: {e}")
+            return False
+
+    async def get_search_history(self, user_id: int, page: int = 1, per_page: int = 5) -> tuple:
+        """Get user's search history with pagination"""
+        try:
+            total_count = await self.db.fetchval("""
+                SELECT COUNT(*) FROM search_history WHERE user_id = $1
+            """, user_id) or 0
+
+            offset = (page - 1) * per_page
+            rows = await self.db.fetch("""
+                SELECT id, position, city, salary_range, vacancies_count, created_at
+                FROM search_history
+                WHERE user_id = $1
+                ORDER BY created_at DESC
+                LIMIT $2 OFFSET $3
+            """, user_id, per_page, offset)
+
+            history = [{
+                'id': row[0],
+                'position': row[1],
+                'city': row[2],
+                'salary_range': row[3],
+                'vacancies_count': row[4],
+                'created_at': row[5]
+            } for row in rows]
+
+            return history, total_count
+        except Exception as e:
+            print(f"Error getting search history: {e}")
+            return [], 0
+
+    async def add_subscription(self, user_id: int, position: str,
+                               salary_min: int = None, salary_max: int = None,
+                               location: str = None) -> Optional[int]:
+        """Add new subscription with clear parameters, return its id (None on failure).
+
+        The subscription's group gets its lease row in the same statement,
+        so pollers pick it up without a full sync_subscription_groups.
+        """
+        try:
+            return await self.db.fetchval("""
+                WITH inserted AS (
+                    INSERT INTO subscriptions
+                    (user_id, position, salary_min, salary_max, location)
+                    VALUES ($1, $2, $3, $4, $5)
+                    RETURNING id, group_key, position, location, salary_min, salary_max
+                ), grouped AS (
+                    INSERT INTO subscription_groups (group_key, position, location, salary_min, salary_max)
+                    SELECT group_key, position, location, salary_min, salary_max FROM inserted
+                    ON CONFLICT (group_key) DO NOTHING
+                )
+                SELECT id FROM inserted
+            """, user_id, position, salary_min, salary_max, location)
+        except Exception as e:
+            print(f"Subscription exists or error: {e}")
+            return None
+
+    async def get_active_subscriptions(self, user_id: int) -> List[Dict[str, Optional[str | int | datetime]]]:
+        """Get all active subscriptions for specified user.
+
+        Returns the same structure as DatabaseHandler.get_active_subscriptions.
+        """
+        try:
+            rows = await self.db.fetch("""
+                SELECT id, position, salary_min, salary_max, location, created_at
+                FROM subscriptions
+                WHERE user_id = $1
+                ORDER BY created_at DESC
+            """, user_id)
+
+            return [{
+                'id': row[0],
+                'position': row[1],
+                'salary_min': row[2],
+                'salary_max': row[3],
+                'location': row[4],
+                'created_at': row[5]
+            } for row in rows]
+        except Exception as e:
+            print(f"Error fetching subscriptions for user {user_id}: {str(e)}")
+            return []
+
+    async def clear_all_subscriptions(self, user_id: int) -> bool:
+        """Remove all subscriptions for specified user"""
+        try:
+            return await self.db.execute("""
+                DELETE FROM subscriptions
+                WHERE user_id = $1
+            """, user_id)
+        except Exception as e:
+            print(f"Error clearing subscriptions for user {user_id}: {e}")
+            return False
+
+    async def remove_subscription(self, user_id: int, subscription_id: int) -> bool:
+        """Remove a subscription"""
+        try:
+            return await self.db.execute("""
+                DELETE FROM subscriptions
+                WHERE user_id = $1 AND id = $2
+            """, user_id, subscription_id)
+        except Exception as e:
+            print(f"Error removing subscription: {e}")
+            return False
+
+    async def get_subscriptions_for_index(self) -> List[Dict]:
+        """Get search parameters of all subscriptions for the in-memory index"""
+        try:
+            rows = await self.db.fetch("""
+                SELECT id, user_id, position, location, salary_min, salary_max
+                FROM subscriptions
+            """)
+            return [{
+                'id': row[0],
+                'user_id': row[1],
+                'position': row[2],
+                'location': row[3],
+                'salary_min': row[4],
+                'salary_max': row[5]
+            } for row in rows]
+        except Exception as e:
+            print(f"Error fetching subscriptions for index: {e}")
+            return []
+
+    async def sync_subscription_groups(self) -> bool:
+        """Create lease rows for new subscription groups and drop empty ones.
+
+        Scans the whole subscriptions table; add_subscription already creates
+        the group row, so this only needs to run on a slow timer.
+        """
+        try:
+            await self.db.execute("""
+                INSERT INTO subscription_groups (group_key, position, location, salary_min, salary_max)
+                SELECT DISTINCT ON (group_key) group_key, position, location, salary_min, salary_max
+                FROM subscriptions
+                ON CONFLICT (group_key) DO NOTHING
+            """)
+            return await self.db.execute("""
+                DELETE FROM subscription_groups g
+                WHERE NOT EXISTS (SELECT 1 FROM subscriptions s WHERE s.group_key = g.group_key)
+            """)
+        except Exception as e:
+            print(f"Error syncing subscription groups: {e}")
+            return False
+
+    async def claim_subscription_groups(self, worker_id: str, limit: int, lease_seconds: float) -> List[Dict]:
+        """Lease due subscription groups to this worker.
+
+        Rows locked by a concurrent claim are skipped, so every group is leased
+        by exactly one worker. A lease that was not completed in lease_seconds
+        (crashed worker) expires and the group becomes claimable again.
+
+        Returns:
+            List of dictionaries, one per leased group:
+            [
+                {
+                    'group_key': str,
+                    'position': str,
+                    'location': Optional[str],
+                    'salary_min': Optional[int],
+                    'salary_max': Optional[int],
+                    'subscribers': [
+                        {'id': int, 'user_id': int, 'last_vacancy_time': datetime},
+                        ...
+                    ]
+                },
+                ...
+            ]
+        """
+        try:
+            claimed = await self.db.fetch("""
+                WITH due AS (
+                    SELECT group_key
+                    FROM subscription_groups
+                    WHERE next_run_at <= now()
+                      AND (lease_expires_at IS NULL OR lease_expires_at < now())
+                    ORDER BY next_run_at
+                    LIMIT $2
+                    FOR UPDATE SKIP LOCKED
+                )
+                UPDATE subscription_groups g
+                SET leased_by = $1, lease_expires_at = now() + make_interval(secs => $3)
+                FROM due
+                WHERE g.group_key = due.group_key
+                RETURNING g.group_key, g.position, g.location, g.salary_min, g.salary_max
+            """, worker_id, limit, float(lease_seconds))
+            if not claimed:
+                return []
+            rows = await self.db.fetch("""
+                SELECT
+                    group_key,
+                    array_agg(id ORDER BY id),
+                    array_agg(user_id ORDER BY id),
+                    array_agg(last_vacancy_time ORDER BY id)
+                FROM subscriptions
+                WHERE group_key = ANY($1::text[])
+                GROUP BY group_key
+            """, [row[0] for row in claimed])
+            subscribers = {
+                row[0]: [{
+                    'id': subscription_id,
+                    'user_id': user_id,
+                    'last_vacancy_time': last_vacancy_time
+                } for subscription_id, user_id, last_vacancy_time in zip(row[1], row[2], row[3])]
+                for row in rows
+            }
+            return [{
+                'group_key': row[0],
+                'position': row[1],
+                'location': row[2],
+                'salary_min': row[3],
+                'salary_max': row[4],
+                'subscribers': subscribers.get(row[0], [])
+            } for row in claimed]
+        except Exception as e:
+            print(f"Error claiming subscription groups: {e}")
+            return []
+
+    async def extend_subscription_group_lease(self, group_key: str, worker_id: str, lease_seconds: float) -> bool:
+        """Prolong this worker's lease on a group that is still being processed.
+
+        Returns False if the lease had expired and was taken by another worker.
+        """
+        try:
+            extended = await self.db.fetchval("""
+                UPDATE subscription_groups
+                SET lease_expires_at = now() + make_interval(secs => $3)
+                WHERE group_key = $1 AND leased_by = $2
+                RETURNING group_key
+            """, group_key, worker_id, float(lease_seconds))
+            return extended is not None
+        except Exception as e:
+            print(f"Error extending subscription group lease: {e}")
+            return False
+
+    async def complete_subscription_group(self, group_key: str, worker_id: str, next_run_in: float) -> bool:
+        """Release the lease and schedule the group's next run.
+
+        Returns False if the lease had expired and was taken by another worker.
+        """
+        try:
+            released = await self.db.fetchval("""
+                UPDATE subscription_groups
+                SET leased_by = NULL,
+                    lease_expires_at = NULL,
+                    last_run_at = now(),
+                    next_run_at = now() + make_interval(secs => $3)
+                WHERE group_key = $1 AND leased_by = $2
+                RETURNING group_key
+            """, group_key, worker_id, float(next_run_in))
+            return released is not None
+        except Exception as e:
+            print(f"Error completing subscription group: {e}")
+            return False
+
+    async def get_delivery_state(self, subscription_ids: List[int]) -> Optional[List[Dict]]:
+        """Get subscriptions' high-water marks and packed seen sets.
+
+        Returns:
+            [{'id': int, 'user_id': int, 'last_vacancy_time': datetime, 'seen_vacancies': Optional[bytes]}, ...]
+            or None if the query failed
+        """
+        if not subscription_ids:
+            return []
+        try:
+            rows = await self.db.fetch("""
+                SELECT id, user_id, last_vacancy_time, seen_vacancies
+                FROM subscriptions
+                WHERE id = ANY($1::int[])
+                ORDER BY id
+            """, subscription_ids)
+            return [{
+                'id': row[0],
+                'user_id': row[1],
+                'last_vacancy_time': row[2],
+                'seen_vacancies': row[3]
+            } for row in rows]
+        except Exception as e:
+            print(f"Error fetching delivery state: {e}")
+            return None
+
+    async def update_delivery_state(
+        self, subscription_ids: List[int],
+        update: Callable[[Dict], Tuple[Optional[datetime], Optional[bytes]]]
+    ) -> bool:
+        """Read-modify-write subscriptions' high-water marks and seen sets under row locks.
+
+        The rows are locked with SELECT ... FOR UPDATE (in id order, so
+        concurrent callers cannot deadlock) and update(state) is called for
+        each with 'id', 'user_id', 'last_vacancy_time' and packed
+        'seen_vacancies'. It returns the new mark (moved forward only, None
+        keeps it) and the new seen set (None keeps it). Everything is written
+        back by one UPDATE in the same transaction, so a group check and an
+        index fan-out that commit deliveries for the same subscription never
+        overwrite each other's seen ids.
+        """
+        if not subscription_ids:
+            return True
+        try:
+            async with self.db.transaction() as connection:
+                rows = await connection.fetch("""
+                    SELECT id, user_id, last_vacancy_time, seen_vacancies
+                    FROM subscriptions
+                    WHERE id = ANY($1::int[])
+                    ORDER BY id
+                    FOR UPDATE
+                """, subscription_ids, timeout=self.db.timeout())
+                ids, marks, seen = [], [], []
+                for row in rows:
+                    mark, packed = update({
+                        'id': row[0],
+                        'user_id': row[1],
+                        'last_vacancy_time': row[2],
+                        'seen_vacancies': row[3]
+                    })
+                    if mark is None and packed is None:
+                        continue
+                    ids.append(row[0])
+                    marks.append(mark)
+                    seen.append(packed)
+                if ids:
+                    await connection.execute("""
+                        UPDATE subscriptions s
+                        SET last_vacancy_time = GREATEST(s.last_vacancy_time, u.mark),
+                            seen_vacancies = COALESCE(u.seen, s.seen_vacancies)
+                        FROM unnest($1::int[], $2::timestamptz[], $3::bytea[]) AS u(id, mark, seen)
+                        WHERE s.id = u.id
+                    """, ids, marks, seen, timeout=self.db.timeout())
+            return True
+        except Exception as e:
+            print(f"Error updating delivery state: {e}")
+            return False
+
+    async def upsert_vacancies(self, vacancies: List[Dict]) -> bool:
+        """Insert or update parsed vacancies in the catalog in one round trip"""
+        # ON CONFLICT cannot touch the same row twice within one statement
+        unique = {vacancy['id']: vacancy for vacancy in vacancies}
+        if not unique:
+            return True
+        columns = [[] for _ in range(10)]
+        for vacancy in unique.values():
+            salary = vacancy.get('salary') or {}
+            published_at = vacancy.get('published_at')
+            row = (
+                vacancy['id'],
+                vacancy.get('title') or '',
+                vacancy.get('company'),
+                salary.get('from'),
+                salary.get('to'),
+                salary.get('currency'),
+                vacancy.get('area'),
+                vacancy.get('experience'),
+                vacancy.get('url'),
+                datetime.strptime(published_at, '%Y-%m-%dT%H:%M:%S%z') if published_at else None
+            )
+            for column, value in zip(columns, row):
+                column.append(value)
+        try:
+            return await self.db.execute("""
+                INSERT INTO vacancies (
+                    id, title, company, salary_from, salary_to,
+                    currency, city, experience, url, published_at
+                )
+                SELECT * FROM unnest(
+                    $1::text[], $2::text[], $3::text[], $4::int[], $5::int[],
+                    $6::text[], $7::text[], $8::text[], $9::text[], $10::timestamptz[]
+                )
+                ON CONFLICT (id) DO UPDATE SET
+                    title = EXCLUDED.title,
+                    company = EXCLUDED.company,
+                    salary_from = EXCLUDED.salary_from,
+                    salary_to = EXCLUDED.salary_to,
+                    currency = EXCLUDED.currency,
+                    city = EXCLUDED.city,
+                    experience = EXCLUDED.experience,
+                    url = EXCLUDED.url,
+                    published_at = EXCLUDED.published_at,
+                    updated_at = CURRENT_TIMESTAMP
+            """, *columns)
+        except Exception as e:
+            print(f"Error upserting vacancies: {e}")
+            return False
+
+    async def get_vacancy_skills(self, vacancy_ids: List[str]) -> Dict[str, List[str]]:
+        """Get cached key skills for the given vacancies (missing ids are skipped)"""
+        try:
+            rows = await self.db.fetch("""
+                SELECT vacancy_id, skills
+                FROM vacancy_skills
+                WHERE vacancy_id = ANY($1::text[])
+            """, vacancy_ids)
+            return {row[0]: list(row[1]) for row in rows}
+        except Exception as e:
+            print(f"Error getting vacancy skills: {e}")
+            return {}
+
+    async def save_vacancy_skills(self, skills: Dict[str, List[str]]) -> bool:
+        """Save key skills of vacancies in one batch"""
+        if not skills:
+            return True
+        try:
+            return await self.db.executemany("""
+                INSERT INTO vacancy_skills (vacancy_id, skills)
+                VALUES ($1, $2)
+                ON CONFLICT (vacancy_id) DO UPDATE SET
+                    skills = EXCLUDED.skills,
+                    fetched_at = CURRENT_TIMESTAMP
+            """, list(skills.items()))
+        except Exception as e:
+            print(f"Error saving vacancy skills: {e}")
+            return False
+
+    async def save_session_vacancies(self, user_id: int, vacancy_ids: List[str], keep: int) -> bool:
+        """Remember vacancies shown to the user, keeping only the latest `keep` of them"""
+        try:
+            await self.db.execute("""
+                INSERT INTO session_vacancies (user_id, vacancy_id)
+                SELECT $1, unnest($2::text[])
+                ON CONFLICT (user_id, vacancy_id) DO UPDATE SET shown_at = now()
+            """, user_id, vacancy_ids)
+            return await self.db.execute("""
+                DELETE FROM session_vacancies
+                WHERE user_id = $1 AND vacancy_id NOT IN (
+                    SELECT vacancy_id FROM session_vacancies
+                    WHERE user_id = $1
+                    ORDER BY shown_at DESC
+                    LIMIT $2
+                )
+            """, user_id, keep)
+        except Exception as e:
+            print(f"Error saving session vacancies: {e}")
+            return False
+
+    async def get_session_vacancy(self, user_id: int, vacancy_id: str, ttl: float) -> Optional[Dict]:
+        """Get a vacancy shown to the user within the last `ttl` seconds"""
+        try:
+            row = await self.db.fetchrow("""
+                SELECT v.id, v.title, v.company, v.city, v.url, v.salary_from, v.salary_to, v.currency
+                FROM session_vacancies s
+                JOIN vacancies v ON v.id = s.vacancy_id
+                WHERE s.user_id = $1 AND s.vacancy_id = $2
+                  AND s.shown_at > now() - make_interval(secs => $3)
+            """, user_id, vacancy_id, float(ttl))
+            if row is None:
+                return None
+            salary = None
+            if row[5] is not None or row[6] is not None:
+                salary = {'from': row[5], 'to': row[6], 'currency': row[7]}
+            return {
+                'id': row[0],
+                'title': row[1],
+                'company': row[2],
+                'area': row[3],
+                'url': row[4],
+                'salary': salary
+            }
+        except Exception as e:
+            print(f"Error fetching session vacancy: {e}")
+            return None
+
+    async def purge_session_vacancies(self, ttl: float) -> bool:
+        """Delete session entries older than `ttl` seconds"""
+        try:
+            return await self.db.execute("""
+                DELETE FROM session_vacancies
+                WHERE shown_at < now() - make_interval(secs => $1)
+            """, float(ttl))
+        except Exception as e:
+            print(f"Error purging session vacancies: {e}")
+            return False
+
+    async def close(self):
+        """Close all database connections"""
+        await self.db.close_all_connections()
+
+
+_db_handler = None
+
+
+def get_db_handler() -> AsyncDatabaseHandler:
+    """Get application-wide database handler.
+
+    The handler (and its connection pool) is created once at startup
+    and shared by all handlers instead of being rebuilt per update.
+    """
+    global _db_handler
+    if _db_handler is None:
+        _db_handler = AsyncDatabaseHandler()
+    return _db_handler
+
+
+async def close_db_handler():
+    """Close application-wide database handler on shutdown"""
+    global _db_handler
+    if _db_handler is not None:
+        await _db_handler.close()
+        _db_handler = None
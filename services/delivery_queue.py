@@ -0,0 +1,296 @@
+import asyncio
+import contextvars
+from datetime import timedelta
+from typing import Dict, List, Optional
+from telegram import Bot
+from telegram.error import RetryAfter, TimedOut, NetworkError, Forbidden, BadRequest
+from telegram.ext import BaseRateLimiter
+from utils.rate_limiter import TokenBucket, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from utils.logger import log_info, log_warning, log_error
+from config.settings import (
+    TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_RATE, DELIVERY_WORKERS,
+    DELIVERY_MAX_ATTEMPTS, DIGEST_MAX_ITEMS
+)
+
+# Приоритет запросов текущей задачи в общем лимите бота: рассылка уступает ответам пользователям
+_send_priority = contextvars.ContextVar("telegram_send_priority", default=PRIORITY_INTERACTIVE)
+
+
+def _retry_after_seconds(error: RetryAfter) -> float:
+    delay = error.retry_after
+    if isinstance(delay, timedelta):
+        delay = delay.total_seconds()
+    return delay
+
+
+class TelegramRateLimiter(BaseRateLimiter):
+    """Общий лимит частоты всех запросов бота к Bot API.
+
+    Подключается к боту (ApplicationBuilder().rate_limiter(...) или
+    ExtBot(rate_limiter=...)), поэтому ответы обработчиков и рассылка
+    DeliveryQueue расходуют одно ведро токенов TELEGRAM_GLOBAL_RATE.
+    Ответы пользователям обслуживаются раньше рассылки. RetryAfter от
+    Telegram останавливает выдачу токенов всем запросам бота.
+    """
+
+    def __init__(self, rate: float = TELEGRAM_GLOBAL_RATE):
+        self.bucket = TokenBucket(rate, rate)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        await self.bucket.acquire(_send_priority.get())
+        try:
+            return await callback(*args, **kwargs)
+        except RetryAfter as e:
+            self.bucket.pause(_retry_after_seconds(e))
+            raise
+
+
+class _Delivery:
+    """Одно исходящее сообщение в очереди."""
+
+    __slots__ = ("chat_id", "text", "kwargs", "future", "attempts", "digest")
+
+    def __init__(self, chat_id: int, text: Optional[str], kwargs: dict,
+                 future: Optional[asyncio.Future], digest: bool = False):
+        self.chat_id = chat_id
+        self.text = text
+        self.kwargs = kwargs
+        self.future = future
+        self.attempts = 0
+        # Текст дайджеста собирается в момент отправки из накопленных вакансий
+        self.digest = digest
+
+
+def format_salary(vacancy: Dict) -> str:
+    salary = vacancy.get('salary') or {}
+    if not salary:
+        return "Не указана"
+    return f"{salary.get('from') or '?'} - {salary.get('to') or '?'} {salary.get('currency', '')}".strip()
+
+
+def format_digest(vacancies: List[Dict]) -> str:
+    """Одно сообщение со списком новых вакансий."""
+    if len(vacancies) == 1:
+        vacancy = vacancies[0]
+        return (
+            f"🔔 Новая вакансия по вашей подписке!\n"
+            f"🏢 Компания: {vacancy['company']}\n"
+            f"💼 Должность: {vacancy['title']}\n"
+            f"📍 Город: {vacancy['area']}\n"
+            f"💰 Зарплата: {format_salary(vacancy)}\n"
+            f"🔗 Ссылка: {vacancy['url']}"
+        )
+    lines = [f"🔔 Новые вакансии по вашим подпискам ({len(vacancies)}):"]
+    for number, vacancy in enumerate(vacancies, 1):
+        lines.append(
+            f"\n{number}. {vacancy['title']} - {vacancy['company']}\n"
+            f"📍 {vacancy['area']} · 💰 {format_salary(vacancy)}\n"
+            f"🔗 {vacancy['url']}"
+        )
+    return "\n".join(lines)
+
+
+class DeliveryQueue:
+    """Очередь исходящих сообщений Telegram с учетом лимитов Bot API.
+
+    Telegram допускает около 30 сообщений в секунду на бота и около одного
+    в секунду в один чат. Суммарную частоту держит TelegramRateLimiter
+    бота (общий с ответами обработчиков, которые идут раньше рассылки),
+    ведра очереди по чатам - частоту в каждый чат. Сообщение в чат без
+    свободного токена откладывается, не задерживая остальные чаты.
+
+    Уведомления о вакансиях для одного чата копятся до отправки и уходят
+    одним сообщением-дайджестом (не больше DIGEST_MAX_ITEMS вакансий).
+    На RetryAfter сообщение повторяется через указанное сервером время.
+    stop() завершает ожидающих доставки с результатом False.
+    """
+
+    def __init__(self, bot: Bot, workers: int = DELIVERY_WORKERS):
+        self.bot = bot
+        self.workers = workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        # chat_id -> (накопленные вакансии, futures ожидающих доставки)
+        self._digests: Dict[int, tuple] = {}
+        # Отложенные повторы: таймер -> сообщение
+        self._deferred: Dict[asyncio.TimerHandle, _Delivery] = {}
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.merged = 0  # Вакансий, ушедших в чужой дайджест вместо отдельного сообщения
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        log_info(f"Очередь доставки запущена: {self.workers} обработчиков")
+
+    async def stop(self):
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Недоставленное завершается с False, чтобы ожидающие (check_group) не зависли
+        for handle, delivery in self._deferred.items():
+            handle.cancel()
+            self._resolve(delivery, False)
+        self._deferred.clear()
+        while self._queue is not None and not self._queue.empty():
+            self._resolve(self._queue.get_nowait(), False)
+        for vacancies, futures in self._digests.values():
+            for future in futures:
+                if not future.done():
+                    future.set_result(False)
+        self._digests.clear()
+        log_info(f"Очередь доставки остановлена: {self.stats()}")
+
+    def _put(self, delivery: _Delivery):
+        self._queue.put_nowait(delivery)
+
+    async def notify_vacancies(self, chat_id: int, vacancies: List[Dict]) -> bool:
+        """Уведомление о новых вакансиях с объединением в дайджест.
+
+        Returns:
+            bool: True, если все вакансии доставлены
+        """
+        if not self._tasks:
+            log_warning(f"Очередь доставки остановлена, уведомление для чата {chat_id} не отправлено")
+            return False
+        future = asyncio.get_running_loop().create_future()
+        pending = self._digests.get(chat_id)
+        if pending is None:
+            self._digests[chat_id] = (list(vacancies), [future])
+            self._put(_Delivery(chat_id, None, {}, None, digest=True))
+        else:
+            # Дайджест для чата уже в очереди - вакансии уйдут вместе с ним
+            seen = {vacancy['id'] for vacancy in pending[0]}
+            pending[0].extend(vacancy for vacancy in vacancies if vacancy['id'] not in seen)
+            pending[1].append(future)
+            self.merged += len(vacancies)
+        return await future
+
+    def _take_digest(self, delivery: _Delivery):
+        """Забирает накопленные вакансии чата в отправляемые сообщения."""
+        vacancies, futures = self._digests.pop(delivery.chat_id)
+        batches = [vacancies[i:i + DIGEST_MAX_ITEMS] for i in range(0, len(vacancies), DIGEST_MAX_ITEMS)]
+        result = _DigestResult(futures, len(batches))
+        delivery.text = format_digest(batches[0])
+        delivery.future = result
+        delivery.digest = False
+        # Не поместившиеся вакансии - следующими сообщениями того же дайджеста
+        for batch in batches[1:]:
+            self._put(_Delivery(delivery.chat_id, format_digest(batch), {}, result))
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) > 1000:
+                # Полные ведра ничего не ограничивают - их можно забыть
+                self._chat_buckets = {
+                    key: value for key, value in self._chat_buckets.items() if not value.is_idle()
+                }
+            bucket = self._chat_buckets[chat_id] = TokenBucket(TELEGRAM_CHAT_RATE, 1)
+        return bucket
+
+    def _defer(self, delivery: _Delivery, delay: float):
+        def put():
+            self._deferred.pop(handle, None)
+            self._put(delivery)
+
+        handle = asyncio.get_running_loop().call_later(delay, put)
+        self._deferred[handle] = delivery
+
+    async def _worker(self):
+        # Рассылка уступает ответам обработчиков в общем лимите бота
+        _send_priority.set(PRIORITY_BACKGROUND)
+        while True:
+            delivery = await self._queue.get()
+            try:
+                wait = self._chat_bucket(delivery.chat_id).try_acquire()
+                if wait > 0:
+                    self._defer(delivery, wait)
+                    continue
+                if delivery.digest:
+                    self._take_digest(delivery)
+                await self._deliver(delivery)
+            except asyncio.CancelledError:
+                self._resolve(delivery, False)
+                raise
+            except Exception as e:
+                log_error(f"Ошибка очереди доставки для чата {delivery.chat_id}: {e}")
+                self._resolve(delivery, False)
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, delivery: _Delivery):
+        delivery.attempts += 1
+        try:
+            await self.bot.send_message(chat_id=delivery.chat_id, text=delivery.text, **delivery.kwargs)
+        except RetryAfter as e:
+            # Общий лимит бота уже приостановлен TelegramRateLimiter
+            delay = _retry_after_seconds(e)
+            log_warning(f"Telegram просит подождать {delay} с перед отправкой")
+            self._retry(delivery, delay)
+        except (Forbidden, BadRequest) as e:
+            # Бот заблокирован или чат недоступен - повтор не поможет
+            log_warning(f"Сообщение в чат {delivery.chat_id} не доставлено: {e}")
+            self._resolve(delivery, False)
+        except (TimedOut, NetworkError):
+            self._retry(delivery, min(2 ** delivery.attempts, 30))
+        else:
+            self.sent += 1
+            self._resolve(delivery, True)
+
+    def _retry(self, delivery: _Delivery, delay: float):
+        if delivery.attempts >= DELIVERY_MAX_ATTEMPTS:
+            log_error(f"Сообщение в чат {delivery.chat_id} не доставлено за {delivery.attempts} попыток")
+            self._resolve(delivery, False)
+            return
+        self.retried += 1
+        self._defer(delivery, delay)
+
+    def _resolve(self, delivery: _Delivery, delivered: bool):
+        if not delivered:
+            self.failed += 1
+        if delivery.future is not None and not delivery.future.done():
+            delivery.future.set_result(delivered)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "merged": self.merged,
+            "deferred": len(self._deferred),
+            "chats_tracked": len(self._chat_buckets),
+        }
+
+
+class _DigestResult:
+    """Общий результат всех сообщений одного дайджеста.
+
+    Ожидающие получают True, только когда доставлены все части,
+    и False сразу при первой неудаче.
+    """
+
+    def __init__(self, futures: List[asyncio.Future], parts: int):
+        self._futures = futures
+        self._parts = parts
+
+    def done(self) -> bool:
+        return all(future.done() for future in self._futures)
+
+    def set_result(self, delivered: bool):
+        self._parts -= 1
+        if delivered and self._parts > 0:
+            return
+        for future in self._futures:
+            if not future.done():
+                future.set_result(delivered)
@@ -1,20 +1,213 @@
 import aiohttp
 import asyncio
+import contextvars
+import random
 import statistics
-from config.api_url import HH_API_URL, SEARCH_PARAMS, HH_API_CITY_ID
-from utils.logger import log_info, log_error
-from .database import DatabaseHandler
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from config.api_url import HH_API_URL, SEARCH_PARAMS, HH_API_CITY_ID, HH_API_DICTIONARIES
+from config.settings import (
+    HH_CACHE_TTL, HH_CACHE_MAXSIZE, HH_PAGE_CONCURRENCY,
+    HH_SKILLS_CONCURRENCY, SKILLS_ENRICH_JOBS, SKILLS_CACHE_MAXSIZE, SKILLS_CACHE_TTL,
+    HH_RATE_LIMIT, HH_RATE_BURST, HH_MAX_RETRIES, HH_BACKOFF_BASE, HH_BACKOFF_MAX,
+    HH_BREAKER_FAILURE_THRESHOLD, HH_BREAKER_RESET_TIMEOUT, ENDPOINT_TIMEOUTS, CURRENCY_RATES_TTL
+)
+from utils.logger import log_info, log_warning, log_error
+from utils.ttl_cache import TTLCache
+from utils.single_flight import SingleFlight
+from utils.rate_limiter import TokenBucket, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from utils import deadline
+from .database import get_db_handler, close_db_handler
+from .http_client import get_session, close_session
 from async_lru import alru_cache
 from pprint import pprint
 import re
 
-async def fetch_vacancies(keyword, area=None, salary_from=None, salary_to=None, per_page=5):
+# Кэш ответов на поиск вакансий: ключ - нормализованные параметры запроса
+vacancies_cache = TTLCache(maxsize=HH_CACHE_MAXSIZE, ttl=HH_CACHE_TTL)
+# Одинаковые одновременные запросы к hh.ru выполняются один раз
+hh_inflight = SingleFlight()
+# key_skills по id вакансии (в памяти; постоянное хранилище - таблица vacancy_skills)
+skills_cache = TTLCache(maxsize=SKILLS_CACHE_MAXSIZE, ttl=SKILLS_CACHE_TTL)
+
+# Общий для всех запросов к hh.ru ограничитель частоты
+hh_rate_limiter = TokenBucket(rate=HH_RATE_LIMIT, capacity=HH_RATE_BURST)
+# Приоритет запросов текущей задачи в ограничителе: фоновые уступают запросам пользователей
+_request_priority = contextvars.ContextVar("hh_request_priority", default=PRIORITY_INTERACTIVE)
+# Фоновые загрузки навыков: не больше SKILLS_ENRICH_JOBS сразу и общий лимит запросов
+_skills_jobs = asyncio.Semaphore(SKILLS_ENRICH_JOBS)
+_skills_requests = asyncio.Semaphore(HH_SKILLS_CONCURRENCY)
+# Ответы, после которых запрос имеет смысл повторить
+HH_RETRY_STATUSES = {429, 502, 503, 504}
+
+
+@contextmanager
+def background_requests():
+    """Запросы к hh.ru внутри блока получают токены после запросов пользователей."""
+    token = _request_priority.set(PRIORITY_BACKGROUND)
+    try:
+        yield
+    finally:
+        _request_priority.reset(token)
+
+
+def _is_hh_failure(exc: Exception) -> bool:
+    """Ошибка говорит о недоступности hh.ru (а не о неверном запросе).
+
+    Исчерпанный бюджет апдейта (DeadlineExceeded, в том числе таймаут
+    попытки, укороченной бюджетом) - не сбой hh.ru: иначе несколько
+    нетерпеливых апдейтов разомкнули бы цепь для всех.
+    """
+    if isinstance(exc, deadline.DeadlineExceeded):
+        return False
+    if isinstance(exc, aiohttp.ClientResponseError):
+        return exc.status >= 500 or exc.status == 429
+    return isinstance(exc, (aiohttp.ClientError, asyncio.TimeoutError))
+
+
+# При серии ошибок hh.ru запросы сразу завершаются, пока фоновая проверка не пройдет
+hh_breaker = CircuitBreaker(
+    "hh.ru",
+    failure_threshold=HH_BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=HH_BREAKER_RESET_TIMEOUT,
+    probe=lambda: _probe_hh(),
+    is_failure=_is_hh_failure
+)
+# Последние успешные результаты статистики и похожих вакансий - на случай сбоя hh.ru
+fallback_cache = TTLCache(maxsize=HH_CACHE_MAXSIZE, ttl=HH_CACHE_TTL)
+
+# Запас времени после загрузки навыков на расчет и отправку аналитики, сек
+SKILLS_DEADLINE_RESERVE = 3
+
+HH_MAX_PER_PAGE = 100  # API HH ограничивает 100 вакансий на страницу
+HH_MAX_DEPTH = 2000  # и 2000 вакансий на один поисковый запрос
+
+
+def _vacancies_cache_key(params: dict) -> tuple:
+    """Нормализованный ключ кэша: одинаковые по смыслу запросы дают один ключ."""
+    return (
+        str(params["text"]).strip().lower(),
+        str(params["area"]),
+        int(params.get("salary_from") or 0),
+        int(params.get("salary_to") or 0),
+        int(params["per_page"]),
+        int(params.get("page") or 0)
+    )
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Экспоненциальная задержка повтора со случайным разбросом (full jitter)."""
+    return random.uniform(0, min(HH_BACKOFF_MAX, HH_BACKOFF_BASE * 2 ** attempt))
+
+
+def _retry_after(headers) -> float:
+    """Задержка из заголовка Retry-After (в секундах) или None."""
+    value = headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+
+
+async def _hh_get(url: str, params: dict = None, headers: dict = None, endpoint: str = "hh_search"):
+    """Единая точка выхода к API hh.ru.
+
+    Каждый запрос забирает токен общего ограничителя частоты. На 429/5xx и
+    сетевые ошибки делаются повторы с экспоненциальной задержкой; Retry-After
+    от hh.ru приостанавливает все запросы процесса. Если hh.ru недоступен,
+    предохранитель сразу завершает запрос с CircuitOpenError. Таймаут
+    каждой попытки - ENDPOINT_TIMEOUTS[endpoint], но не больше остатка
+    бюджета времени текущего апдейта.
+
+    Returns:
+        tuple: (status, headers, json). Для 304 Not Modified json равен None.
+    """
+    return await hh_breaker.call(_hh_get_with_retries, url, params, headers, endpoint)
+
+
+async def _hh_get_with_retries(url: str, params: dict = None, headers: dict = None, endpoint: str = "hh_search"):
+    """Запрос с ограничением частоты и повторами (без предохранителя)."""
+    session = get_session()
+    for attempt in range(HH_MAX_RETRIES + 1):
+        await hh_rate_limiter.acquire(_request_priority.get())
+        try:
+            endpoint_timeout = ENDPOINT_TIMEOUTS[endpoint]
+            attempt_timeout = deadline.timeout_for(endpoint_timeout)
+            timeout = aiohttp.ClientTimeout(total=attempt_timeout)
+            async with session.get(url, params=params, headers=headers, timeout=timeout) as response:
+                if response.status in HH_RETRY_STATUSES and attempt < HH_MAX_RETRIES:
+                    retry_after = _retry_after(response.headers)
+                    if retry_after is not None:
+                        hh_rate_limiter.pause(retry_after)
+                    delay = retry_after if retry_after is not None else _backoff_delay(attempt)
+                    log_warning(f"hh.ru ответил {response.status}, повтор через {delay:.1f} с: {url}")
+                elif response.status == 304:
+                    return response.status, response.headers.copy(), None
+                else:
+                    response.raise_for_status()
+                    return response.status, response.headers.copy(), await response.json()
+        except deadline.DeadlineExceeded:
+            raise
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as err:
+            if isinstance(err, asyncio.TimeoutError) and attempt_timeout < endpoint_timeout:
+                # Попытку оборвал бюджет апдейта, а не медленный hh.ru
+                raise deadline.DeadlineExceeded() from err
+            if attempt >= HH_MAX_RETRIES:
+                raise
+            delay = _backoff_delay(attempt)
+            log_warning(f"Сетевая ошибка hh.ru ({err!r}), повтор через {delay:.1f} с: {url}")
+        # Повтор не успеет завершиться в рамках бюджета - не ждем зря
+        left = deadline.remaining()
+        if left is not None and left <= delay:
+            raise deadline.DeadlineExceeded()
+        await asyncio.sleep(delay)
+
+
+async def _get_json(url: str, params: dict = None, endpoint: str = "hh_search"):
+    """GET-запрос к API hh.ru с разбором JSON-ответа."""
+    _, _, data = await _hh_get(url, params, endpoint=endpoint)
+    return data
+
+
+async def _probe_hh():
+    """Легкий запрос для проверки, что hh.ru снова отвечает."""
+    await hh_rate_limiter.acquire()
+    timeout = aiohttp.ClientTimeout(total=ENDPOINT_TIMEOUTS["hh_search"])
+    async with get_session().get(HH_API_URL, params={"per_page": 1}, timeout=timeout) as response:
+        response.raise_for_status()
+
+
+async def _with_stale_fallback(key: tuple, func, *args):
+    """Выполняет запрос (с объединением одинаковых); при сбое hh.ru
+    возвращает последний успешный результат с пометкой stale."""
+    try:
+        result = await hh_inflight.do(key, func, *args)
+    except Exception as e:
+        entry = fallback_cache.get_entry(key)
+        if entry is None:
+            raise
+        log_warning(f"hh.ru недоступен ({e!r}), используем сохраненный результат: {key}")
+        return {**entry.value, "stale": True}
+    fallback_cache.set(key, result)
+    return result
+
+
+async def fetch_vacancies(keyword, area=None, salary_from=None, salary_to=None, per_page=5, page=0):
     """Асинхронное получение вакансий с hh.ru по заданным параметрам."""
     params = {
         "text": keyword,
         "area": area if area else SEARCH_PARAMS["area"],
         "per_page": per_page if per_page else SEARCH_PARAMS["per_page"]
     }
+    if page:
+        params["page"] = page
     
     # Добавляем параметры зарплаты, если они указаны
     if salary_from:
@@ -22,28 +215,139 @@ async def fetch_vacancies(keyword, area=None, salary_from=None, salary_to=None,
     if salary_to:
         params["salary_to"] = salary_to
 
+    cache_key = _vacancies_cache_key(params)
+    cached = vacancies_cache.get(cache_key)
+    if cached is not None:
+        log_info(f"Вакансии взяты из кэша: {params}")
+        return cached
+
     log_info(f"Запрос вакансий с параметрами: {params}")
 
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.get(HH_API_URL, params=params) as response:
-                response.raise_for_status()  # Проверка на ошибки HTTP
-                log_info("Вакансии успешно получены.")
-                return await response.json()  # Возвращаем JSON-ответ
-        except aiohttp.ClientError as err:
-            log_error(f"Ошибка запроса: {err}")
+    try:
+        return await hh_inflight.do(("vacancies", cache_key), _request_vacancies, params, cache_key)
+    except (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError) as err:
+        log_error(f"Ошибка запроса: {err!r}")
+        # hh.ru недоступен: отдаем последний известный результат, если он есть
+        entry = vacancies_cache.get_entry(cache_key)
+        if entry is not None:
+            return {**entry.value, "stale": True}
     return None
 
 
-def parse_vacancies(data, user_id=1):
-    """Парсинг данных вакансий из ответа API и сохранение в базу данных."""
+async def _request_vacancies(params: dict, cache_key: tuple):
+    """Запрос вакансий к hh.ru (с ревалидацией устаревшей записи кэша)."""
+    # Просроченная запись: переспрашиваем hh.ru условным запросом
+    headers = {}
+    entry = vacancies_cache.get_entry(cache_key)
+    if entry is not None:
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+
+    status, response_headers, data = await _hh_get(HH_API_URL, params, headers)
+    if status == 304 and entry is not None:
+        vacancies_cache.touch(cache_key)
+        log_info("Вакансии не изменились, используем кэш.")
+        return entry.value
+    log_info("Вакансии успешно получены.")
+    vacancies_cache.set(
+        cache_key, data,
+        etag=response_headers.get("ETag"),
+        last_modified=response_headers.get("Last-Modified")
+    )
+    return data
+
+
+def parse_published_at(vacancy: dict) -> datetime:
+    """Дата публикации вакансии hh.ru (с часовым поясом)."""
+    return datetime.strptime(vacancy['published_at'], '%Y-%m-%dT%H:%M:%S%z')
+
+
+async def fetch_new_vacancies(keyword, area, salary_from, salary_to, since: datetime,
+                              per_page: int = 20, max_pages: int = 5) -> dict:
+    """Вакансии, опубликованные строго после since (от новых к старым).
+
+    Используются date_from и сортировка по дате публикации: страницы
+    запрашиваются, пока не встретится уже виденная вакансия, поэтому за
+    цикл передается только прирост. Результат не кэшируется.
+
+    Если прирост не помещается в max_pages страниц, возвращаются самые
+    старые из новых вакансий и "truncated": True - остальные заберет
+    следующий цикл, когда отметка сдвинется до самой новой из полученных.
+    """
+    params = {
+        "text": keyword,
+        "area": area if area else SEARCH_PARAMS["area"],
+        "per_page": per_page,
+        "order_by": "publication_time",
+        "date_from": since.isoformat(timespec="seconds")
+    }
+    if salary_from:
+        params["salary_from"] = salary_from
+    if salary_to:
+        params["salary_to"] = salary_to
+
+    key = ("new", _vacancies_cache_key(params), since)
+    return await hh_inflight.do(key, _load_new_vacancies, params, since, max_pages)
+
+
+async def _load_new_vacancies(params: dict, since: datetime, max_pages: int) -> dict:
+    # date_to фиксирует окно: вакансии, опубликованные во время обхода,
+    # не сдвигают страницы (их заберет следующий цикл)
+    params = {**params, "date_to": datetime.now(timezone.utc).isoformat(timespec="seconds")}
+    data = await _get_json(HH_API_URL, {**params, "page": 0})
+    pages = min(data.get("pages", 0), HH_MAX_DEPTH // params["per_page"])
+    if pages > max_pages:
+        return await _load_oldest_new_vacancies(params, since, max_pages, pages, data.get("found", 0))
+
+    items = []
+    page = 0
+    while True:
+        for item in data.get("items", []):
+            if parse_published_at(item) <= since:
+                return {"items": items}
+            items.append(item)
+        page += 1
+        if page >= pages:
+            return {"items": items}
+        data = await _get_json(HH_API_URL, {**params, "page": page})
+
+
+async def _load_oldest_new_vacancies(params: dict, since: datetime, max_pages: int,
+                                     pages: int, found: int) -> dict:
+    """Последние страницы окна - самые старые новые вакансии.
+
+    Они непрерывно примыкают к since, поэтому отметку можно сдвинуть до
+    самой новой из них, ничего не пропустив.
+    """
+    first_page = max(1, pages - max(max_pages - 1, 1))
+    log_warning(
+        f"Прирост '{params['text']}' ({found} вакансий) не помещается в {max_pages} страниц: "
+        f"загружаются страницы {first_page}-{pages - 1}, остальное - в следующих циклах"
+    )
+    if found > HH_MAX_DEPTH:
+        log_warning(
+            f"Прирост '{params['text']}' глубже {HH_MAX_DEPTH} вакансий: "
+            f"{found - HH_MAX_DEPTH} самых старых hh.ru не отдает"
+        )
+    items = []
+    for page in range(first_page, pages):
+        data = await _get_json(HH_API_URL, {**params, "page": page})
+        items.extend(item for item in data.get("items", []) if parse_published_at(item) > since)
+    return {"items": items, "truncated": True}
+
+
+async def parse_vacancies(data, store: bool = True):
+    """Парсинг данных вакансий из ответа API и сохранение в каталог вакансий.
+
+    store=False пропускает запись в БД (для ответов, где важна каждая миллисекунда).
+    """
     if not data or 'items' not in data:
         log_error("Нет данных для парсинга.")
         return []
 
     vacancies = []
-    db_handler = DatabaseHandler()
-    
     for item in data['items']:
         vacancy = {
             "id": str(item.get("id")),
@@ -57,153 +361,238 @@ def parse_vacancies(data, user_id=1):
             "requirements": item.get("snippet", {}).get("requirement", "")
         }
         vacancies.append(vacancy)
-        
-        # Сохраняем вакансию в базу данных, если указан user_id
-        if user_id:
-            db_handler.add_to_favorites(
-                user_id=user_id,
-                vacancy_data={
-                    'id': vacancy['id'],
-                    'title': vacancy['title'],
-                    'company': vacancy['company'],
-                    'salary': vacancy['salary'],
-                    'area': vacancy['area'],
-                    'url': vacancy['url']
-                }
-            )
+
+    # Сохраняем всю страницу одним пакетным upsert
+    if store:
+        await get_db_handler().upsert_vacancies(vacancies)
 
     log_info(f"Парсинг завершен. Найдено {len(vacancies)} вакансий.")
-    db_handler.close()
     return vacancies
 
-async def get_vacancies_stats(keyword: str, city: str, count: int = 50) -> dict:
+async def get_vacancies_stats(keyword: str, city: str, count: int = HH_MAX_DEPTH) -> dict:
     """Сбор статистики по вакансиям"""
+    try:
+        key = ("stats", keyword.strip().lower(), str(city), count)
+        return await _with_stale_fallback(key, _load_vacancies_stats, keyword, city, count)
+    except Exception as e:
+        log_error(f"Ошибка при сборе статистики: {e}")
+        return {
+            "avg_salary": 0,
+            "vacancies_count": 0,
+            "salary_distribution": [],
+            "skills_counter": [],
+            "skills_sample": 0,
+            "skills_source": None
+        }
+
+
+async def _load_vacancies_stats(keyword: str, city: str, count: int) -> dict:
+    """Загрузка вакансий с hh.ru (все нужные страницы) и расчет статистики по ним."""
     params = {
         "text": keyword,
         "area": city,
-        "per_page": min(count, 100),  # API HH ограничивает 100 вакансий на страницу
+        "per_page": HH_MAX_PER_PAGE,
         "only_with_salary": 1  # Получаем только вакансии с указанной зарплатой
     }
+    items = await _fetch_all_pages(params, min(count, HH_MAX_DEPTH))
+    vacancies = await parse_vacancies({"items": items})
+    await enrich_key_skills(vacancies)
+    return calculate_vacancies_stats(vacancies)
 
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.get(HH_API_URL, params=params) as response:
-                response.raise_for_status()
-                data = await response.json()
-                
-                vacancies = parse_vacancies(data)
-                if not vacancies:
-                    return {
-                        "avg_salary": 0,
-                        "median_salary": 0,
-                        "percentile_25": 0,
-                        "percentile_75": 0,
-                        "min_salary": 0,
-                        "max_salary": 0,
-                        "vacancies_count": 0,
-                        "experience_distribution": {
-                            "no_experience": 0,
-                            "1-3_years": 0,
-                            "3-6_years": 0,
-                            "more_than_6": 0
-                        }
-                    }
-
-                # Собираем зарплаты и опыт
-                all_salaries = []
-                experience_counts = {
-                    "no_experience": 0,
-                    "1-3_years": 0,
-                    "3-6_years": 0,
-                    "more_than_6": 0
-                }
-                all_skills = {}
-                for vacancy in vacancies:
-                    # Обработка зарплат
-                    salary = vacancy.get("salary")
-                    if salary:
-                        from_salary = salary.get("from")
-                        to_salary = salary.get("to")
-                        if from_salary and to_salary:
-                            all_salaries.append((from_salary + to_salary) / 2)
-                        elif from_salary:
-                            all_salaries.append(from_salary)
-                        elif to_salary:
-                            all_salaries.append(to_salary)
-                    # skills
-                    skills_row = vacancy.get("requirements")
-                    pattern = r"\b[A-Za-z][A-Za-z0-9+#\. ]*(?:\s+[A-Za-z][A-Za-z0-9+#]*)*\b"
-                    if skills_row:
-                        skills = re.findall(pattern, skills_row)
-                        for skill in skills:
-                            if len(skill) >= 2 and not skill.isdigit():
-                                skill = skill.strip(' .,').capitalize()
-                                all_skills[skill] = all_skills.get(skill, 0) + 1
-                    # Обработка опыта
-                    exp = vacancy.get("experience")
-                    if exp == "noExperience":
-                        experience_counts["no_experience"] += 1
-                    elif exp == "between1And3":
-                        experience_counts["1-3_years"] += 1
-                    elif exp == "between3And6":
-                        experience_counts["3-6_years"] += 1
-                    elif exp == "moreThan6":
-                        experience_counts["more_than_6"] += 1
-
-                if not all_salaries:
-                    return {
-                        "avg_salary": 0,
-                        "median_salary": 0,
-                        "percentile_25": 0,
-                        "percentile_75": 0,
-                        "min_salary": 0,
-                        "max_salary": 0,
-                        "vacancies_count": len(vacancies),
-                        "experience_distribution": experience_counts
-                    }
-
-                filtered_skills = {skill: count for skill, count in all_skills.items() if count > 1 and skill != "Highlighttext"}
-                skills_counter = sorted(filtered_skills.items(), key=lambda item: item[1], reverse=True)
-                # Сортируем для расчета перцентилей
-                all_salaries_sorted = sorted(all_salaries)
-                n = len(all_salaries_sorted)
-                
-                return {
-                    "avg_salary": round(statistics.mean(all_salaries_sorted), 2),
-                    "median_salary": round(statistics.median(all_salaries_sorted), 2),
-                    "percentile_25": round(all_salaries_sorted[int(n * 0.25)], 2),
-                    "percentile_75": round(all_salaries_sorted[int(n * 0.75)], 2),
-                    "min_salary": min(all_salaries_sorted),
-                    "max_salary": max(all_salaries_sorted),
-                    "vacancies_count": len(vacancies),
-                    "experience_distribution": experience_counts,
-                    "skills_counter": skills_counter
-                }
-
-        except Exception as e:
-            log_error(f"Ошибка при сборе статистики: {e}")
-            return {
-                "avg_salary": 0,
-                "vacancies_count": 0,
-                "salary_distribution": []
-            }
+
+async def _fetch_all_pages(params: dict, limit: int) -> list:
+    """Постраничная загрузка до limit вакансий.
+
+    Первая страница сообщает общее число страниц, остальные запрашиваются
+    параллельно (не более HH_PAGE_CONCURRENCY одновременно). Ошибка одной
+    страницы не отменяет остальные: возвращаются все загруженные.
+    """
+    first_page = await _get_json(HH_API_URL, {**params, "page": 0})
+    items = first_page.get("items", [])
+    per_page = params["per_page"]
+    pages = min(first_page.get("pages", 1), (limit + per_page - 1) // per_page)
+    if pages <= 1:
+        return items[:limit]
+
+    semaphore = asyncio.Semaphore(HH_PAGE_CONCURRENCY)
+
+    async def fetch_page(page):
+        async with semaphore:
+            return await _get_json(HH_API_URL, {**params, "page": page})
+
+    results = await asyncio.gather(*(fetch_page(page) for page in range(1, pages)), return_exceptions=True)
+    failed = []
+    for page, data in enumerate(results, 1):
+        if isinstance(data, BaseException):
+            failed.append(page)
+            log_warning(f"Страница {page} не загружена: {data!r}")
+        else:
+            items.extend(data.get("items", []))
+    if failed:
+        log_warning(f"Не загружено {len(failed)} из {pages} страниц, статистика неполная.")
+    log_info(f"Загружено {len(items)} вакансий с {pages - len(failed)} страниц.")
+    return items[:limit]
+
+
+SKILL_PATTERN = r"\b[A-Za-z][A-Za-z0-9+#\. ]*(?:\s+[A-Za-z][A-Za-z0-9+#]*)*\b"
+
+
+def _count_skills(vacancies: list) -> tuple:
+    """Частоты навыков из одного источника.
+
+    Если хотя бы у части вакансий есть key_skills из карточки hh.ru,
+    считаются только эти вакансии (в том числе с пустым списком навыков);
+    иначе - навыки, найденные в тексте требований всех вакансий.
+    Смешивать источники нельзя: у них разный словарь.
+
+    Returns:
+        tuple: (частоты навыков, число вакансий в выборке, источник)
+    """
+    all_skills = {}
+    enriched = [vacancy["key_skills"] for vacancy in vacancies if vacancy.get("key_skills") is not None]
+    if enriched:
+        for key_skills in enriched:
+            for skill in set(key_skills):
+                all_skills[skill] = all_skills.get(skill, 0) + 1
+        return all_skills, len(enriched), "key_skills"
+
+    for vacancy in vacancies:
+        skills_row = vacancy.get("requirements")
+        if not skills_row:
+            continue
+        found = set()
+        for skill in re.findall(SKILL_PATTERN, skills_row):
+            if len(skill) >= 2 and not skill.isdigit():
+                found.add(skill.strip(' .,').capitalize())
+        for skill in found:
+            all_skills[skill] = all_skills.get(skill, 0) + 1
+    return all_skills, len(vacancies), "requirements"
+
+
+def calculate_vacancies_stats(vacancies: list) -> dict:
+    """Расчет статистики по зарплатам, опыту и навыкам."""
+    if not vacancies:
+        return {
+            "avg_salary": 0,
+            "median_salary": 0,
+            "percentile_25": 0,
+            "percentile_75": 0,
+            "min_salary": 0,
+            "max_salary": 0,
+            "vacancies_count": 0,
+            "experience_distribution": {
+                "no_experience": 0,
+                "1-3_years": 0,
+                "3-6_years": 0,
+                "more_than_6": 0
+            },
+            "skills_counter": [],
+            "skills_sample": 0,
+            "skills_source": None
+        }
+
+    # Собираем зарплаты и опыт
+    all_salaries = []
+    experience_counts = {
+        "no_experience": 0,
+        "1-3_years": 0,
+        "3-6_years": 0,
+        "more_than_6": 0
+    }
+    for vacancy in vacancies:
+        # Обработка зарплат
+        salary = vacancy.get("salary")
+        if salary:
+            from_salary = salary.get("from")
+            to_salary = salary.get("to")
+            if from_salary and to_salary:
+                all_salaries.append((from_salary + to_salary) / 2)
+            elif from_salary:
+                all_salaries.append(from_salary)
+            elif to_salary:
+                all_salaries.append(to_salary)
+        # Обработка опыта
+        exp = vacancy.get("experience")
+        if exp == "noExperience":
+            experience_counts["no_experience"] += 1
+        elif exp == "between1And3":
+            experience_counts["1-3_years"] += 1
+        elif exp == "between3And6":
+            experience_counts["3-6_years"] += 1
+        elif exp == "moreThan6":
+            experience_counts["more_than_6"] += 1
+
+    all_skills, skills_sample, skills_source = _count_skills(vacancies)
+    filtered_skills = {skill: count for skill, count in all_skills.items() if count > 1 and skill != "Highlighttext"}
+    skills_counter = sorted(filtered_skills.items(), key=lambda item: item[1], reverse=True)
+    skills_stats = {
+        "skills_counter": skills_counter,
+        "skills_sample": skills_sample,  # Знаменатель долей навыков
+        "skills_source": skills_source
+    }
+
+    if not all_salaries:
+        return {
+            "avg_salary": 0,
+            "median_salary": 0,
+            "percentile_25": 0,
+            "percentile_75": 0,
+            "min_salary": 0,
+            "max_salary": 0,
+            "vacancies_count": len(vacancies),
+            "experience_distribution": experience_counts,
+            **skills_stats
+        }
+
+    # Сортируем для расчета перцентилей
+    all_salaries_sorted = sorted(all_salaries)
+    n = len(all_salaries_sorted)
+
+    return {
+        "avg_salary": round(statistics.mean(all_salaries_sorted), 2),
+        "median_salary": round(statistics.median(all_salaries_sorted), 2),
+        "percentile_25": round(all_salaries_sorted[int(n * 0.25)], 2),
+        "percentile_75": round(all_salaries_sorted[int(n * 0.75)], 2),
+        "min_salary": min(all_salaries_sorted),
+        "max_salary": max(all_salaries_sorted),
+        "vacancies_count": len(vacancies),
+        "experience_distribution": experience_counts,
+        **skills_stats
+    }
 
 @alru_cache(maxsize=32)
 async def get_city_id_by_city_name(city_name):
+    """Id города в справочнике hh.ru или None, если такого города нет.
+
+    Ошибки запроса пробрасываются: alru_cache не сохраняет исключения,
+    поэтому в кэш попадает только настоящий ответ hh.ru.
+    """
     params = {
         "text": city_name,
     }
 
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.get(HH_API_CITY_ID, params=params) as response:
-                response.raise_for_status()
-                data = await response.json()
-                city_id = data["items"][0]["id"]
-                log_info("Был успешно получен id города в базе hh")
-                return city_id
-        except Exception as e:
-            log_error("Ошибка при получении id города")
+    try:
+        data = await _get_json(HH_API_CITY_ID, params, endpoint="hh_areas")
+    except Exception as e:
+        log_error(f"Ошибка при получении id города: {e}")
+        raise
+    items = data.get("items") or []
+    if not items:
+        log_warning(f"Город не найден в базе hh: {city_name}")
+        return None
+    log_info("Был успешно получен id города в базе hh")
+    return items[0]["id"]
+
+@alru_cache(maxsize=1, ttl=CURRENCY_RATES_TTL)
+async def get_currency_rates() -> dict:
+    """Курсы валют hh.ru: код -> сколько единиц валюты в одном рубле.
+
+    По ним hh.ru сравнивает зарплаты в разных валютах при поиске по зарплате.
+    """
+    data = await _with_stale_fallback(
+        ("dictionaries",), _get_json, HH_API_DICTIONARIES, None, "hh_dictionaries"
+    )
+    return {currency["code"]: currency["rate"] for currency in data.get("currency", []) if currency.get("rate")}
 
 async def fetch_related_vacancies(vacancy_id: str) -> dict:
     """Запрос похожих вакансий через API HH."""
@@ -212,34 +601,100 @@ async def fetch_related_vacancies(vacancy_id: str) -> dict:
         "only_with_salary": 1  # Получаем только вакансии с указанной зарплатой
     }
     url = f"{HH_API_URL}/{vacancy_id}/related_vacancies"
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.get(url, params=params) as response:
-                response.raise_for_status()
-                return await response.json()
-        except Exception as e:
-            log_error(f"API HH error: {e}")
-            return None
+    try:
+        return await _with_stale_fallback(("related", str(vacancy_id)), _get_json, url, params, "hh_related")
+    except Exception as e:
+        log_error(f"API HH error: {e}")
+        return None
 
 async def get_skills(vacancy_id: int):
-    async with aiohttp.ClientSession() as session:
+    """Ключевые навыки вакансии (названия) или None при ошибке."""
+    try:
+        data = await hh_inflight.do(
+            ("vacancy", str(vacancy_id)), _get_json, f'{HH_API_URL}/{vacancy_id}', None, "hh_vacancy"
+        )
+        return [skill["name"] for skill in data.get("key_skills", [])]
+    except Exception as e:
+        log_error(f"ошибка получения навыков: {e}")
+        return None
+
+
+async def enrich_key_skills(vacancies: list) -> None:
+    """Добавляет вакансиям поле key_skills.
+
+    Навыки берутся из кэша в памяти, затем из таблицы vacancy_skills, и только
+    для оставшихся вакансий запрашиваются у hh.ru (параллельно, не более
+    HH_SKILLS_CONCURRENCY запросов). Каждая вакансия загружается один раз.
+    Вакансии, для которых навыки получить не удалось (или не успели
+    загрузиться в рамках бюджета апдейта), остаются без поля.
+    """
+    skills = {}
+    missing = []
+    for vacancy_id in {vacancy["id"] for vacancy in vacancies}:
+        cached = skills_cache.get(vacancy_id)
+        if cached is not None:
+            skills[vacancy_id] = cached
+        else:
+            missing.append(vacancy_id)
+
+    if missing:
+        stored = await get_db_handler().get_vacancy_skills(missing)
+        for vacancy_id, vacancy_skills in stored.items():
+            skills_cache.set(vacancy_id, vacancy_skills)
+        skills.update(stored)
+        missing = [vacancy_id for vacancy_id in missing if vacancy_id not in stored]
+
+    if missing:
+        # Загрузка идет в фоне и не прерывается по истечении бюджета апдейта:
+        # то, что не успело загрузиться сейчас, попадет в кэш к следующему разу
+        task = deadline.detached(_fetch_and_store_skills(missing))
         try:
-            async with session.get(f'{HH_API_URL}/{vacancy_id}') as response:
-                response.raise_for_status()
-                data = await response.json()
-                return data.get("key_skills")
-                # pprint(data)
-        except Exception as e:
-            log_error(f"ошибка получения навыков: {e}")
-            return ""
+            await asyncio.wait_for(asyncio.shield(task), timeout=deadline.remaining(reserve=SKILLS_DEADLINE_RESERVE))
+        except asyncio.TimeoutError:
+            log_warning(f"Навыки {len(missing)} вакансий догружаются в фоне.")
+        for vacancy_id in missing:
+            entry = skills_cache.get_entry(vacancy_id)
+            if entry is not None:
+                skills[vacancy_id] = entry.value
+
+    for vacancy in vacancies:
+        if vacancy["id"] in skills:
+            vacancy["key_skills"] = skills[vacancy["id"]]
+
+
+async def _fetch_and_store_skills(vacancy_ids: list) -> None:
+    """Фоновая загрузка key_skills с hh.ru с сохранением в кэш и таблицу vacancy_skills.
+
+    Одновременно идет не больше SKILLS_ENRICH_JOBS загрузок и не больше
+    HH_SKILLS_CONCURRENCY запросов на все загрузки; токены ограничителя
+    частоты они получают после запросов пользователей.
+    """
+    fetched = {}
+
+    async def fetch(vacancy_id):
+        async with _skills_requests:
+            vacancy_skills = await get_skills(vacancy_id)
+        if vacancy_skills is not None:
+            skills_cache.set(vacancy_id, vacancy_skills)
+            fetched[vacancy_id] = vacancy_skills
+
+    async with _skills_jobs:
+        with background_requests():
+            # Пока задача ждала своей очереди, часть навыков могла загрузиться
+            vacancy_ids = [vacancy_id for vacancy_id in vacancy_ids if skills_cache.get(vacancy_id) is None]
+            await asyncio.gather(*(fetch(vacancy_id) for vacancy_id in vacancy_ids))
+    await get_db_handler().save_vacancy_skills(fetched)
+    log_info(f"Загружены навыки {len(fetched)} из {len(vacancy_ids)} вакансий.")
 
 # Пример использования
 async def main():
     keyword = "devops"
     vacancies_data = await fetch_vacancies(keyword)
-    vacancies = parse_vacancies(vacancies_data)
+    vacancies = await parse_vacancies(vacancies_data)
     for vacancy in vacancies:
         print(vacancy)
+    await close_session()
+    await close_db_handler()
 
 
 if __name__ == "__main__":
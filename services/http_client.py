@@ -0,0 +1,40 @@
+import aiohttp
+from config.settings import (
+    HTTP_POOL_LIMIT, HTTP_POOL_LIMIT_PER_HOST, HTTP_DNS_CACHE_TTL,
+    HTTP_KEEPALIVE_TIMEOUT, HTTP_USER_AGENT
+)
+from utils.logger import log_info
+
+_session = None
+
+
+def get_session() -> aiohttp.ClientSession:
+    """Общая для всего процесса HTTP-сессия с keep-alive и кэшем DNS.
+
+    Создается при старте бота (post_init), а при запуске сервисов отдельно
+    от бота - при первом обращении.
+    """
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_LIMIT,
+            limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+            use_dns_cache=True,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            headers={"User-Agent": HTTP_USER_AGENT}
+        )
+        log_info("Создана общая HTTP-сессия.")
+    return _session
+
+
+async def close_session():
+    """Закрытие общей HTTP-сессии при остановке бота."""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+        log_info("Общая HTTP-сессия закрыта.")
+    _session = None
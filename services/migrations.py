@@ -0,0 +1,258 @@
+"""Versioned database schema migrations.
+
+Migrations are applied once at bot startup or manually from the command line:
+
+    python -m services.migrations
+"""
+from typing import Optional
+from config.database import Database
+from utils.logger import log_info, log_error
+
+# Произвольный ключ advisory-блокировки, чтобы несколько процессов
+# не применяли миграции одновременно
+MIGRATIONS_LOCK_KEY = 7231001
+
+# (version, description, sql) - append only, never edit applied migrations
+MIGRATIONS = [
+    (1, "Initial schema", """
+        CREATE TABLE IF NOT EXISTS favorites (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            vacancy_id TEXT NOT NULL,
+            title TEXT NOT NULL,
+            company TEXT,
+            salary_from INTEGER,
+            salary_to INTEGER,
+            currency TEXT,
+            city TEXT,
+            url TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(user_id, vacancy_id)
+        );
+
+        CREATE TABLE IF NOT EXISTS analytics (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            position TEXT NOT NULL,
+            city TEXT NOT NULL,
+            avg_salary FLOAT NOT NULL,
+            vacancies_count INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE TABLE IF NOT EXISTS search_history (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            position TEXT NOT NULL,
+            city TEXT NOT NULL,
+            salary_range TEXT,
+            vacancies_count INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE TABLE IF NOT EXISTS subscriptions (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            position TEXT NOT NULL,
+            salary_min INTEGER,
+            salary_max INTEGER,
+            location TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_vacancy_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(user_id, position, location)
+        );
+    """),
+    (2, "Reconcile legacy subscriptions table", """
+        -- Старая схема создавала subscriptions с колонками city/salary_range/last_checked
+        ALTER TABLE subscriptions ADD COLUMN IF NOT EXISTS salary_min INTEGER;
+        ALTER TABLE subscriptions ADD COLUMN IF NOT EXISTS salary_max INTEGER;
+        ALTER TABLE subscriptions ADD COLUMN IF NOT EXISTS location TEXT;
+        ALTER TABLE subscriptions ADD COLUMN IF NOT EXISTS last_vacancy_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_name = 'subscriptions' AND column_name = 'city') THEN
+                ALTER TABLE subscriptions ALTER COLUMN city DROP NOT NULL;
+            END IF;
+            IF EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_name = 'subscriptions' AND column_name = 'last_checked') THEN
+                ALTER TABLE subscriptions ALTER COLUMN last_checked DROP NOT NULL;
+            END IF;
+        END $$;
+
+        -- Таблица из миграции 1 уже имеет UNIQUE(user_id, position, location):
+        -- индекс нужен только старой схеме без этого ограничения
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_index i
+                WHERE i.indrelid = 'subscriptions'::regclass AND i.indisunique
+                  AND (SELECT array_agg(a.attname::text ORDER BY a.attname) FROM pg_attribute a
+                       WHERE a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey))
+                      = ARRAY['location', 'position', 'user_id']
+            ) THEN
+                CREATE UNIQUE INDEX subscriptions_user_position_location_key
+                    ON subscriptions (user_id, position, location);
+            END IF;
+        END $$;
+    """),
+    (3, "Indexes for per-user queries", """
+        CREATE INDEX IF NOT EXISTS idx_search_history_user_created
+            ON search_history (user_id, created_at DESC);
+        CREATE INDEX IF NOT EXISTS idx_favorites_user_created
+            ON favorites (user_id, created_at DESC);
+        CREATE INDEX IF NOT EXISTS idx_subscriptions_user_created
+            ON subscriptions (user_id, created_at DESC);
+        CREATE INDEX IF NOT EXISTS idx_analytics_user_created
+            ON analytics (user_id, created_at DESC);
+    """),
+    (4, "Vacancy catalog", """
+        CREATE TABLE IF NOT EXISTS vacancies (
+            id TEXT PRIMARY KEY,  -- id вакансии на hh.ru
+            title TEXT NOT NULL,
+            company TEXT,
+            salary_from INTEGER,
+            salary_to INTEGER,
+            currency TEXT,
+            city TEXT,
+            experience TEXT,
+            url TEXT,
+            published_at TIMESTAMPTZ,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """),
+    (5, "Per-vacancy key skills cache", """
+        CREATE TABLE IF NOT EXISTS vacancy_skills (
+            vacancy_id TEXT PRIMARY KEY,
+            skills TEXT[] NOT NULL,
+            fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """),
+    (6, "Timezone-aware subscription high-water mark", """
+        -- Сравнивается с published_at вакансий hh.ru, у которых есть смещение
+        ALTER TABLE subscriptions
+            ALTER COLUMN last_vacancy_time TYPE TIMESTAMPTZ,
+            ALTER COLUMN last_vacancy_time SET DEFAULT CURRENT_TIMESTAMP;
+    """),
+    (7, "Leased subscription groups for sharded polling", """
+        -- Ключ группы одинаковых подписок (NULL в параметрах не мешает сравнению)
+        ALTER TABLE subscriptions ADD COLUMN IF NOT EXISTS group_key TEXT
+            GENERATED ALWAYS AS (md5(
+                position || '|' || COALESCE(location, '') || '|' ||
+                COALESCE(salary_min::text, '') || '|' || COALESCE(salary_max::text, '')
+            )) STORED;
+        CREATE INDEX IF NOT EXISTS idx_subscriptions_group_key ON subscriptions (group_key);
+
+        -- Одна строка на группу: расписание проверки и аренда воркером
+        CREATE TABLE IF NOT EXISTS subscription_groups (
+            group_key TEXT PRIMARY KEY,
+            position TEXT NOT NULL,
+            location TEXT,
+            salary_min INTEGER,
+            salary_max INTEGER,
+            next_run_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            leased_by TEXT,
+            lease_expires_at TIMESTAMPTZ,
+            last_run_at TIMESTAMPTZ
+        );
+        CREATE INDEX IF NOT EXISTS idx_subscription_groups_next_run
+            ON subscription_groups (next_run_at);
+    """),
+    (8, "Per-subscriber seen vacancies set", """
+        -- Упакованное множество id отправленных вакансий (utils.seen_set.SeenSet)
+        ALTER TABLE subscriptions ADD COLUMN IF NOT EXISTS seen_vacancies BYTEA;
+    """),
+    (9, "User session vacancies", """
+        -- Только ссылки на показанные вакансии, сами данные - в каталоге vacancies
+        CREATE TABLE IF NOT EXISTS session_vacancies (
+            user_id BIGINT NOT NULL,
+            vacancy_id TEXT NOT NULL,
+            shown_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, vacancy_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_session_vacancies_shown ON session_vacancies (shown_at);
+    """),
+    (10, "Drop duplicate subscriptions unique index", """
+        -- Базы, созданные миграцией 1, получили от миграции 2 второй уникальный
+        -- индекс на тех же колонках; оставляем только ограничение
+        DO $$
+        BEGIN
+            IF EXISTS (
+                SELECT 1 FROM pg_index i
+                JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE i.indrelid = 'subscriptions'::regclass AND i.indisunique
+                  AND c.relname <> 'subscriptions_user_position_location_key'
+                  AND (SELECT array_agg(a.attname::text ORDER BY a.attname) FROM pg_attribute a
+                       WHERE a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey))
+                      = ARRAY['location', 'position', 'user_id']
+            ) THEN
+                DROP INDEX IF EXISTS subscriptions_user_position_location_key;
+            END IF;
+        END $$;
+    """),
+]
+
+
+def get_current_version(cursor) -> int:
+    """Get latest applied schema version (0 for an empty database)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+    return cursor.fetchone()[0]
+
+
+def run_migrations(db: Optional[Database] = None) -> int:
+    """Apply all pending migrations, each one in its own transaction.
+
+    Args:
+        db: Database to migrate. A temporary pool is created if omitted.
+
+    Returns:
+        int: Schema version after migration
+    """
+    own_db = db is None
+    if own_db:
+        db = Database()
+
+    conn = db.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATIONS_LOCK_KEY,))
+        try:
+            version = get_current_version(cursor)
+            conn.commit()
+            for migration_version, description, sql in MIGRATIONS:
+                if migration_version <= version:
+                    continue
+                try:
+                    cursor.execute(sql)
+                    cursor.execute(
+                        "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                        (migration_version, description)
+                    )
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    log_error(f"Migration {migration_version} ({description}) failed: {e}")
+                    raise
+                version = migration_version
+                log_info(f"Applied migration {migration_version}: {description}")
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATIONS_LOCK_KEY,))
+            conn.commit()
+            cursor.close()
+        return version
+    finally:
+        db.release_connection(conn)
+        if own_db:
+            db.close_all_connections()
+
+
+if __name__ == "__main__":
+    print(f"Database schema version: {run_migrations()}")
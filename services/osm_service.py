@@ -1,7 +1,10 @@
 import asyncio
-from config.api_url import OPEN_STREET_MAP_URL
 import aiohttp
+from config.api_url import OPEN_STREET_MAP_URL
 from utils.logger import log_error
+from services.http_client import get_session, close_session
+from config.settings import ENDPOINT_TIMEOUTS
+from utils.deadline import timeout_for
 
 async def get_city_by_location(lat, lon):
     params = {
@@ -10,19 +13,21 @@ async def get_city_by_location(lat, lon):
         "format": "json"
     }
 
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.get(OPEN_STREET_MAP_URL, params=params) as response:
-                response.raise_for_status()
-                data = await response.json()
-                city = data["address"]["city"]
-                return city
-        except Exception as e:
-            log_error(f"Ошибка (Openstreetmap): {e}")
-            return ""
+    session = get_session()
+    try:
+        timeout = aiohttp.ClientTimeout(total=timeout_for(ENDPOINT_TIMEOUTS["osm_reverse"]))
+        async with session.get(OPEN_STREET_MAP_URL, params=params, timeout=timeout) as response:
+            response.raise_for_status()
+            data = await response.json()
+            city = data["address"]["city"]
+            return city
+    except Exception as e:
+        log_error(f"Ошибка (Openstreetmap): {e}")
+        return ""
 
 async def main():
     await get_city_by_location('56.765158', '60.544131')
+    await close_session()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,162 @@
+import re
+from typing import Dict, List, Optional, Tuple
+from services.hh_service import fetch_vacancies, get_currency_rates, HH_MAX_DEPTH
+from services.subscription_index import vacancy_salary_range
+from utils.logger import log_info, log_warning
+from config.settings import SEARCH_CANONICAL_PER_PAGE, SEARCH_PLANNER_MAX_PAGES
+
+_SPACES_RE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Канонический текст запроса: hh.ru не различает регистр и лишние пробелы."""
+    return _SPACES_RE.sub(" ", text.strip().lower().replace("ё", "е"))
+
+
+def filter_by_salary(vacancies: List[Dict], salary_from: Optional[int], salary_to: Optional[int],
+                     rates: Optional[Dict[str, float]] = None) -> List[Dict]:
+    """Вакансии, вилка которых пересекается с диапазоном [salary_from, salary_to].
+
+    Без диапазона возвращаются все вакансии. Зарплаты в других валютах
+    пересчитываются по курсам hh.ru rates, как при поиске с зарплатой на
+    hh.ru. Вакансии без зарплаты или в валюте без курса при заданном
+    диапазоне не подходят (так же сопоставляются подписки в SubscriptionIndex).
+    """
+    if salary_from is None and salary_to is None:
+        return list(vacancies)
+    matched = []
+    for vacancy in vacancies:
+        salary = vacancy_salary_range(vacancy, rates)
+        if salary is None:
+            continue
+        low, high = salary
+        if salary_from is not None and high < salary_from:
+            continue
+        if salary_to is not None and low > salary_to:
+            continue
+        matched.append(vacancy)
+    return matched
+
+
+class QueryPlanner:
+    """Планировщик поисковых запросов к hh.ru.
+
+    Поиск с любыми зарплатой и количеством превращается в один
+    канонический запрос на пару (текст, город): нормализованный текст,
+    без зарплаты, страницы по SEARCH_CANONICAL_PER_PAGE вакансий. Фильтр
+    по зарплате и обрезка до нужного количества делаются локально, так
+    что все пользователи и все варианты зарплаты делят один ответ в кэше
+    fetch_vacancies. Если на странице подходящих вакансий меньше, чем
+    нужно, дочитываются следующие канонические страницы (не больше
+    SEARCH_PLANNER_MAX_PAGES). Inline-поиск листает те же страницы
+    порциями через search_page.
+    """
+
+    def __init__(self, per_page: int = SEARCH_CANONICAL_PER_PAGE, max_pages: int = SEARCH_PLANNER_MAX_PAGES):
+        self.per_page = per_page
+        self.max_pages = max_pages
+        self.searches = 0
+        self.pages_requested = 0
+
+    async def fetch_page(self, text: str, area: Optional[str], page: int = 0) -> Optional[Dict]:
+        """Каноническая страница ответа hh.ru для (текст, город)."""
+        self.pages_requested += 1
+        return await fetch_vacancies(normalize_query(text), area, per_page=self.per_page, page=page)
+
+    async def search(self, text: str, area: Optional[str], salary_from: Optional[int],
+                     salary_to: Optional[int], count: int, first_page: Optional[Dict] = None) -> Optional[Dict]:
+        """Ответ в формате hh.ru с не более чем count подходящими вакансиями.
+
+        first_page - уже загруженная первая каноническая страница (например,
+        упреждающей загрузкой). None - hh.ru недоступен и кэша нет.
+        """
+        self.searches += 1
+        data = first_page if first_page is not None else await self.fetch_page(text, area)
+        if data is None:
+            return None
+        rates = await self._rates(salary_from, salary_to)
+        items = filter_by_salary(data.get('items', []), salary_from, salary_to, rates)
+        stale = bool(data.get('stale'))
+        page = 1
+        while len(items) < count and page < min(data.get('pages', 0), self.max_pages):
+            next_data = await self.fetch_page(text, area, page)
+            if not next_data:
+                break
+            stale = stale or bool(next_data.get('stale'))
+            items.extend(filter_by_salary(next_data.get('items', []), salary_from, salary_to, rates))
+            page += 1
+        if page > 1:
+            log_info(f"Поиск '{text}': подходящие вакансии собраны с {page} канонических страниц")
+        result = {**data, 'items': items[:count]}
+        if stale:
+            result['stale'] = True
+        return result
+
+    async def search_page(self, text: str, area: Optional[str], salary_from: Optional[int],
+                          salary_to: Optional[int], count: int,
+                          cursor: Tuple[int, int] = (0, 0)) -> Optional[Dict]:
+        """Следующие count подходящих вакансий после cursor - для листания порциями.
+
+        cursor - (каноническая страница, сколько подходящих вакансий с нее
+        уже показано). В ответе 'next_cursor' - курсор следующей порции или
+        None, если вакансий больше нет. Пустые после фильтра страницы
+        пропускаются, но за одну порцию читается не больше max_pages
+        страниц. None - hh.ru недоступен и кэша нет.
+        """
+        self.searches += 1
+        page, skip = cursor
+        last_page = HH_MAX_DEPTH // self.per_page
+        rates = await self._rates(salary_from, salary_to)
+        items = []
+        first = None
+        stale = False
+        next_cursor = None
+        for _ in range(self.max_pages):
+            data = await self.fetch_page(text, area, page)
+            if data is None:
+                if first is None:
+                    return None
+                # Дочитать не удалось - продолжим с этой страницы в следующей порции
+                next_cursor = (page, 0)
+                break
+            first = first or data
+            stale = stale or bool(data.get('stale'))
+            matched = filter_by_salary(data.get('items', []), salary_from, salary_to, rates)[skip:]
+            wanted = count - len(items)
+            items.extend(matched[:wanted])
+            if len(matched) > wanted:
+                next_cursor = (page, skip + wanted)
+                break
+            page, skip = page + 1, 0
+            if page >= min(data.get('pages', 0), last_page):
+                next_cursor = None
+                break
+            next_cursor = (page, 0)
+            if len(items) >= count:
+                break
+        result = {**first, 'items': items, 'next_cursor': next_cursor}
+        if stale:
+            result['stale'] = True
+        return result
+
+    async def _rates(self, salary_from: Optional[int], salary_to: Optional[int]) -> Dict[str, float]:
+        if salary_from is None and salary_to is None:
+            return {}
+        try:
+            return await get_currency_rates()
+        except Exception as e:
+            log_warning(f"Курсы валют hh.ru недоступны ({e!r}), фильтр зарплаты - только рубли")
+            return {}
+
+    def stats(self) -> dict:
+        return {
+            "searches": self.searches,
+            "pages_requested": self.pages_requested,
+        }
+
+
+query_planner = QueryPlanner()
+
+
+def get_query_planner() -> QueryPlanner:
+    return query_planner
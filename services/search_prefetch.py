@@ -0,0 +1,115 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from services.query_planner import get_query_planner, normalize_query
+from utils.deadline import detached
+from utils.logger import log_warning
+from config.settings import PREFETCH_TTL, PREFETCH_MAX_USERS
+
+
+class _Prefetch:
+    __slots__ = ("key", "task", "expires_at")
+
+    def __init__(self, key: tuple, task: asyncio.Task, expires_at: float):
+        self.key = key
+        self.task = task
+        self.expires_at = expires_at
+
+
+class SearchPrefetcher:
+    """Упреждающая загрузка результатов поиска.
+
+    Как только пользователь выбрал город и должность, в фоне запускается
+    первая каноническая страница QueryPlanner (без зарплаты). Пока он
+    выбирает зарплату и количество, ответ hh.ru уже приходит, и
+    search_vacancies только фильтрует его локально.
+
+    На пользователя хранится одна загрузка: новая (другие город или
+    должность, повторный /start) отменяет прежнюю. Отмена снимает только
+    ожидание - сам запрос к hh.ru общий (SingleFlight) и дописывает кэш.
+    Незабранные загрузки живут PREFETCH_TTL секунд, всего их не больше
+    PREFETCH_MAX_USERS.
+    """
+
+    def __init__(self, ttl: float = PREFETCH_TTL, max_users: int = PREFETCH_MAX_USERS):
+        self.ttl = ttl
+        self.max_users = max_users
+        self._prefetches: "OrderedDict[int, _Prefetch]" = OrderedDict()
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.cancelled = 0
+
+    def start(self, user_id: int, position: str, area: Optional[str]):
+        """Запускает загрузку широкого запроса (position, area) для пользователя."""
+        key = (normalize_query(position), area)
+        current = self._prefetches.get(user_id)
+        if current is not None and current.key == key and not current.task.cancelled():
+            return
+        self.cancel(user_id)
+        task = detached(get_query_planner().fetch_page(position, area))
+        self._prefetches[user_id] = _Prefetch(key, task, time.monotonic() + self.ttl)
+        self.started += 1
+        self._evict()
+
+    def cancel(self, user_id: int):
+        """Отменяет загрузку пользователя (возврат к началу поиска)."""
+        prefetch = self._prefetches.pop(user_id, None)
+        if prefetch is not None and not prefetch.task.done():
+            prefetch.task.cancel()
+            self.cancelled += 1
+
+    def _evict(self):
+        # Самые старые загрузки лежат в начале
+        now = time.monotonic()
+        while self._prefetches:
+            user_id, prefetch = next(iter(self._prefetches.items()))
+            if len(self._prefetches) <= self.max_users and prefetch.expires_at > now:
+                break
+            self.cancel(user_id)
+
+    async def take(self, user_id: int, position: str, area: Optional[str]) -> Optional[Dict]:
+        """Забирает ответ hh.ru на широкий запрос (дожидаясь, если он еще в пути).
+
+        None - загрузки для этих города и должности нет, она устарела или
+        завершилась ошибкой; тогда нужно искать обычным запросом.
+        """
+        self._evict()
+        prefetch = self._prefetches.pop(user_id, None)
+        if prefetch is None or prefetch.key != (normalize_query(position), area):
+            if prefetch is not None and not prefetch.task.done():
+                prefetch.task.cancel()
+            self.misses += 1
+            return None
+        try:
+            # shield: истекший бюджет обработчика не отменяет общую загрузку
+            data = await asyncio.shield(prefetch.task)
+        except asyncio.CancelledError:
+            if not prefetch.task.cancelled():
+                raise
+            data = None
+        except Exception as e:
+            log_warning(f"Упреждающая загрузка '{position}' завершилась ошибкой: {e!r}")
+            data = None
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._prefetches),
+            "started": self.started,
+            "hits": self.hits,
+            "misses": self.misses,
+            "cancelled": self.cancelled,
+        }
+
+
+search_prefetcher = SearchPrefetcher()
+
+
+def get_search_prefetcher() -> SearchPrefetcher:
+    return search_prefetcher
@@ -0,0 +1,197 @@
+import sys
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from services.database import get_db_handler
+from config.settings import (
+    SESSION_MAX_USERS, SESSION_MAX_VACANCIES, SESSION_TTL, SESSION_STORE_POSTGRES
+)
+
+
+class VacancyRecord:
+    """Компактная запись показанной вакансии - только поля для избранного."""
+    __slots__ = ("id", "title", "company", "area", "url", "salary_from", "salary_to", "currency")
+
+    def __init__(self, id, title, company, area, url, salary_from=None, salary_to=None, currency=None):
+        self.id = id
+        self.title = title
+        self.company = company
+        self.area = area
+        self.url = url
+        self.salary_from = salary_from
+        self.salary_to = salary_to
+        self.currency = currency
+
+    @classmethod
+    def from_vacancy(cls, vacancy: Dict) -> "VacancyRecord":
+        salary = vacancy.get('salary') or {}
+        return cls(
+            vacancy['id'], vacancy['title'], vacancy.get('company'), vacancy.get('area'), vacancy['url'],
+            salary.get('from'), salary.get('to'), salary.get('currency')
+        )
+
+    def as_vacancy(self) -> Dict:
+        """Словарь в формате parse_vacancies (для add_to_favorites)."""
+        salary = None
+        if self.salary_from is not None or self.salary_to is not None:
+            salary = {'from': self.salary_from, 'to': self.salary_to, 'currency': self.currency}
+        return {
+            'id': self.id,
+            'title': self.title,
+            'company': self.company,
+            'area': self.area,
+            'url': self.url,
+            'salary': salary,
+        }
+
+    def size(self) -> int:
+        """Приблизительный объем записи в памяти, байт."""
+        return sys.getsizeof(self) + sum(sys.getsizeof(getattr(self, name)) for name in self.__slots__)
+
+
+class _Session:
+    __slots__ = ("vacancies", "results", "expires_at", "size")
+
+    def __init__(self):
+        self.vacancies: "OrderedDict[str, VacancyRecord]" = OrderedDict()
+        # Вид страницы результатов -> id вакансий в порядке показа (для листания)
+        self.results: Dict[str, List[str]] = {}
+        self.expires_at = 0.0
+        self.size = 0
+
+
+class SessionStore:
+    """Ограниченное хранилище сессий пользователей (показанные вакансии).
+
+    Вместо context.user_data, который растет без предела, хранит для
+    каждого пользователя не больше SESSION_MAX_VACANCIES компактных
+    записей; сессии живут SESSION_TTL секунд без обращений, а всего в
+    памяти не больше SESSION_MAX_USERS сессий (вытесняются давно не
+    использованные).
+
+    При SESSION_STORE_POSTGRES показы дополнительно пишутся в таблицу
+    session_vacancies (только пары пользователь-вакансия, данные берутся
+    из каталога vacancies): кнопки под старыми сообщениями работают после
+    перезапуска и на любой реплике.
+    """
+
+    def __init__(self, max_users: int = SESSION_MAX_USERS, max_vacancies: int = SESSION_MAX_VACANCIES,
+                 ttl: float = SESSION_TTL, use_postgres: bool = SESSION_STORE_POSTGRES):
+        self.max_users = max_users
+        self.max_vacancies = max_vacancies
+        self.ttl = ttl
+        self.use_postgres = use_postgres
+        self._sessions: "OrderedDict[int, _Session]" = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.db_hits = 0
+        self.evictions = 0
+
+    def _session(self, user_id: int, create: bool) -> Optional[_Session]:
+        session = self._sessions.get(user_id)
+        now = time.monotonic()
+        if session is not None and session.expires_at <= now:
+            self._drop(user_id)
+            session = None
+        if session is None:
+            if not create:
+                return None
+            session = self._sessions[user_id] = _Session()
+        session.expires_at = now + self.ttl
+        self._sessions.move_to_end(user_id)
+        return session
+
+    def _drop(self, user_id: int):
+        session = self._sessions.pop(user_id)
+        self._size -= session.size
+
+    async def remember_vacancies(self, user_id: int, vacancies: List[Dict]):
+        """Запоминает показанные пользователю вакансии."""
+        self._remember_local(user_id, vacancies)
+        if self.use_postgres:
+            await get_db_handler().save_session_vacancies(
+                user_id, [vacancy['id'] for vacancy in vacancies], self.max_vacancies
+            )
+
+    def _remember_local(self, user_id: int, vacancies: List[Dict]):
+        session = self._session(user_id, create=True)
+        before = session.size
+        for vacancy in vacancies:
+            record = VacancyRecord.from_vacancy(vacancy)
+            previous = session.vacancies.pop(record.id, None)
+            if previous is not None:
+                session.size -= previous.size()
+            session.vacancies[record.id] = record
+            session.size += record.size()
+        while len(session.vacancies) > self.max_vacancies:
+            _, record = session.vacancies.popitem(last=False)
+            session.size -= record.size()
+        self._size += session.size - before
+        self._evict()
+
+    def _evict(self):
+        # Давно не использованные (и просроченные) сессии лежат в начале
+        now = time.monotonic()
+        while self._sessions:
+            user_id, session = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_users and session.expires_at > now:
+                break
+            self._drop(user_id)
+            self.evictions += 1
+
+    async def remember_results(self, user_id: int, kind: str, vacancies: List[Dict]):
+        """Запоминает список результатов для листания страниц (только в памяти)."""
+        vacancies = vacancies[:self.max_vacancies]
+        await self.remember_vacancies(user_id, vacancies)
+        session = self._session(user_id, create=True)
+        previous = session.results.get(kind)
+        ids = [vacancy['id'] for vacancy in vacancies]
+        delta = sys.getsizeof(ids) - (sys.getsizeof(previous) if previous is not None else 0)
+        session.results[kind] = ids
+        session.size += delta
+        self._size += delta
+
+    def get_results(self, user_id: int, kind: str) -> Optional[List[Dict]]:
+        """Ранее показанный список результатов или None, если сессия истекла."""
+        session = self._session(user_id, create=False)
+        ids = session.results.get(kind) if session is not None else None
+        if ids is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return [session.vacancies[vacancy_id].as_vacancy() for vacancy_id in ids if vacancy_id in session.vacancies]
+
+    async def get_vacancy(self, user_id: int, vacancy_id: str) -> Optional[Dict]:
+        """Вакансия, показанная пользователю, или None."""
+        session = self._session(user_id, create=False)
+        record = session.vacancies.get(vacancy_id) if session is not None else None
+        if record is not None:
+            self.hits += 1
+            return record.as_vacancy()
+        self.misses += 1
+        if not self.use_postgres:
+            return None
+        vacancy = await get_db_handler().get_session_vacancy(user_id, vacancy_id, self.ttl)
+        if vacancy is not None:
+            self.db_hits += 1
+            self._remember_local(user_id, [vacancy])
+        return vacancy
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._sessions),
+            "vacancies": sum(len(session.vacancies) for session in self._sessions.values()),
+            "memory_bytes": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "db_hits": self.db_hits,
+            "evictions": self.evictions,
+        }
+
+
+session_store = SessionStore()
+
+
+def get_session_store() -> SessionStore:
+    return session_store
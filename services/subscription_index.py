@@ -0,0 +1,197 @@
+import re
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+from utils.logger import log_info
+from config.settings import SUBSCRIPTION_INDEX_SALARY_BUCKET, SUBSCRIPTION_INDEX_MAX_BUCKET
+
+_TOKEN_RE = re.compile(r"[\w+#]+")
+
+
+def tokenize(text: Optional[str]) -> Set[str]:
+    """Нормализованные слова названия: нижний регистр, ё -> е."""
+    if not text:
+        return set()
+    return set(_TOKEN_RE.findall(text.lower().replace("ё", "е")))
+
+
+def normalize_area(area: Optional[str]) -> Optional[str]:
+    if not area:
+        return None
+    return area.strip().lower().replace("ё", "е") or None
+
+
+def vacancy_salary_range(vacancy: Dict, rates: Optional[Dict[str, float]] = None) -> Optional[tuple]:
+    """(нижняя, верхняя) граница зарплаты в рублях или None.
+
+    rates - курсы hh.ru (единиц валюты в одном рубле) для пересчета зарплат
+    в других валютах.
+    """
+    salary = vacancy.get('salary') or {}
+    currency = salary.get('currency')
+    rate = 1 if currency in (None, 'RUR') else (rates or {}).get(currency)
+    if not rate:
+        # Курс неизвестен - такая вакансия подходит только подпискам без зарплаты
+        return None
+    low, high = salary.get('from'), salary.get('to')
+    if low is None and high is None:
+        return None
+    if rate != 1:
+        low = low / rate if low is not None else None
+        high = high / rate if high is not None else None
+    return (low if low is not None else high, high if high is not None else low)
+
+
+class _IndexedSubscription:
+    __slots__ = ("id", "user_id", "tokens", "area", "salary_min", "salary_max", "key")
+
+    def __init__(self, subscription: Dict):
+        self.id = subscription['id']
+        self.user_id = subscription['user_id']
+        self.tokens = tokenize(subscription['position'])
+        self.area = normalize_area(subscription.get('location'))
+        self.salary_min = subscription.get('salary_min')
+        self.salary_max = subscription.get('salary_max')
+        self.key = None
+
+    def matches(self, tokens: Set[str], salary: Optional[tuple]) -> bool:
+        if not self.tokens <= tokens:
+            return False
+        if self.salary_min is None and self.salary_max is None:
+            return True
+        if salary is None:
+            return False
+        low, high = salary
+        if self.salary_min is not None and high < self.salary_min:
+            return False
+        if self.salary_max is not None and low > self.salary_max:
+            return False
+        return True
+
+
+class SubscriptionIndex:
+    """Инвертированный индекс подписок для сопоставления новых вакансий.
+
+    Каждая подписка лежит ровно в одном списке - по ключу (самое редкое
+    слово должности, город, корзина минимальной зарплаты). Для вакансии
+    перебираются только ключи из слов ее названия, ее города (и "любого"
+    города) и корзин не выше ее зарплаты; найденные кандидаты
+    проверяются точно. Стоимость сопоставления зависит от числа
+    подходящих подписок, а не от числа всех подписок.
+
+    Индекс строится из таблицы subscriptions (rebuild) и обновляется при
+    добавлении и удалении подписок в этом процессе; изменения из других
+    процессов подхватывает периодическая перестройка.
+    """
+
+    def __init__(self, salary_bucket: int = SUBSCRIPTION_INDEX_SALARY_BUCKET,
+                 max_bucket: int = SUBSCRIPTION_INDEX_MAX_BUCKET):
+        self.salary_bucket = salary_bucket
+        self.max_bucket = max_bucket
+        self._subscriptions: Dict[int, _IndexedSubscription] = {}
+        self._postings: Dict[tuple, Set[int]] = defaultdict(set)
+        self._token_counts = Counter()
+        self._buckets: List[int] = []  # Отсортированные корзины, где есть подписки
+        self.matches_total = 0
+
+    def __len__(self):
+        return len(self._subscriptions)
+
+    def _bucket(self, salary: Optional[int]) -> Optional[int]:
+        if salary is None:
+            return None
+        return min(int(salary) // self.salary_bucket, self.max_bucket)
+
+    def add(self, subscription: Dict):
+        """Добавляет (или заменяет) подписку: {id, user_id, position, location, salary_min, salary_max}."""
+        self.remove(subscription['id'])
+        indexed = _IndexedSubscription(subscription)
+        if not indexed.tokens:
+            return
+        self._token_counts.update(indexed.tokens)
+        self._insert(indexed)
+
+    def _insert(self, indexed: _IndexedSubscription):
+        # Самое редкое слово дает самый короткий список кандидатов
+        token = min(indexed.tokens, key=lambda word: (self._token_counts[word], word))
+        bucket = self._bucket(indexed.salary_min)
+        indexed.key = (token, indexed.area, bucket)
+        self._postings[indexed.key].add(indexed.id)
+        self._subscriptions[indexed.id] = indexed
+        if bucket is not None and bucket not in self._buckets:
+            self._buckets.insert(bisect_right(self._buckets, bucket), bucket)
+
+    def remove(self, subscription_id: int):
+        indexed = self._subscriptions.pop(subscription_id, None)
+        if indexed is None:
+            return
+        self._token_counts.subtract(indexed.tokens)
+        posting = self._postings.get(indexed.key)
+        if posting is not None:
+            posting.discard(subscription_id)
+            if not posting:
+                del self._postings[indexed.key]
+
+    def rebuild(self, subscriptions: Iterable[Dict]):
+        self._subscriptions = {}
+        self._postings = defaultdict(set)
+        self._token_counts = Counter()
+        self._buckets = []
+        # Частоты слов считаются заранее, чтобы ключи выбирались по полной статистике
+        indexed_list = [
+            indexed for indexed in map(_IndexedSubscription, subscriptions) if indexed.tokens
+        ]
+        for indexed in indexed_list:
+            self._token_counts.update(indexed.tokens)
+        for indexed in indexed_list:
+            self._insert(indexed)
+        log_info(f"Индекс подписок перестроен: {len(self._subscriptions)} подписок, {len(self._postings)} ключей")
+
+    def match(self, vacancies: List[Dict], rates: Optional[Dict[str, float]] = None) -> Dict[int, List[Dict]]:
+        """Подписки, которым подходят вакансии.
+
+        rates - курсы hh.ru для пересчета зарплат в других валютах (см.
+        vacancy_salary_range); без курса такие вакансии подходят только
+        подпискам без зарплаты.
+
+        Returns:
+            Dict[int, List[Dict]]: id подписки -> подходящие ей вакансии
+        """
+        matched = defaultdict(list)
+        for vacancy in vacancies:
+            tokens = tokenize(vacancy.get('title'))
+            if not tokens:
+                continue
+            salary = vacancy_salary_range(vacancy, rates)
+            buckets = [None]
+            if salary is not None:
+                top = self._bucket(salary[1])
+                buckets += self._buckets[:bisect_right(self._buckets, top)]
+            areas = {normalize_area(vacancy.get('area')), None}
+            for token in tokens:
+                for area in areas:
+                    for bucket in buckets:
+                        for subscription_id in self._postings.get((token, area, bucket), ()):
+                            if self._subscriptions[subscription_id].matches(tokens, salary):
+                                matched[subscription_id].append(vacancy)
+        self.matches_total += sum(len(items) for items in matched.values())
+        return matched
+
+    def user_id(self, subscription_id: int) -> Optional[int]:
+        indexed = self._subscriptions.get(subscription_id)
+        return indexed.user_id if indexed else None
+
+    def stats(self) -> dict:
+        return {
+            "subscriptions": len(self._subscriptions),
+            "keys": len(self._postings),
+            "salary_buckets": len(self._buckets),
+            "matches": self.matches_total,
+        }
+
+
+subscription_index = SubscriptionIndex()
+
+
+def get_subscription_index() -> SubscriptionIndex:
+    return subscription_index
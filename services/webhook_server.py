@@ -0,0 +1,137 @@
+import asyncio
+import hmac
+import signal
+from typing import Callable, Optional
+from aiohttp import web
+from telegram import Bot, Update
+from utils.logger import log_info, log_warning
+from config.settings import (
+    WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET_TOKEN, WEBHOOK_ENQUEUE_TIMEOUT,
+    WEBHOOK_MAX_CONNECTIONS, UPDATE_QUEUE_SIZE
+)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """Встроенный HTTP-сервер (aiohttp) для приема апдейтов Telegram.
+
+    Апдейт проверяется по секретному токену (заголовок
+    X-Telegram-Bot-Api-Secret-Token, задается в setWebhook) и кладется
+    в очередь апдейтов приложения. Очередь ограничена: если за
+    WEBHOOK_ENQUEUE_TIMEOUT место в ней не освободилось, сервер отвечает
+    503, и Telegram повторит доставку позже - апдейты не теряются, а
+    нагрузка не копится в памяти.
+
+    При параллельной обработке PTB забирает апдейты из очереди сразу,
+    поэтому ожидающие обработки апдейты передаются функцией backlog
+    и тоже учитываются в лимите max_backlog.
+    """
+
+    def __init__(self, bot: Bot, update_queue: asyncio.Queue,
+                 listen: str = WEBHOOK_LISTEN, port: int = WEBHOOK_PORT,
+                 path: str = WEBHOOK_PATH, secret_token: Optional[str] = WEBHOOK_SECRET_TOKEN,
+                 backlog: Optional[Callable[[], int]] = None, max_backlog: int = UPDATE_QUEUE_SIZE):
+        self.bot = bot
+        self.update_queue = update_queue
+        self.listen = listen
+        self.port = port
+        self.path = path
+        self.secret_token = secret_token
+        self.backlog = backlog
+        self.max_backlog = max_backlog
+        self._runner: Optional[web.AppRunner] = None
+        self.accepted = 0
+        self.rejected = 0  # Отказы из-за переполненной очереди
+        self.unauthorized = 0
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle_update)
+        return app
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        if self.secret_token:
+            received = request.headers.get(SECRET_HEADER, "")
+            if not hmac.compare_digest(received, self.secret_token):
+                self.unauthorized += 1
+                return web.Response(status=403)
+        try:
+            update = Update.de_json(await request.json(), self.bot)
+        except Exception as e:
+            log_warning(f"Некорректный апдейт на вебхуке: {e}")
+            return web.Response(status=400)
+        try:
+            if self.backlog is not None and self.update_queue.qsize() + self.backlog() >= self.max_backlog:
+                raise asyncio.TimeoutError
+            await asyncio.wait_for(self.update_queue.put(update), WEBHOOK_ENQUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            return web.Response(status=503, headers={"Retry-After": "1"})
+        self.accepted += 1
+        return web.Response()
+
+    async def start(self):
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.listen, self.port)
+        await site.start()
+        log_info(f"Вебхук слушает {self.listen}:{self.port}{self.path}")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+            log_info(f"Вебхук остановлен: {self.stats()}")
+
+    def stats(self) -> dict:
+        return {
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "unauthorized": self.unauthorized,
+            "queue_size": self.update_queue.qsize(),
+        }
+
+
+async def run_webhook(application, webhook_url: str):
+    """Запускает бота в режиме вебхука вместо run_polling.
+
+    Жизненный цикл повторяет run_polling: initialize, post_init, start;
+    по SIGINT/SIGTERM - stop, post_shutdown, shutdown. Вебхук при остановке
+    не снимается, чтобы не отключить остальные реплики за тем же адресом.
+    """
+    processor = application.update_processor
+    server = WebhookServer(
+        application.bot, application.update_queue,
+        backlog=(lambda: processor.pending) if hasattr(processor, "pending") else None
+    )
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass  # Windows: остановка через KeyboardInterrupt
+
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        await server.start()
+        try:
+            await application.bot.set_webhook(
+                url=webhook_url.rstrip("/") + server.path,
+                secret_token=server.secret_token,
+                max_connections=WEBHOOK_MAX_CONNECTIONS,
+                allowed_updates=Update.ALL_TYPES
+            )
+            await stop_event.wait()
+        finally:
+            await server.stop()
+            if application.running:
+                await application.stop()
+    finally:
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+        await application.shutdown()
@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+async def fail():
+    raise ConnectionError("down")
+
+
+async def ok():
+    return "ok"
+
+
+def test_opens_after_consecutive_failures():
+    async def scenario():
+        breaker = CircuitBreaker("hh", failure_threshold=3, reset_timeout=60)
+        for _ in range(3):
+            with pytest.raises(ConnectionError):
+                await breaker.call(fail)
+        assert breaker.state == CircuitBreaker.OPEN
+        with pytest.raises(CircuitOpenError):
+            await breaker.call(ok)
+        assert breaker.rejected == 1
+
+    asyncio.run(scenario())
+
+
+def test_success_resets_failure_count():
+    async def scenario():
+        breaker = CircuitBreaker("hh", failure_threshold=2, reset_timeout=60)
+        with pytest.raises(ConnectionError):
+            await breaker.call(fail)
+        assert await breaker.call(ok) == "ok"
+        with pytest.raises(ConnectionError):
+            await breaker.call(fail)
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_errors_rejected_by_is_failure_are_not_counted():
+    async def scenario():
+        breaker = CircuitBreaker(
+            "hh", failure_threshold=1, reset_timeout=60,
+            is_failure=lambda exc: not isinstance(exc, asyncio.TimeoutError)
+        )
+
+        async def timeout():
+            raise asyncio.TimeoutError()
+
+        with pytest.raises(asyncio.TimeoutError):
+            await breaker.call(timeout)
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.failures == 0
+
+    asyncio.run(scenario())
+
+
+def test_probe_closes_circuit():
+    async def scenario():
+        probes = []
+
+        async def probe():
+            probes.append(1)
+            if len(probes) < 2:
+                raise ConnectionError("still down")
+
+        breaker = CircuitBreaker("hh", failure_threshold=1, reset_timeout=0.01, probe=probe)
+        with pytest.raises(ConnectionError):
+            await breaker.call(fail)
+        assert breaker.state == CircuitBreaker.OPEN
+        await asyncio.wait_for(breaker._probe_task, 1)
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert len(probes) == 2
+        assert await breaker.call(ok) == "ok"
+
+    asyncio.run(scenario())
@@ -0,0 +1,35 @@
+import asyncio
+import pytest
+from services import hh_service
+
+
+def test_only_answers_are_cached(monkeypatch):
+    """Ошибка hh.ru не запоминается, а «город не найден» - запоминается."""
+    responses = {
+        "москва": [RuntimeError("hh.ru недоступен"), {"items": [{"id": "1"}]}],
+        "нигдеград": [{"items": []}],
+    }
+
+    async def get_json(url, params, endpoint=None):
+        response = responses[params["text"]].pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(hh_service, "_get_json", get_json)
+
+    # Один цикл событий: alru_cache привязан к циклу, в котором его вызвали
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await hh_service.get_city_id_by_city_name("москва")
+        assert await hh_service.get_city_id_by_city_name("москва") == "1"
+        assert await hh_service.get_city_id_by_city_name("москва") == "1"
+        assert await hh_service.get_city_id_by_city_name("нигдеград") is None
+        assert await hh_service.get_city_id_by_city_name("нигдеград") is None
+
+    hh_service.get_city_id_by_city_name.cache_clear()
+    try:
+        asyncio.run(scenario())
+    finally:
+        hh_service.get_city_id_by_city_name.cache_clear()
+    assert responses == {"москва": [], "нигдеград": []}
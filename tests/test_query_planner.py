@@ -0,0 +1,81 @@
+import asyncio
+from services import query_planner
+from services.query_planner import QueryPlanner, filter_by_salary, normalize_query
+
+
+def vacancy(vacancy_id, low=None, high=None, currency="RUR"):
+    salary = {'from': low, 'to': high, 'currency': currency} if low or high else None
+    return {'id': str(vacancy_id), 'salary': salary}
+
+
+def ids(vacancies):
+    return [item['id'] for item in vacancies]
+
+
+def test_normalize_query():
+    assert normalize_query("  Python   Разработчик Ёлка ") == "python разработчик елка"
+
+
+def test_no_range_keeps_everything():
+    vacancies = [vacancy(1), vacancy(2, 50000)]
+    assert filter_by_salary(vacancies, None, None) == vacancies
+
+
+def test_range_overlap():
+    vacancies = [
+        vacancy(1, 20000, 40000),   # пересекается с 30-60 тыс.
+        vacancy(2, 60000),          # касается верхней границы
+        vacancy(3, None, 29999),    # ниже диапазона
+        vacancy(4, 61000, 90000),   # выше диапазона
+        vacancy(5),                 # без зарплаты
+    ]
+    assert ids(filter_by_salary(vacancies, 30000, 60000)) == ["1", "2"]
+    assert ids(filter_by_salary(vacancies, 100000, None)) == []
+    assert ids(filter_by_salary(vacancies, None, 30000)) == ["1", "3"]
+
+
+def test_foreign_currency_needs_rate():
+    vacancies = [vacancy(1, 1000, currency="USD"), vacancy(2, 500, currency="KZT")]
+    assert filter_by_salary(vacancies, 50000, None) == []
+    assert ids(filter_by_salary(vacancies, 50000, None, {"USD": 0.01})) == ["1"]
+
+
+async def no_rates():
+    return {}
+
+
+def pages_of(items, per_page):
+    pages = [items[i:i + per_page] for i in range(0, len(items), per_page)]
+
+    async def fetch_vacancies(text, area, per_page, page):
+        return {'items': pages[page], 'pages': len(pages), 'found': len(items)}
+    return fetch_vacancies
+
+
+def test_search_reads_more_pages_until_count(monkeypatch):
+    items = [vacancy(i, 100000 if i % 4 == 0 else None) for i in range(40)]
+    monkeypatch.setattr(query_planner, "fetch_vacancies", pages_of(items, 10))
+    monkeypatch.setattr(query_planner, "get_currency_rates", no_rates)
+    planner = QueryPlanner(per_page=10, max_pages=3)
+    result = asyncio.run(planner.search("python", "1", 90000, None, count=5))
+    # Пяти подходящих хватило двух страниц из max_pages
+    assert ids(result['items']) == ["0", "4", "8", "12", "16"]
+    assert planner.pages_requested == 2
+
+
+def test_search_page_cursor_covers_every_match_once(monkeypatch):
+    items = [vacancy(i, 100000 if i % 3 == 0 else None) for i in range(47)]
+    monkeypatch.setattr(query_planner, "fetch_vacancies", pages_of(items, 10))
+    monkeypatch.setattr(query_planner, "get_currency_rates", no_rates)
+    planner = QueryPlanner(per_page=10, max_pages=2)
+
+    async def scroll():
+        shown, cursor = [], (0, 0)
+        while cursor is not None:
+            result = await planner.search_page("python", "1", 90000, None, 4, cursor)
+            assert len(result['items']) <= 4
+            shown += ids(result['items'])
+            cursor = result['next_cursor']
+        return shown
+
+    assert asyncio.run(scroll()) == [str(i) for i in range(47) if i % 3 == 0]
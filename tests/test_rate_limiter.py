@@ -0,0 +1,81 @@
+import asyncio
+import time
+from utils.rate_limiter import TokenBucket, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+
+
+def test_burst_then_rate():
+    async def scenario():
+        bucket = TokenBucket(rate=50, capacity=3)
+        started = time.monotonic()
+        for _ in range(3):
+            await bucket.acquire()
+        burst = time.monotonic() - started
+        await bucket.acquire()
+        return burst, time.monotonic() - started
+
+    burst, total = asyncio.run(scenario())
+    assert burst < 0.01
+    assert total >= 0.015
+
+
+def test_interactive_waiters_go_first():
+    async def scenario():
+        bucket = TokenBucket(rate=100, capacity=1)
+        await bucket.acquire()
+        order = []
+
+        async def take(name, priority):
+            await bucket.acquire(priority)
+            order.append(name)
+
+        tasks = [asyncio.create_task(take(f"bg{i}", PRIORITY_BACKGROUND)) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks += [asyncio.create_task(take(f"fg{i}", PRIORITY_INTERACTIVE)) for i in range(2)]
+        await asyncio.gather(*tasks)
+        return order
+
+    order = asyncio.run(scenario())
+    # bg0 уже ждал у диспетчера до прихода интерактивных
+    assert order.index("fg0") < order.index("bg1")
+    assert order.index("fg1") < order.index("bg1")
+    assert [name for name in order if name.startswith("bg")] == ["bg0", "bg1", "bg2"]
+
+
+def test_cancelled_waiter_does_not_block_others():
+    async def scenario():
+        bucket = TokenBucket(rate=100, capacity=1)
+        await bucket.acquire()
+        cancelled = asyncio.create_task(bucket.acquire())
+        waiting = asyncio.create_task(bucket.acquire())
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.wait_for(waiting, 1)
+        return bucket.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["waiting"] == 0
+    assert stats["acquired"] == 2
+
+
+def test_try_acquire_and_pause():
+    async def scenario():
+        bucket = TokenBucket(rate=10, capacity=1)
+        first = bucket.try_acquire()
+        second = bucket.try_acquire()
+        bucket.pause(5)
+        paused = bucket.try_acquire()
+        return first, second, paused
+
+    first, second, paused = asyncio.run(scenario())
+    assert first == 0
+    assert 0 < second <= 0.1
+    assert paused > 4.9
+
+
+def test_is_idle_after_refill():
+    bucket = TokenBucket(rate=1000, capacity=2)
+    assert bucket.is_idle()
+    bucket.try_acquire()
+    assert not bucket.is_idle()
+    time.sleep(0.005)
+    assert bucket.is_idle()
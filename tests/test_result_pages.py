@@ -0,0 +1,58 @@
+from handlers import result_pages
+from handlers.result_pages import (
+    render_page, render_card, format_salary, SEARCH_RESULTS, FAVORITES, RESULTS_PER_PAGE
+)
+
+
+def vacancy(number):
+    return {
+        'id': str(1000 + number), 'title': f"Вакансия {number}", 'company': "Компания",
+        'area': "Москва", 'salary': {'from': 100000, 'to': None, 'currency': "RUR"},
+        'url': f"https://hh.ru/vacancy/{1000 + number}",
+    }
+
+
+def callbacks(markup):
+    return [[button.callback_data for button in row] for row in markup.inline_keyboard]
+
+
+def test_format_salary():
+    assert format_salary(None) == "Не указана"
+    assert format_salary({'from': 1, 'to': 2, 'currency': "RUR"}) == "1 - 2 RUR"
+    assert format_salary({'from': None, 'to': 2, 'currency': "USD"}) == "до 2 USD"
+    assert format_salary({'from': None, 'to': None}) == "Не указана"
+
+
+def test_card_falls_back_to_city_and_placeholders():
+    card = render_card({'title': "QA", 'city': "Казань", 'salary': None, 'url': "u"})
+    assert card == "QA\nКомпания: Не указана\nГород: Казань\nЗарплата: Не указана\nСсылка: u"
+
+
+def test_single_page_has_no_navigation():
+    text, markup = render_page(SEARCH_RESULTS, "Найдено", [vacancy(1), vacancy(2)], 1)
+    assert text.startswith("Найдено (2):\n\n1. Вакансия 1")
+    assert "Страница" not in text
+    assert callbacks(markup) == [
+        ["add_fav:1001", "related:1001"],
+        ["add_fav:1002", "related:1002"],
+    ]
+
+
+def test_pages_number_cards_globally_and_clamp():
+    items = [vacancy(number) for number in range(1, 2 * RESULTS_PER_PAGE + 2)]
+    text, markup = render_page(SEARCH_RESULTS, "Найдено", items, 2)
+    first = RESULTS_PER_PAGE + 1
+    assert f"\n\n{first}. Вакансия {first}" in text
+    assert text.endswith("Страница 2 из 3")
+    assert callbacks(markup)[-1] == ["page:search:1", "page:search:3"]
+
+    text, markup = render_page(SEARCH_RESULTS, "Найдено", items, 99)
+    assert text.endswith("Страница 3 из 3")
+    assert callbacks(markup)[-1] == ["page:search:2"]
+
+
+def test_favorites_have_remove_buttons(monkeypatch):
+    monkeypatch.setattr(result_pages, "RESULTS_PER_PAGE", 1)
+    items = [{**vacancy(number), 'db_id': number} for number in (1, 2)]
+    text, markup = render_page(FAVORITES, "Избранное", items, 2)
+    assert callbacks(markup) == [["remove_fav:1002:2:2"], ["page:fav:1"]]
@@ -0,0 +1,57 @@
+from utils.seen_set import SeenSet
+
+DAY = 86400
+
+
+def make(max_ids=100):
+    return SeenSet(window=7 * DAY, generations=7, max_ids=max_ids)
+
+
+def test_add_and_contains():
+    seen = make()
+    seen.add(["101", 102, "abc", -1, 2 ** 32], now=1000)
+    assert "101" in seen and 102 in seen
+    assert "103" not in seen
+    assert "abc" not in seen
+    assert len(seen) == 2
+
+
+def test_round_trip_bytes():
+    seen = make()
+    seen.add(["5", "3"], now=1000)
+    seen.add(["7"], now=1000 + 2 * DAY)
+    data = seen.to_bytes()
+    assert len(data) == 3 + 2 * 8 + 3 * 4
+    restored = SeenSet.from_bytes(data, 7 * DAY, 7, 100)
+    assert all(vacancy_id in restored for vacancy_id in ("3", "5", "7"))
+    assert restored.to_bytes() == data
+
+
+def test_from_bytes_tolerates_empty_and_unknown_format():
+    assert len(SeenSet.from_bytes(None, 7 * DAY, 7, 100)) == 0
+    assert len(SeenSet.from_bytes(b"\x99garbage", 7 * DAY, 7, 100)) == 0
+
+
+def test_generations_older_than_window_expire():
+    seen = make()
+    seen.add(["1"], now=1000)
+    seen.add(["2"], now=1000 + 3 * DAY)
+    seen.add(["3"], now=1000 + 7 * DAY)
+    assert "1" not in seen
+    assert "2" in seen and "3" in seen
+
+
+def test_overflow_drops_oldest_first():
+    seen = make(max_ids=3)
+    seen.add(["10", "11"], now=1000)
+    seen.add(["20", "21"], now=1000 + 2 * DAY)
+    assert len(seen) == 3
+    assert "10" not in seen
+    assert all(vacancy_id in seen for vacancy_id in ("11", "20", "21"))
+
+
+def test_repeated_add_does_not_duplicate():
+    seen = make()
+    seen.add(["1", "1", "2"], now=1000)
+    seen.add(["2"], now=1000 + 2 * DAY)
+    assert len(seen) == 2
@@ -0,0 +1,99 @@
+import asyncio
+from datetime import datetime, timezone
+from handlers import subscription_manager
+from handlers.subscription_manager import SubscriptionManager
+from utils.seen_set import SeenSet
+from config.settings import SEEN_SET_WINDOW, SEEN_SET_GENERATIONS, SEEN_SET_MAX_IDS
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+class FakeDatabase:
+    """Строки subscriptions в памяти с тем же контрактом, что у AsyncDatabaseHandler."""
+
+    def __init__(self, subscriptions):
+        self.rows = {row['id']: dict(row) for row in subscriptions}
+
+    async def get_delivery_state(self, subscription_ids):
+        return [dict(self.rows[subscription_id]) for subscription_id in sorted(subscription_ids)]
+
+    async def update_delivery_state(self, subscription_ids, update):
+        for subscription_id in sorted(subscription_ids):
+            row = self.rows[subscription_id]
+            mark, seen = update(dict(row))
+            if mark is not None:
+                row['last_vacancy_time'] = max(row['last_vacancy_time'], mark)
+            if seen is not None:
+                row['seen_vacancies'] = seen
+        return True
+
+
+class FakeQueue:
+    def __init__(self, failing_chats=()):
+        self.failing_chats = set(failing_chats)
+        self.sent = []
+
+    async def notify_vacancies(self, chat_id, vacancies):
+        if chat_id in self.failing_chats:
+            return False
+        self.sent.append((chat_id, [vacancy['id'] for vacancy in vacancies]))
+        return True
+
+
+def vacancy(vacancy_id, minute):
+    return {'id': str(vacancy_id), 'published_at': f"2026-01-01T00:{minute:02d}:00+0000"}
+
+
+def seen_ids(row, vacancy_ids):
+    seen = SeenSet.from_bytes(row['seen_vacancies'], SEEN_SET_WINDOW, SEEN_SET_GENERATIONS, SEEN_SET_MAX_IDS)
+    return [vacancy_id for vacancy_id in vacancy_ids if vacancy_id in seen]
+
+
+def make_manager(monkeypatch, queue, vacancies):
+    monkeypatch.setattr(subscription_manager, "SUBSCRIPTION_INDEX_ENABLED", False)
+    manager = SubscriptionManager(queue, worker_id="test")
+    manager.db = FakeDatabase([
+        {'id': 1, 'user_id': 10, 'last_vacancy_time': START, 'seen_vacancies': None},
+        {'id': 2, 'user_id': 20, 'last_vacancy_time': START, 'seen_vacancies': None},
+    ])
+
+    async def check_new_vacancies(group):
+        return vacancies, False
+
+    manager.check_new_vacancies = check_new_vacancies
+    return manager
+
+
+def group():
+    return {
+        'group_key': "key", 'position': "python", 'location': None,
+        'subscribers': [{'id': 1, 'user_id': 10, 'last_vacancy_time': START},
+                        {'id': 2, 'user_id': 20, 'last_vacancy_time': START}],
+    }
+
+
+def test_mark_moves_only_after_delivery(monkeypatch):
+    queue = FakeQueue(failing_chats={20})
+    vacancies = [vacancy(101, 5), vacancy(102, 7)]
+    manager = make_manager(monkeypatch, queue, vacancies)
+
+    asyncio.run(manager.check_group(group()))
+
+    delivered, failed = manager.db.rows[1], manager.db.rows[2]
+    assert queue.sent == [(10, ["101", "102"])]
+    assert delivered['last_vacancy_time'] == datetime(2026, 1, 1, 0, 7, tzinfo=timezone.utc)
+    assert seen_ids(delivered, ["101", "102"]) == ["101", "102"]
+    # Недоставленное остается за отметкой и уйдет при следующей проверке
+    assert failed['last_vacancy_time'] == START
+    assert failed['seen_vacancies'] is None
+
+
+def test_redelivery_is_deduplicated(monkeypatch):
+    queue = FakeQueue(failing_chats={20})
+    manager = make_manager(monkeypatch, queue, [vacancy(101, 5)])
+    asyncio.run(manager.check_group(group()))
+
+    queue.failing_chats.clear()
+    # Группу проверяют снова по старым отметкам из аренды - получит только тот, кому не доставили
+    asyncio.run(manager.check_group(group()))
+    assert queue.sent == [(10, ["101"]), (20, ["101"])]
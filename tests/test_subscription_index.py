@@ -0,0 +1,100 @@
+import random
+from services.subscription_index import SubscriptionIndex, _IndexedSubscription, tokenize, vacancy_salary_range
+
+
+def subscription(subscription_id, position, location=None, salary_min=None, salary_max=None):
+    return {
+        'id': subscription_id, 'user_id': subscription_id * 10, 'position': position,
+        'location': location, 'salary_min': salary_min, 'salary_max': salary_max,
+    }
+
+
+def vacancy(vacancy_id, title, area="Москва", low=None, high=None, currency="RUR"):
+    salary = {'from': low, 'to': high, 'currency': currency} if low or high else None
+    return {'id': str(vacancy_id), 'title': title, 'area': area, 'salary': salary}
+
+
+def matched_ids(index, vacancies, rates=None):
+    return {
+        subscription_id: [item['id'] for item in items]
+        for subscription_id, items in index.match(vacancies, rates).items()
+    }
+
+
+def test_all_position_words_must_be_in_title():
+    index = SubscriptionIndex(salary_bucket=20000, max_bucket=50)
+    index.rebuild([subscription(1, "Python разработчик"), subscription(2, "Java разработчик")])
+    assert matched_ids(index, [vacancy(1, "Senior Python-разработчик")]) == {1: ["1"]}
+
+
+def test_area_and_salary_are_checked():
+    index = SubscriptionIndex(salary_bucket=20000, max_bucket=50)
+    index.rebuild([
+        subscription(1, "аналитик", "москва"),
+        subscription(2, "аналитик", "Санкт-Петербург"),
+        subscription(3, "аналитик", None, 100000, None),
+        subscription(4, "аналитик", None, 30000, 60000),
+    ])
+    assert matched_ids(index, [vacancy(1, "Аналитик", "Москва", 50000, 70000)]) == {1: ["1"], 4: ["1"]}
+    assert matched_ids(index, [vacancy(2, "Аналитик", "Москва", 120000)]) == {1: ["2"], 3: ["2"]}
+    # Подписке с зарплатой не подходит вакансия без зарплаты или в валюте без курса
+    assert matched_ids(index, [vacancy(3, "Аналитик", "Москва")]) == {1: ["3"]}
+    assert matched_ids(index, [vacancy(4, "Аналитик", "Москва", 2000, currency="USD")]) == {1: ["4"]}
+
+
+def test_add_and_remove():
+    index = SubscriptionIndex(salary_bucket=20000, max_bucket=50)
+    index.add(subscription(1, "тестировщик"))
+    assert matched_ids(index, [vacancy(1, "Тестировщик")]) == {1: ["1"]}
+    index.add(subscription(1, "тестировщик", "Казань"))
+    assert matched_ids(index, [vacancy(1, "Тестировщик")]) == {}
+    index.remove(1)
+    assert len(index) == 0
+    assert matched_ids(index, [vacancy(1, "Тестировщик", "Казань")]) == {}
+
+
+def test_salary_range_conversion():
+    assert vacancy_salary_range(vacancy(1, "x", low=50000)) == (50000, 50000)
+    assert vacancy_salary_range(vacancy(1, "x", high=80000)) == (80000, 80000)
+    assert vacancy_salary_range(vacancy(1, "x", low=1000, high=2000, currency="USD")) is None
+    assert vacancy_salary_range(vacancy(1, "x", low=1000, high=2000, currency="USD"), {"USD": 0.01}) == (100000, 200000)
+
+
+
+def test_foreign_currency_matches_with_rates():
+    index = SubscriptionIndex(salary_bucket=20000, max_bucket=50)
+    index.rebuild([subscription(1, "разработчик", salary_min=150000), subscription(2, "разработчик")])
+    vacancies = [vacancy(1, "Разработчик", low=2000, high=3000, currency="USD")]
+    assert matched_ids(index, vacancies) == {2: ["1"]}
+    assert matched_ids(index, vacancies, {"USD": 0.01}) == {1: ["1"], 2: ["1"]}
+
+
+def test_matches_brute_force():
+    rng = random.Random(5)
+    words = ["python", "java", "разработчик", "аналитик", "senior", "data", "qa", "devops"]
+    areas = ["Москва", "Казань", "Томск", None]
+    salaries = [None, 20000, 45000, 80000, 150000, 400000, 2000000]
+    subscriptions = [
+        subscription(
+            subscription_id, " ".join(rng.sample(words, rng.randint(1, 2))), rng.choice(areas),
+            rng.choice(salaries), rng.choice([None, None, 100000, 300000])
+        )
+        for subscription_id in range(1, 300)
+    ]
+    vacancies = [
+        vacancy(vacancy_id, " ".join(rng.sample(words, rng.randint(1, 4))), rng.choice(areas[:3]),
+                rng.choice(salaries), rng.choice(salaries))
+        for vacancy_id in range(200)
+    ]
+    index = SubscriptionIndex(salary_bucket=20000, max_bucket=50)
+    index.rebuild(subscriptions)
+
+    expected = {}
+    for item in vacancies:
+        tokens, salary = tokenize(item['title']), vacancy_salary_range(item)
+        for sub in subscriptions:
+            indexed = _IndexedSubscription(sub)
+            area_ok = indexed.area is None or indexed.area == (item['area'] or "").lower()
+            if indexed.tokens and area_ok and indexed.matches(tokens, salary):
+                expected.setdefault(sub['id'], []).append(item['id'])
+    assert matched_ids(index, vacancies) == expected
@@ -0,0 +1,67 @@
+import pytest
+from utils import ttl_cache
+from utils.ttl_cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ttl_cache, "time", clock)
+    return clock
+
+
+def test_get_returns_fresh_value(clock):
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_expired_entry_is_kept_for_revalidation(clock):
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", 1, etag='"v1"', last_modified="Mon, 01 Jan 2026 00:00:00 GMT")
+    clock.now += 10
+    assert cache.get("a") is None
+    entry = cache.get_entry("a")
+    assert entry.value == 1 and entry.etag == '"v1"' and not entry.is_fresh()
+
+
+def test_touch_extends_life(clock):
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+    clock.now += 10
+    cache.touch("a")
+    assert cache.get("a") == 1
+    assert cache.revalidations == 1
+    clock.now += 9
+    assert cache.get("a") == 1
+
+
+def test_evicts_least_recently_used(clock):
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get_entry("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert len(cache) == 2 and cache.evictions == 1
+
+
+def test_get_entry_counts_as_use(clock):
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get_entry("a")
+    cache.set("c", 3)
+    assert cache.get_entry("a") is not None
+    assert cache.get_entry("b") is None
@@ -0,0 +1,94 @@
+import asyncio
+import pytest
+from telegram import Update
+from handlers.update_processor import ChatOrderedUpdateProcessor
+
+
+def message(update_id, chat_id):
+    return Update.de_json({
+        "update_id": update_id,
+        "message": {"message_id": update_id, "date": 0, "chat": {"id": chat_id, "type": "private"}, "text": "x"},
+    }, None)
+
+
+def inline_query(update_id, user_id):
+    return Update.de_json({
+        "update_id": update_id,
+        "inline_query": {"id": str(update_id), "from": {"id": user_id, "is_bot": False, "first_name": "u"},
+                         "query": "python", "offset": ""},
+    }, None)
+
+
+def test_ordering_key():
+    assert ChatOrderedUpdateProcessor.ordering_key(message(1, 42)) == 42
+    assert ChatOrderedUpdateProcessor.ordering_key(inline_query(2, 7)) == 7
+    assert ChatOrderedUpdateProcessor.ordering_key("not an update") is None
+
+
+def run_updates(processor, updates, durations):
+    """Запускает апдейты в порядке получения; возвращает журнал (событие, номер апдейта)."""
+    log = []
+    active = {"now": 0, "max": 0}
+
+    async def handle(number):
+        log.append(("start", number))
+        active["now"] += 1
+        active["max"] = max(active["max"], active["now"])
+        await asyncio.sleep(durations[number])
+        active["now"] -= 1
+        log.append(("end", number))
+
+    async def scenario():
+        await asyncio.gather(*(
+            processor.do_process_update(update, handle(number)) for number, update in enumerate(updates)
+        ))
+
+    asyncio.run(scenario())
+    return log, active["max"]
+
+
+def test_same_chat_is_processed_in_order():
+    processor = ChatOrderedUpdateProcessor(workers=4, max_pending=100)
+    updates = [message(number, 1) for number in range(4)]
+    log, concurrency = run_updates(processor, updates, [0.03, 0.01, 0.02, 0.0])
+    assert log == [event for number in range(4) for event in (("start", number), ("end", number))]
+    assert concurrency == 1
+
+
+def test_other_chats_do_not_wait_for_a_slow_chat():
+    processor = ChatOrderedUpdateProcessor(workers=4, max_pending=100)
+    updates = [message(0, 1), message(1, 2), message(2, 3)]
+    log, concurrency = run_updates(processor, updates, [0.05, 0.0, 0.0])
+    assert log.index(("end", 1)) < log.index(("end", 0))
+    assert log.index(("end", 2)) < log.index(("end", 0))
+    assert concurrency == 3
+
+
+def test_workers_limit_concurrency():
+    processor = ChatOrderedUpdateProcessor(workers=2, max_pending=100)
+    updates = [message(number, 100 + number) for number in range(6)]
+    _, concurrency = run_updates(processor, updates, [0.01] * 6)
+    assert concurrency == 2
+    stats = processor.stats()
+    assert stats["processed"] == 6
+    assert stats["pending"] == 0 and stats["running"] == 0
+    assert stats["chats_in_flight"] == 0
+
+
+def test_failed_update_releases_its_chat():
+    processor = ChatOrderedUpdateProcessor(workers=2, max_pending=100)
+
+    async def fail():
+        raise RuntimeError("handler error")
+
+    async def ok():
+        return "done"
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await processor.do_process_update(message(1, 5), fail())
+        await asyncio.wait_for(processor.do_process_update(message(2, 5), ok()), 1)
+
+    asyncio.run(scenario())
+    assert processor.stats()["chats_in_flight"] == 0
+    assert processor.processed == 2
@@ -0,0 +1,126 @@
+"""Сравнение пропускной способности обработки апдейтов: синхронный
+DatabaseHandler (psycopg2, блокирует event loop) против AsyncDatabaseHandler
+(asyncpg).
+
+Каждый "апдейт" повторяет типичную работу обработчика: запись в историю
+поиска, чтение страницы истории и списка избранного. Нужна локальная
+PostgreSQL с примененными миграциями (python -m services.migrations).
+
+    python -m utils.bench_db --updates 2000 --concurrency 50
+
+Без PostgreSQL можно оценить сам эффект блокировки event loop: запросы
+заменяются задержкой --simulate-latency миллисекунд (time.sleep для
+psycopg2, asyncio.sleep для asyncpg с тем же размером пула):
+
+    python -m utils.bench_db --simulate-latency 2
+
+Результаты симуляции (2000 апдейтов, concurrency 50, пул 10):
+
+    задержка запроса   psycopg2      asyncpg       ускорение
+    0.5 мс             539 апд/с     2222 апд/с    x4.1
+    2 мс               148 апд/с     1179 апд/с    x8.0
+    5 мс               64 апд/с      587 апд/с     x9.2
+"""
+import argparse
+import asyncio
+import os
+import time
+from services.database import DatabaseHandler, AsyncDatabaseHandler
+
+# Диапазон user_id, заведомо не пересекающийся с реальными пользователями Telegram
+BENCH_USER_ID_BASE = 2_000_000_000
+
+
+class SimulatedSyncHandler:
+    """DatabaseHandler, у которого каждый запрос - блокирующая задержка."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def _query(self, *args):
+        time.sleep(self.latency)
+
+    save_search_history = get_search_history = get_favorites = _query
+
+    def close(self):
+        pass
+
+
+class SimulatedAsyncHandler:
+    """AsyncDatabaseHandler, у которого каждый запрос - неблокирующая задержка
+    с ограничением одновременных запросов размером пула."""
+
+    def __init__(self, latency: float, pool_size: int):
+        self.latency = latency
+        self._connections = asyncio.Semaphore(pool_size)
+
+    async def _query(self, *args):
+        async with self._connections:
+            await asyncio.sleep(self.latency)
+
+    save_search_history = get_search_history = get_favorites = _query
+
+    async def close(self):
+        pass
+
+
+async def simulate_sync_update(db: DatabaseHandler, user_id: int):
+    """Апдейт в старом стиле: синхронные вызовы прямо внутри корутины."""
+    db.save_search_history(user_id, "Разработчик", "Москва", "Не важно", 3)
+    db.get_search_history(user_id)
+    db.get_favorites(user_id)
+
+
+async def simulate_async_update(db: AsyncDatabaseHandler, user_id: int):
+    """Апдейт с асинхронным слоем доступа к данным."""
+    await db.save_search_history(user_id, "Разработчик", "Москва", "Не важно", 3)
+    await db.get_search_history(user_id)
+    await db.get_favorites(user_id)
+
+
+async def run(simulate, db, updates: int, concurrency: int) -> float:
+    """Прогоняет updates апдейтов не более чем по concurrency одновременно,
+    возвращает апдейтов в секунду."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            await simulate(db, BENCH_USER_ID_BASE + i % concurrency)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(updates)))
+    return updates / (time.perf_counter() - started)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--simulate-latency", type=float, default=None,
+                        help="Задержка запроса, мс: без PostgreSQL, вместо реальных запросов")
+    args = parser.parse_args()
+
+    if args.simulate_latency is not None:
+        latency = args.simulate_latency / 1000
+        sync_db = SimulatedSyncHandler(latency)
+        async_db = SimulatedAsyncHandler(latency, int(os.getenv('POSTGRES_POOL_MAX_SIZE', 10)))
+    else:
+        sync_db = DatabaseHandler()
+        async_db = AsyncDatabaseHandler()
+    try:
+        sync_rate = await run(simulate_sync_update, sync_db, args.updates, args.concurrency)
+        async_rate = await run(simulate_async_update, async_db, args.updates, args.concurrency)
+        print(f"psycopg2 (blocking):  {sync_rate:8.1f} updates/s")
+        print(f"asyncpg (async pool): {async_rate:8.1f} updates/s")
+        print(f"speedup: x{async_rate / sync_rate:.2f}")
+    finally:
+        if args.simulate_latency is None:
+            await async_db.db.execute(
+                "DELETE FROM search_history WHERE user_id >= $1", BENCH_USER_ID_BASE
+            )
+        sync_db.close()
+        await async_db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+"""Замер сопоставления вакансий с подписками через SubscriptionIndex.
+
+Сравнивает индекс с полным перебором подписок на синтетических данных:
+
+    python -m utils.bench_subscription_index --subscriptions 100000 --vacancies 100
+"""
+import argparse
+import random
+import time
+from services.subscription_index import (
+    SubscriptionIndex, _IndexedSubscription, tokenize, normalize_area, vacancy_salary_range
+)
+
+CITIES = [f"Город {i}" for i in range(60)]
+SALARIES = [None, 40000, 60000, 80000, 100000, 150000, 200000, 300000]
+
+
+def make_data(subscriptions: int, vacancies: int, vocabulary: int):
+    words = [f"слово{i}" for i in range(vocabulary)]
+    subscription_list = [{
+        'id': i,
+        'user_id': i,
+        'position': " ".join(random.sample(words, random.randint(1, 3))),
+        'location': random.choice(CITIES + [None]),
+        'salary_min': random.choice(SALARIES),
+        'salary_max': None,
+    } for i in range(subscriptions)]
+    vacancy_list = [{
+        'id': str(i),
+        'title': " ".join(random.sample(words, random.randint(2, 5))),
+        'area': random.choice(CITIES),
+        'salary': random.choice([None, {'from': 90000, 'to': 160000, 'currency': 'RUR'}]),
+    } for i in range(vacancies)]
+    return subscription_list, vacancy_list
+
+
+def full_scan(subscriptions, vacancies) -> int:
+    indexed = [_IndexedSubscription(subscription) for subscription in subscriptions]
+    matches = 0
+    for vacancy in vacancies:
+        tokens = tokenize(vacancy['title'])
+        area = normalize_area(vacancy['area'])
+        salary = vacancy_salary_range(vacancy)
+        for subscription in indexed:
+            if subscription.tokens and subscription.area in (None, area) and subscription.matches(tokens, salary):
+                matches += 1
+    return matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subscriptions", type=int, default=100000)
+    parser.add_argument("--vacancies", type=int, default=100)
+    parser.add_argument("--vocabulary", type=int, default=3000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    subscriptions, vacancies = make_data(args.subscriptions, args.vacancies, args.vocabulary)
+
+    index = SubscriptionIndex()
+    started = time.perf_counter()
+    index.rebuild(subscriptions)
+    print(f"build: {time.perf_counter() - started:.3f} s, {index.stats()}")
+
+    started = time.perf_counter()
+    matched = index.match(vacancies)
+    index_matches = sum(len(items) for items in matched.values())
+    print(f"index: {(time.perf_counter() - started) * 1000:.1f} ms, {index_matches} matches")
+
+    started = time.perf_counter()
+    scan_matches = full_scan(subscriptions, vacancies)
+    print(f"full scan: {(time.perf_counter() - started) * 1000:.1f} ms, {scan_matches} matches")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Сверка локального фильтра зарплаты QueryPlanner с поиском по зарплате hh.ru.
+
+Запись фикстур (нужен доступ к api.hh.ru): для каждого запроса сохраняются
+каноническая страница без зарплаты, курсы валют hh.ru и ответы hh.ru на
+поиск с salary=<сумма>&only_with_salary=true для каждой границы диапазонов
+SALARY_RANGES. hh.ru по параметру salary ищет вакансии, в вилку которых
+попадает сумма:
+
+    python -m utils.check_query_planner --record "Разработчик:1" "Аналитик:2"
+
+Сверка по записанным фикстурам (без сети): вакансии канонической страницы,
+отобранные filter_by_salary(сумма, сумма), должны в точности совпасть с
+вакансиями той же страницы, которые вернул hh.ru:
+
+    python -m utils.check_query_planner
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from config.api_url import HH_API_URL, HH_API_DICTIONARIES
+from services.hh_service import _get_json, close_session
+from services.query_planner import filter_by_salary, normalize_query
+from handlers.start_handler import SALARY_RANGES
+from utils.parse_salary import parse_salary
+from config.settings import SEARCH_CANONICAL_PER_PAGE
+
+FIXTURES_DIR = os.path.join("tests", "fixtures", "planner")
+
+
+def salary_points() -> list:
+    """Ненулевые границы диапазонов SALARY_RANGES по возрастанию."""
+    points = set()
+    for salary_range in SALARY_RANGES:
+        points.update(bound for bound in parse_salary(salary_range) if bound)
+    return sorted(points)
+
+
+def salary_params(salary: int) -> dict:
+    """Параметры поиска hh.ru /vacancies по зарплате."""
+    return {"salary": salary, "only_with_salary": "true"}
+
+
+async def record(directory: str, queries: list):
+    os.makedirs(directory, exist_ok=True)
+    try:
+        dictionaries = await _get_json(HH_API_DICTIONARIES, None, "hh_dictionaries")
+        for query in queries:
+            text, _, area = query.partition(":")
+            params = {"text": normalize_query(text), "area": area or "113", "per_page": SEARCH_CANONICAL_PER_PAGE}
+            fixture = {
+                "query": params,
+                "currency": dictionaries["currency"],
+                "broad": await _get_json(HH_API_URL, params),
+                "by_salary": {},
+            }
+            for salary in salary_points():
+                fixture["by_salary"][str(salary)] = await _get_json(HH_API_URL, {**params, **salary_params(salary)})
+            path = os.path.join(directory, f"{params['text'].replace(' ', '_')}_{params['area']}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(fixture, f, ensure_ascii=False)
+            print(f"записано: {path}")
+    finally:
+        await close_session()
+
+
+def load_fixtures(directory: str) -> list:
+    """(имя файла, фикстура) для всех фикстур каталога."""
+    fixtures = []
+    if not os.path.isdir(directory):
+        return fixtures
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".json"):
+            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                fixtures.append((name, json.load(f)))
+    return fixtures
+
+
+def compare_salary(fixture: dict, salary: str) -> tuple:
+    """(id, отобранные локально, id, которые вернул hh.ru) для вакансий канонической страницы."""
+    broad = fixture["broad"]["items"]
+    rates = {currency["code"]: currency["rate"] for currency in fixture["currency"] if currency.get("rate")}
+    local = {item["id"] for item in filter_by_salary(broad, int(salary), int(salary), rates)}
+    # hh.ru ищет по всей выдаче - сравниваем только вакансии канонической страницы
+    remote = {item["id"] for item in fixture["by_salary"][salary]["items"]} & {item["id"] for item in broad}
+    return local, remote
+
+
+def compare(directory: str) -> bool:
+    """True, если фикстуры есть и для всех сумм результаты совпали."""
+    fixtures = load_fixtures(directory)
+    if not fixtures:
+        print(f"нет фикстур в {directory}: запишите их с доступом к api.hh.ru через --record")
+        return False
+    ok = True
+    for name, fixture in fixtures:
+        for salary in fixture["by_salary"]:
+            local, remote = compare_salary(fixture, salary)
+            if local == remote:
+                status = "ok"
+            else:
+                ok = False
+                status = f"только локально {sorted(local - remote)}, только hh.ru {sorted(remote - local)}"
+            print(f"{name} {salary}: {len(local)} / {len(remote)} - {status}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("queries", nargs="*", help="Запросы для --record в виде 'текст:id города'")
+    parser.add_argument("--directory", default=FIXTURES_DIR)
+    parser.add_argument("--record", action="store_true")
+    args = parser.parse_args()
+
+    if args.record:
+        asyncio.run(record(args.directory, args.queries))
+        return
+    sys.exit(0 if compare(args.directory) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import asyncio
+import time
+from utils.logger import log_info, log_warning
+from utils.deadline import detached
+
+
+class CircuitOpenError(Exception):
+    """Запрос не выполнялся: внешний сервис считается недоступным."""
+
+
+class CircuitBreaker:
+    """Предохранитель для вызовов внешнего сервиса.
+
+    После failure_threshold неудач подряд цепь размыкается, и вызовы сразу
+    завершаются CircuitOpenError, не дожидаясь таймаутов. Пока цепь
+    разомкнута, фоновая задача раз в reset_timeout секунд вызывает probe()
+    и замыкает цепь после первой успешной проверки.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float, probe=None, is_failure=None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probe = probe
+        self.is_failure = is_failure or (lambda exc: True)
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.rejected = 0  # Вызовов, отклоненных без обращения к сервису
+        self._probe_task = None
+
+    async def call(self, func, *args, **kwargs):
+        if self.state == self.OPEN:
+            self.rejected += 1
+            raise CircuitOpenError(f"{self.name} недоступен")
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as exc:
+            if self.is_failure(exc):
+                self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def record_success(self):
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.CLOSED and self.failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        log_warning(f"Цепь {self.name} разомкнута после {self.failures} ошибок подряд.")
+        if self.probe is not None and (self._probe_task is None or self._probe_task.done()):
+            # Проверка живет дольше апдейта, который разомкнул цепь
+            self._probe_task = detached(self._probe_loop())
+
+    def _close(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        log_info(f"Цепь {self.name} замкнута: сервис снова доступен.")
+
+    async def _probe_loop(self):
+        while self.state == self.OPEN:
+            await asyncio.sleep(self.reset_timeout)
+            try:
+                await self.probe()
+            except Exception as exc:
+                log_warning(f"Проверка {self.name} не прошла: {exc!r}")
+                continue
+            self._close()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,56 @@
+import asyncio
+import contextvars
+from contextlib import contextmanager
+
+# Абсолютный момент (по часам event loop), к которому должна завершиться
+# обработка текущего апдейта. Наследуется всеми задачами, созданными из него.
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """Бюджет времени на обработку апдейта исчерпан."""
+
+
+@contextmanager
+def deadline_scope(seconds: float):
+    """Ограничивает все вложенные вызовы сроком seconds (вложенные
+    области могут только сократить срок, но не продлить)."""
+    deadline = asyncio.get_running_loop().time() + seconds
+    current = _deadline.get()
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining(reserve: float = 0.0):
+    """Сколько секунд осталось до срока (None, если срок не задан)."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - asyncio.get_running_loop().time() - reserve
+
+
+def timeout_for(endpoint_timeout: float) -> float:
+    """Таймаут внешнего вызова: не больше собственного таймаута точки
+    и не больше остатка бюджета. Если бюджет исчерпан - DeadlineExceeded."""
+    left = remaining()
+    if left is None:
+        return endpoint_timeout
+    if left <= 0:
+        raise DeadlineExceeded()
+    return min(endpoint_timeout, left)
+
+
+def detached(coro) -> asyncio.Task:
+    """Запускает фоновую задачу вне бюджета текущего апдейта."""
+    return asyncio.get_running_loop().create_task(coro, context=contextvars.Context())
+
+
+def without_deadline(coro) -> asyncio.Task:
+    """Запускает задачу в контексте текущей, но без ее бюджета времени
+    (общая работа, которую ждут вызовы с разными сроками)."""
+    context = contextvars.copy_context()
+    context.run(_deadline.set, None)
+    return asyncio.get_running_loop().create_task(coro, context=context)
@@ -0,0 +1,122 @@
+"""Нагрузочный тест вебхука: шлет синтетические апдейты Telegram на эндпоинт
+и считает устойчивую пропускную способность.
+
+По умолчанию поднимает WebhookServer в этом же процессе с очередью, которую
+разбирает потребитель с заданной скоростью (--drain-rate, 0 - без ограничения),
+так что видно и прием, и отказы 503 при заполненной очереди:
+
+    python -m utils.load_webhook --updates 20000 --concurrency 100
+
+Против запущенного бота (BOT_MODE=webhook; апдейты от выдуманных
+пользователей, ответы им Telegram отклонит):
+
+    python -m utils.load_webhook --url http://127.0.0.1:8443/telegram --secret <token>
+"""
+import argparse
+import asyncio
+import itertools
+import statistics
+import time
+import aiohttp
+from telegram import Bot
+from services.webhook_server import WebhookServer, SECRET_HEADER
+
+# Диапазон id, заведомо не пересекающийся с реальными пользователями Telegram
+LOAD_USER_ID_BASE = 2_000_000_000
+LOCAL_PORT = 18443
+LOCAL_SECRET = "load-test-secret"
+
+
+def make_update(update_id: int, users: int) -> dict:
+    user_id = LOAD_USER_ID_BASE + update_id % users
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Load"},
+            "text": "Поиск вакансий",
+        },
+    }
+
+
+async def drain(queue: asyncio.Queue, rate: float):
+    """Потребитель очереди вместо Application: забирает апдейты с темпом rate в секунду."""
+    while True:
+        await queue.get()
+        if rate:
+            await asyncio.sleep(1 / rate)
+
+
+async def fire(url: str, secret: str, updates: int, concurrency: int, users: int) -> dict:
+    counter = itertools.count()
+    statuses = {}
+    latencies = []
+    headers = {SECRET_HEADER: secret} if secret else {}
+
+    async def worker(session):
+        while True:
+            update_id = next(counter)
+            if update_id >= updates:
+                return
+            started = time.perf_counter()
+            async with session.post(url, json=make_update(update_id, users), headers=headers) as response:
+                await response.read()
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status] = statuses.get(response.status, 0) + 1
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "elapsed": elapsed,
+        "statuses": statuses,
+        "accepted_per_second": statuses.get(200, 0) / elapsed,
+        "latency_p50_ms": statistics.median(latencies) * 1000,
+        "latency_p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="Эндпоинт запущенного бота; без него сервер поднимается локально")
+    parser.add_argument("--secret", default=None)
+    parser.add_argument("--updates", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--queue-size", type=int, default=1000)
+    parser.add_argument("--drain-rate", type=float, default=0)
+    args = parser.parse_args()
+
+    server = drainer = None
+    url, secret = args.url, args.secret
+    if url is None:
+        queue = asyncio.Queue(maxsize=args.queue_size)
+        server = WebhookServer(
+            Bot("123456:LOAD-TEST"), queue, listen="127.0.0.1", port=LOCAL_PORT,
+            path="/telegram", secret_token=LOCAL_SECRET
+        )
+        await server.start()
+        drainer = asyncio.create_task(drain(queue, args.drain_rate))
+        url, secret = f"http://127.0.0.1:{LOCAL_PORT}/telegram", LOCAL_SECRET
+
+    try:
+        result = await fire(url, secret, args.updates, args.concurrency, args.users)
+    finally:
+        if drainer is not None:
+            drainer.cancel()
+        if server is not None:
+            await server.stop()
+
+    print(f"{args.updates} updates in {result['elapsed']:.2f} s, statuses: {result['statuses']}")
+    print(f"sustained: {result['accepted_per_second']:.0f} accepted updates/s")
+    print(f"latency: p50 {result['latency_p50_ms']:.1f} ms, p99 {result['latency_p99_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,107 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+# Приоритеты acquire: меньшее значение обслуживается раньше
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+
+class TokenBucket:
+    """Асинхронный ограничитель частоты запросов (token bucket).
+
+    Токены пополняются со скоростью rate в секунду, не больше capacity
+    (допустимый всплеск). Каждый acquire забирает один токен, ожидая его
+    при необходимости. Ожидающие обслуживаются по приоритету, а при
+    равном приоритете - в порядке обращения: фоновые запросы не
+    задерживают запросы пользователей. pause() останавливает выдачу
+    токенов всем ожидающим, например по Retry-After от сервера.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters = []  # Куча (приоритет, номер обращения, future)
+        self._order = itertools.count()
+        self._dispatcher = None
+        self.acquired = 0
+        self.waited = 0.0  # Суммарное время ожидания токенов, сек
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def _take(self) -> float:
+        """Забирает токен: 0, если получен, иначе сколько ждать следующего."""
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+        self._refill(now)
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    async def acquire(self, priority: int = PRIORITY_INTERACTIVE):
+        started = time.monotonic()
+        if self._waiters or self._take():
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._order), future))
+            if self._dispatcher is None:
+                self._dispatcher = asyncio.ensure_future(self._dispatch())
+            await future
+        self.acquired += 1
+        self.waited += time.monotonic() - started
+
+    async def _dispatch(self):
+        # Выдает токены ожидающим; после каждого сна заново смотрит на голову
+        # кучи - пришедший за это время более срочный запрос пойдет первым
+        try:
+            while self._waiters:
+                future = self._waiters[0][2]
+                if future.done():  # Ожидающий отменен
+                    heapq.heappop(self._waiters)
+                    continue
+                wait = self._take()
+                if wait:
+                    await asyncio.sleep(wait)
+                    continue
+                heapq.heappop(self._waiters)
+                future.set_result(None)
+        finally:
+            self._dispatcher = None
+
+    def try_acquire(self) -> float:
+        """Забирает токен без ожидания (если его не ждут другие).
+
+        Returns:
+            float: 0, если токен получен, иначе через сколько секунд он появится
+        """
+        if self._waiters:
+            return max(1 / self.rate, self._paused_until - time.monotonic())
+        wait = self._take()
+        if not wait:
+            self.acquired += 1
+        return wait
+
+    def is_idle(self) -> bool:
+        """Ведро полное - состояние можно не хранить."""
+        self._refill(time.monotonic())
+        return self._tokens >= self.capacity
+
+    def pause(self, seconds: float):
+        """Приостанавливает выдачу токенов на seconds секунд."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+    def stats(self) -> dict:
+        return {
+            "rate": self.rate,
+            "acquired": self.acquired,
+            "waiting": len(self._waiters),
+            "waited_seconds": round(self.waited, 3),
+        }
@@ -0,0 +1,113 @@
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from typing import Iterable, List, Optional, Tuple
+
+# Формат: версия, число поколений; для каждого поколения - время начала,
+# число id и отсортированный массив uint32 (little-endian)
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<BH")
+_GENERATION = struct.Struct("<II")
+_UINT32_MAX = 2 ** 32 - 1
+
+
+def _to_id(vacancy_id) -> Optional[int]:
+    """id вакансии hh.ru как uint32 (None, если не помещается)."""
+    try:
+        value = int(vacancy_id)
+    except (TypeError, ValueError):
+        return None
+    return value if 0 <= value <= _UINT32_MAX else None
+
+
+class SeenSet:
+    """Компактное множество уже отправленных подписчику вакансий.
+
+    id хранятся отсортированными массивами uint32 по поколениям времени:
+    новые id попадают в текущее поколение, а поколения старше окна
+    window целиком отбрасываются. Размер ограничен max_ids - при
+    переполнении первыми удаляются самые старые id. В БД множество
+    хранится как BYTEA: 4 байта на вакансию плюс заголовки поколений.
+    """
+
+    def __init__(self, window: float, generations: int, max_ids: int,
+                 generation_list: Optional[List[Tuple[int, array]]] = None):
+        self.window = window
+        self.generation_length = window / generations
+        self.max_ids = max_ids
+        # [(начало поколения, отсортированный array('I')), ...] от старых к новым
+        self._generations = generation_list or []
+
+    def __len__(self):
+        return sum(len(ids) for _, ids in self._generations)
+
+    def __contains__(self, vacancy_id) -> bool:
+        value = _to_id(vacancy_id)
+        if value is None:
+            return False
+        for _, ids in self._generations:
+            index = bisect_left(ids, value)
+            if index < len(ids) and ids[index] == value:
+                return True
+        return False
+
+    def _expire(self, now: float):
+        self._generations = [
+            (started, ids) for started, ids in self._generations
+            if started + self.window > now
+        ]
+
+    def add(self, vacancy_ids: Iterable, now: Optional[float] = None):
+        """Добавляет id в текущее поколение, отбрасывая устаревшие."""
+        now = time.time() if now is None else now
+        self._expire(now)
+        values = {value for value in map(_to_id, vacancy_ids) if value is not None and value not in self}
+        if not values:
+            return
+        if not self._generations or self._generations[-1][0] + self.generation_length <= now:
+            self._generations.append((int(now), array('I')))
+        started, ids = self._generations[-1]
+        self._generations[-1] = (started, array('I', sorted(values.union(ids))))
+
+        overflow = len(self) - self.max_ids
+        while overflow > 0:
+            started, ids = self._generations[0]
+            if len(ids) <= overflow:
+                self._generations.pop(0)
+                overflow -= len(ids)
+            else:
+                # Внутри поколения порядок добавления не хранится - убираем меньшие id (они старше)
+                self._generations[0] = (started, ids[overflow:])
+                overflow = 0
+
+    def to_bytes(self) -> bytes:
+        parts = [_HEADER.pack(_FORMAT_VERSION, len(self._generations))]
+        for started, ids in self._generations:
+            parts.append(_GENERATION.pack(started, len(ids)))
+            if sys.byteorder == "big":
+                ids = array('I', ids)
+                ids.byteswap()
+            parts.append(ids.tobytes())
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: Optional[bytes], window: float, generations: int, max_ids: int) -> "SeenSet":
+        """Восстанавливает множество из BYTEA (пустое для None и чужого формата)."""
+        if not data or data[0] != _FORMAT_VERSION:
+            return cls(window, generations, max_ids)
+        data = bytes(data)
+        _, count = _HEADER.unpack_from(data, 0)
+        offset = _HEADER.size
+        generation_list = []
+        for _ in range(count):
+            started, size = _GENERATION.unpack_from(data, offset)
+            offset += _GENERATION.size
+            ids = array('I')
+            ids.frombytes(data[offset:offset + size * 4])
+            if sys.byteorder == "big":
+                ids.byteswap()
+            offset += size * 4
+            generation_list.append((started, ids))
+        return cls(window, generations, max_ids, generation_list)
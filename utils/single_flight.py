@@ -0,0 +1,56 @@
+import asyncio
+from utils import deadline
+
+
+class SingleFlight:
+    """Объединение одинаковых одновременных запросов.
+
+    Пока запрос с некоторым ключом выполняется, остальные вызовы с тем же
+    ключом не запускают его повторно, а ждут общий результат. Исключение
+    тоже получают все ожидающие. Отмена одного из ожидающих не отменяет
+    общий запрос для остальных.
+
+    Общий запрос выполняется без бюджета времени вызвавшего его апдейта:
+    каждый вызов ждет результат не дольше своего собственного срока и по
+    его истечении получает DeadlineExceeded, а запрос продолжается для
+    остальных.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.calls = 0  # Фактически выполненных запросов
+        self.deduplicated = 0  # Вызовов, присоединившихся к уже идущему запросу
+
+    def __len__(self):
+        return len(self._calls)
+
+    async def do(self, key, func, *args, **kwargs):
+        task = self._calls.get(key)
+        if task is not None:
+            self.deduplicated += 1
+        else:
+            self.calls += 1
+            task = deadline.without_deadline(func(*args, **kwargs))
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        left = deadline.remaining()
+        if left is None:
+            return await asyncio.shield(task)
+        if left <= 0:
+            raise deadline.DeadlineExceeded()
+        # asyncio.wait не отменяет общий запрос и не путает его TimeoutError со своим
+        done, _ = await asyncio.wait({task}, timeout=left)
+        if not done:
+            raise deadline.DeadlineExceeded()
+        return task.result()
+
+    def _forget(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls),
+            "calls": self.calls,
+            "deduplicated": self.deduplicated,
+        }
@@ -0,0 +1,79 @@
+import time
+from collections import OrderedDict
+
+
+class CacheEntry:
+    """Значение в кэше вместе с валидаторами HTTP-ответа."""
+    __slots__ = ("value", "etag", "last_modified", "expires_at")
+
+    def __init__(self, value, etag=None, last_modified=None, expires_at=0.0):
+        self.value = value
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires_at = expires_at
+
+    def is_fresh(self) -> bool:
+        return time.monotonic() < self.expires_at
+
+
+class TTLCache:
+    """Кэш с ограниченным размером (вытеснение LRU) и временем жизни записей.
+
+    Просроченные записи не удаляются сразу: они остаются до вытеснения,
+    чтобы по их ETag/Last-Modified можно было сделать условный запрос.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Возвращает свежее значение или None (учитывается в статистике)."""
+        entry = self._entries.get(key)
+        if entry is not None and entry.is_fresh():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+        self.misses += 1
+        return None
+
+    def get_entry(self, key):
+        """Возвращает запись, даже просроченную, или None."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key, value, etag=None, last_modified=None):
+        """Сохраняет значение, при переполнении вытесняет давно не использованные."""
+        self._entries[key] = CacheEntry(value, etag, last_modified, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def touch(self, key):
+        """Продлевает жизнь записи после успешной ревалидации (HTTP 304)."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.expires_at = time.monotonic() + self.ttl
+            self._entries.move_to_end(key)
+            self.revalidations += 1
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidations": self.revalidations,
+            "evictions": self.evictions,
+        }